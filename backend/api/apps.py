@@ -4,3 +4,28 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        """Подключение обработчиков сигналов."""
+        from django.db.backends.signals import connection_created
+
+        from api import signals  # noqa: F401
+        from api.authentication import token_cache_metrics
+        from api.coalescing import coalescing_metrics
+        from api.compression import compression_metrics
+        from api.events import events_metrics
+        from api.facets import facets_metrics
+        from api.metrics import install_query_wrapper, registry
+        from api.throttling import throttle_metrics
+        from foodgram.cache import shared_cache_metrics
+        from foodgram.db.pool import pool_metrics
+
+        connection_created.connect(install_query_wrapper)
+        registry.register_collector(pool_metrics)
+        registry.register_collector(token_cache_metrics)
+        registry.register_collector(throttle_metrics)
+        registry.register_collector(coalescing_metrics)
+        registry.register_collector(compression_metrics)
+        registry.register_collector(events_metrics)
+        registry.register_collector(facets_metrics)
+        registry.register_collector(shared_cache_metrics)
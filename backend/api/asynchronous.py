@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+# Методы, запросы которых выполняются в пуле потоков.
+OFFLOAD_METHODS = ('GET', 'HEAD')
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS,
+    thread_name_prefix='db-offload',
+)
+
+
+def _run_sync(func, *args, **kwargs):
+    """Выполнение синхронного кода с ORM в потоке пула."""
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def offload(func, *args, **kwargs):
+    """Выполняет синхронную функцию в ограниченном пуле потоков.
+
+    В Django 3.2 нет асинхронного ORM, поэтому запросы к БД
+    выполняются в пуле из ASYNC_DB_THREADS потоков. Размер пула
+    ограничивает и число соединений с БД, открытых процессом.
+    """
+    return await sync_to_async(
+        _run_sync, thread_sensitive=False, executor=executor,
+    )(func, *args, **kwargs)
+
+
+def _render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if callable(getattr(response, 'render', None)):
+        response.render()
+    return response
+
+
+def async_view(view):
+    """Асинхронная обертка синхронного представления.
+
+    Чтение (OFFLOAD_METHODS) и рендеринг ответа выполняются в пуле
+    потоков, цикл событий процесса остается свободен для других
+    запросов. Запросы на изменение выполняются, как синхронные
+    представления в ASGI, в общем потоке Django.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in OFFLOAD_METHODS:
+            return await offload(_render, view, request, *args, **kwargs)
+        return await sync_to_async(_render, thread_sensitive=True)(
+            view, request, *args, **kwargs,
+        )
+    return wrapper
+
+
+def async_urls(urls, names):
+    """Заменяет представления маршрутов из names асинхронными.
+
+    В пул потоков уходит только чтение, см. async_view.
+    """
+    for url in urls:
+        if url.name in names:
+            url.callback = async_view(url.callback)
+    return urls
@@ -0,0 +1,149 @@
+import copy
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """Кэш токен -> (пользователь, токен).
+
+    Локальный LRU процесса ограничен AUTH_TOKEN_CACHE_SIZE записями
+    и AUTH_TOKEN_CACHE_LOCAL_TTL секундами. Если задан AUTH_TOKEN_CACHE,
+    вторым уровнем используется общий кэш Django с временем жизни
+    AUTH_TOKEN_CACHE_TTL. Записи сбрасываются сигналами при выходе,
+    смене пароля и деактивации пользователя.
+
+    С общим кэшем локальная запись действительна, пока не изменилось
+    поколение в общем кэше: сброс любого токена меняет поколение,
+    и все процессы перечитывают записи из общего кэша. Без общего
+    кэша в других процессах локальная запись устаревает не позже
+    чем через локальный TTL.
+    """
+
+    prefix = 'auth-token:'
+    generation_key = 'auth-token-generation'
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        """Общий кэш Django или None."""
+        if not settings.AUTH_TOKEN_CACHE:
+            return None
+        return caches[settings.AUTH_TOKEN_CACHE]
+
+    def generation(self, shared):
+        """Поколение локальных записей из общего кэша.
+
+        Поколение - случайная строка, а не счетчик: если запись
+        вытеснена, новое значение не совпадет ни с одним прежним.
+        """
+        if shared is None:
+            return None
+        generation = shared.get(self.generation_key)
+        if generation is not None:
+            return generation
+        shared.add(self.generation_key, uuid.uuid4().hex, None)
+        return shared.get(self.generation_key)
+
+    def get(self, key):
+        """Пара (пользователь, токен) из кэша или None."""
+        now = time.monotonic()
+        shared = self.shared
+        generation = self.generation(shared)
+        with self.lock:
+            entry = self.entries.get(key)
+            if (
+                entry is not None
+                and entry[0] > now
+                and entry[1] == generation
+            ):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+        value = shared.get(self.prefix + key) if shared else None
+        if value is None:
+            self.misses += 1
+            return None
+        self.shared_hits += 1
+        self.store_local(key, value, now, generation)
+        return value
+
+    def set(self, key, value):
+        """Сохраняет пару (пользователь, токен)."""
+        shared = self.shared
+        generation = self.generation(shared)
+        if shared:
+            shared.set(
+                self.prefix + key, value, settings.AUTH_TOKEN_CACHE_TTL,
+            )
+        self.store_local(key, value, time.monotonic(), generation)
+
+    def store_local(self, key, value, now, generation):
+        """Запись в локальный LRU с вытеснением старых записей."""
+        if self.shared is not None and generation is None:
+            return
+        expires = now + settings.AUTH_TOKEN_CACHE_LOCAL_TTL
+        with self.lock:
+            self.entries[key] = (expires, generation, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        """Удаляет токены из обоих уровней кэша во всех процессах."""
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        shared = self.shared
+        if shared and keys:
+            shared.delete_many([self.prefix + key for key in keys])
+            shared.set(self.generation_key, uuid.uuid4().hex, None)
+
+    def clear(self):
+        """Очищает локальный кэш."""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Счетчики кэша."""
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+        }
+
+
+token_cache = TokenCache()
+
+
+def token_cache_metrics():
+    """Метрики кэша токенов в формате (имя, значение)."""
+    for name, value in token_cache.stats().items():
+        yield f'foodgram_auth_token_cache_{name}', value
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к БД для известных токенов."""
+
+    def authenticate_credentials(self, key):
+        """Пользователь и токен из кэша или из БД."""
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        user, token = cached
+        # Каждый запрос получает свою копию пользователя.
+        return copy.copy(user), token
@@ -0,0 +1,217 @@
+import json
+import platform
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes.management.commands.seed_bench import USER_PREFIX
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+def bench_settings():
+    """Настройки прогона: любой хост и без ограничения частоты запросов."""
+    return override_settings(
+        ALLOWED_HOSTS=['*'],
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {},
+        },
+    )
+
+
+def api_scenarios():
+    """Основные запросы API на данных seed_bench.
+
+    Возвращает словарь имя -> вызываемый объект без аргументов
+    или None, если тестовых данных нет.
+    """
+    user = (
+        User.objects.filter(username__startswith=USER_PREFIX)
+        .annotate(cart=Count('shopping_cart'))
+        .filter(cart__gt=0).order_by('id').first()
+    )
+    if user is None:
+        return None
+    token, _ = Token.objects.get_or_create(user=user)
+    client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+    anonymous = Client()
+    recipe = Recipe.objects.filter(author__following__isnull=False).first()
+    tag = Tag.objects.first()
+    ingredient_prefix = Ingredient.objects.first().name[:3]
+
+    return {
+        'recipes_list': lambda: anonymous.get('/api/recipes/'),
+        'recipes_list_auth': lambda: client.get('/api/recipes/'),
+        'recipes_list_cards': lambda: client.get(
+            '/api/recipes/?fields=id,name,image,cooking_time'),
+        'recipes_list_msgpack': lambda: client.get(
+            '/api/recipes/', HTTP_ACCEPT='application/msgpack'),
+        'recipes_list_tags': lambda: client.get(
+            f'/api/recipes/?tags={tag.slug}'),
+        'recipes_list_author': lambda: client.get(
+            f'/api/recipes/?author={recipe.author_id}'),
+        'recipes_list_favorited': lambda: client.get(
+            '/api/recipes/?is_favorited=1'),
+        'recipes_list_cart': lambda: client.get(
+            '/api/recipes/?is_in_shopping_cart=1'),
+        'recipe_detail': lambda: client.get(
+            f'/api/recipes/{recipe.id}/'),
+        'subscriptions': lambda: client.get(
+            '/api/users/subscriptions/?recipes_limit=3'),
+        'users_list': lambda: client.get('/api/users/'),
+        'download_shopping_cart': lambda: client.get(
+            '/api/recipes/download_shopping_cart/'),
+        'ingredients_search': lambda: anonymous.get(
+            f'/api/ingredients/?name={ingredient_prefix}'),
+        'tags_list': lambda: anonymous.get('/api/tags/'),
+    }
+
+
+def plan_nodes(node):
+    """Узлы плана EXPLAIN (FORMAT JSON) в глубину."""
+    yield node
+    for child in node.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def seq_scans(sql):
+    """Таблицы, которые SELECT читает последовательно, по EXPLAIN.
+
+    Учитываются чтения с фильтром и чтения в запросах с LIMIT
+    (страница строится сортировкой всей таблицы). Полный подсчет
+    строк без условий допустим. Только для PostgreSQL.
+    """
+    if not sql.startswith('SELECT'):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]['Plan']
+    limited = root['Node Type'] == 'Limit'
+    return [
+        node['Relation Name'] for node in plan_nodes(root)
+        if node['Node Type'] == 'Seq Scan'
+        and ('Filter' in node or limited)
+    ]
+
+
+def percentile(values, q):
+    """Процентиль по отсортированному списку (ближайший ранг)."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(q * len(values)) - 1))
+    return values[index]
+
+
+def summarize(name, latencies, queries, elapsed, errors=0):
+    """Итоги сценария: пропускная способность, задержки, запросы."""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'name': name,
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': count / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': sum(latencies) / count * 1000 if count else 0.0,
+        'queries': max(queries) if queries else 0,
+    }
+
+
+def run_scenario(name, request, iterations, warmup=3, expected=200):
+    """Выполняет запрос iterations раз и собирает статистику.
+
+    request - вызываемый объект без аргументов, возвращающий ответ.
+    """
+    for _ in range(warmup):
+        request()
+    latencies = []
+    queries = []
+    errors = 0
+    size = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as context:
+            request_started = time.perf_counter()
+            response = request()
+            if getattr(response, 'streaming', False):
+                size = len(b''.join(response.streaming_content))
+            else:
+                size = len(response.content)
+            latencies.append(time.perf_counter() - request_started)
+        queries.append(len(context.captured_queries))
+        if response.status_code != expected:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    result = summarize(name, latencies, queries, elapsed, errors)
+    result['bytes'] = size
+    return result
+
+
+def save_results(path, results, **meta):
+    """Сохраняет результаты в JSON для сравнения запусков."""
+    document = {
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        **meta,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(document, file, ensure_ascii=False, indent=2)
+
+
+def compare_results(baseline_path, results, threshold):
+    """Сценарии, ухудшившиеся относительно сохраненного запуска.
+
+    Регрессия - рост p50 или p99 больше чем на threshold (доля),
+    либо рост числа запросов к БД.
+    """
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = {
+            item['name']: item for item in json.load(file)['results']
+        }
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['name'])
+        if previous is None:
+            continue
+        for key in ('p50_ms', 'p99_ms'):
+            if result[key] > previous[key] * (1 + threshold):
+                regressions.append(
+                    f'{result["name"]}: {key} '
+                    f'{previous[key]:.2f} -> {result[key]:.2f}',
+                )
+        if result['queries'] > previous['queries']:
+            regressions.append(
+                f'{result["name"]}: queries '
+                f'{previous["queries"]} -> {result["queries"]}',
+            )
+    return regressions
+
+
+def format_table(results):
+    """Таблица результатов для вывода в консоль."""
+    lines = [
+        f'{"scenario":<34}{"req":>6}{"rps":>9}{"p50 ms":>9}'
+        f'{"p99 ms":>9}{"queries":>9}{"errors":>8}{"bytes":>9}',
+    ]
+    for result in results:
+        lines.append(
+            f'{result["name"]:<34}{result["requests"]:>6}'
+            f'{result["throughput_rps"]:>9.1f}{result["p50_ms"]:>9.2f}'
+            f'{result["p99_ms"]:>9.2f}{result["queries"]:>9}'
+            f'{result["errors"]:>8}{result.get("bytes", 0):>9}',
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,56 @@
+import threading
+
+from collections import Counter
+
+coalesced = Counter()
+
+_lock = threading.Lock()
+_calls = {}
+
+
+class _Call:
+    """Выполняющееся вычисление и его результат."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def coalesce(key, func):
+    """Объединение одновременных одинаковых вычислений (single-flight).
+
+    Первый вызов с ключом key выполняет func, одновременные вызовы
+    с тем же ключом ждут и получают его результат или исключение.
+    Результат не кэшируется: следующий вызов после завершения
+    выполняет func заново. Работает в пределах процесса.
+    """
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+    if not leader:
+        coalesced[key.split(':', 1)[0]] += 1
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        call.result = func()
+    except Exception as error:
+        call.error = error
+        raise
+    finally:
+        with _lock:
+            del _calls[key]
+        call.done.set()
+    return call.result
+
+
+def coalescing_metrics():
+    """Метрики объединения запросов в формате (имя, значение)."""
+    for name, value in list(coalesced.items()):
+        yield f'foodgram_coalesced_total{{key="{name}"}}', value
@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript',
+    'application/msgpack', 'application/xml', 'image/svg+xml',
+)
+
+
+def compress(data, encoding, level=None):
+    """Сжатие данных в кодировке br или gzip."""
+    if encoding == 'br':
+        return brotli.compress(
+            data, quality=level or settings.COMPRESSION_BROTLI_QUALITY,
+        )
+    return gzip.compress(
+        data, compresslevel=level or settings.COMPRESSION_GZIP_LEVEL, mtime=0,
+    )
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding с ненулевым весом."""
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        weight = params.strip()
+        if weight.startswith('q='):
+            try:
+                if float(weight[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def choose_encoding(header):
+    """Лучшая поддерживаемая кодировка для клиента или None."""
+    encodings = accepted_encodings(header)
+    if brotli is not None and 'br' in encodings:
+        return 'br'
+    if 'gzip' in encodings or '*' in encodings:
+        return 'gzip'
+    return None
+
+
+class CompressedCache:
+    """LRU сжатых ответов по хэшу содержимого.
+
+    Размер ограничен суммарным объемом сжатых данных
+    COMPRESSION_CACHE_BYTES.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(self, data, encoding):
+        """Сжатые данные из кэша или результат сжатия."""
+        key = (encoding, hashlib.sha1(data).digest())
+        with self.lock:
+            compressed = self.entries.get(key)
+            if compressed is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return compressed
+        compressed = compress(data, encoding)
+        with self.lock:
+            self.misses += 1
+            if key not in self.entries:
+                self.entries[key] = compressed
+                self.size += len(compressed)
+            while self.size > settings.COMPRESSION_CACHE_BYTES:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+        return compressed
+
+
+compressed_cache = CompressedCache()
+
+
+def compression_metrics():
+    """Метрики кэша сжатых ответов в формате (имя, значение)."""
+    yield 'foodgram_compression_cache_hits', compressed_cache.hits
+    yield 'foodgram_compression_cache_misses', compressed_cache.misses
+    yield 'foodgram_compression_cache_bytes', compressed_cache.size
@@ -0,0 +1,410 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from collections import Counter, defaultdict
+from functools import lru_cache
+from urllib.parse import parse_qs
+
+import psycopg2
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import exceptions
+
+from api.asynchronous import offload
+from api.authentication import CachedTokenAuthentication
+from recipes.models import Follow
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+SIGNING_SALT = 'api.events'
+
+stats = Counter()
+
+
+def user_channel(user_id):
+    """Канал событий пользователя (корзина)."""
+    return f'user:{user_id}'
+
+
+def author_channel(author_id):
+    """Канал новых рецептов автора."""
+    return f'author:{author_id}'
+
+
+def follows_channel(user_id):
+    """Служебный канал изменений подписок пользователя."""
+    return f'follows:{user_id}'
+
+
+def sse_frame(event, data):
+    """Событие в формате text/event-stream."""
+    data = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return f'event: {event}\ndata: {data}\n\n'
+
+
+class Subscription:
+    """Очередь событий одного соединения.
+
+    События приходят из любых потоков и кладутся в очередь цикла
+    событий соединения. При переполнении очереди (клиент не успевает
+    читать) старые события отбрасываются.
+    """
+
+    def __init__(self, broker, loop, maxsize):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.channels = set()
+
+    def put(self, channel, message):
+        """Доставка события, вызывается из любого потока."""
+        self.loop.call_soon_threadsafe(self.put_nowait, (channel, message))
+
+    def put_nowait(self, item):
+        """Добавление в очередь с вытеснением старых событий."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            stats['dropped'] += 1
+        self.queue.put_nowait(item)
+
+    async def get(self):
+        """Следующая пара (канал, событие), None - подписка закрыта."""
+        return await self.queue.get()
+
+    def add(self, *channels):
+        """Подписка на каналы."""
+        self.broker.add(self, channels)
+
+    def discard(self, *channels):
+        """Отписка от каналов."""
+        self.broker.discard(self, channels)
+
+    def close(self):
+        """Отписка от всех каналов и пробуждение читателя."""
+        self.broker.discard(self, tuple(self.channels))
+        self.put_nowait(None)
+
+
+class LocalBroker:
+    """Публикация событий внутри процесса.
+
+    Подходит для одного процесса: события из других воркеров
+    и узлов до подписчиков не доходят.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def subscribe(self, channels):
+        """Подписка на каналы из текущего цикла событий."""
+        subscription = Subscription(
+            self, asyncio.get_running_loop(), settings.EVENTS_QUEUE_SIZE,
+        )
+        subscription.add(*channels)
+        return subscription
+
+    def add(self, subscription, channels):
+        """Добавление подписчика в каналы."""
+        with self.lock:
+            for channel in channels:
+                self.subscribers[channel].add(subscription)
+                subscription.channels.add(channel)
+
+    def discard(self, subscription, channels):
+        """Удаление подписчика из каналов."""
+        with self.lock:
+            for channel in channels:
+                subscribers = self.subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscribers[channel]
+                subscription.channels.discard(channel)
+
+    def publish(self, channel, message):
+        """Отправка события в канал."""
+        self.deliver(channel, message)
+
+    def deliver(self, channel, message):
+        """Доставка события подписчикам канала в этом процессе."""
+        with self.lock:
+            subscribers = tuple(self.subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(channel, message)
+        stats['delivered'] += len(subscribers)
+
+
+class PostgresBroker(LocalBroker):
+    """Публикация событий через LISTEN/NOTIFY PostgreSQL.
+
+    Событие отправляется pg_notify в соединении Django, его получают
+    все процессы и узлы, подписанные на канал EVENTS_PG_CHANNEL.
+    Каждый процесс с подписчиками держит одно отдельное соединение,
+    которое слушает поток, раздающий события локальным подписчикам.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def subscribe(self, channels):
+        """Подписка с запуском слушающего потока."""
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(
+                    target=self.listen, name='events-listener', daemon=True,
+                )
+                self.listener.start()
+        return super().subscribe(channels)
+
+    def publish(self, channel, message):
+        """Отправка события через NOTIFY."""
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)',
+                [settings.EVENTS_PG_CHANNEL, f'{channel} {message}'],
+            )
+
+    def listen(self):
+        """Получение уведомлений с переподключением при ошибках."""
+        while True:
+            try:
+                self.receive()
+            except psycopg2.Error:
+                logger.exception('Соединение для событий потеряно.')
+                time.sleep(1)
+
+    def receive(self):
+        """LISTEN и раздача уведомлений подписчикам процесса."""
+        params = connections['default'].get_connection_params()
+        connection = psycopg2.connect(**params)
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LISTEN {settings.EVENTS_PG_CHANNEL}',
+                )
+            while True:
+                select.select([connection], [], [], 60)
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    channel, _, message = notify.payload.partition(' ')
+                    self.deliver(channel, message)
+        finally:
+            connection.close()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Брокер событий из настройки EVENTS_BROKER."""
+    return import_string(settings.EVENTS_BROKER)()
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    """Новый брокер после изменения EVENTS_BROKER (в тестах)."""
+    if setting == 'EVENTS_BROKER':
+        get_broker.cache_clear()
+
+
+def send_message(channel, message):
+    """Отправка сообщения брокеру.
+
+    Ошибка брокера не должна ломать уже выполненный запрос:
+    она записывается в журнал, событие теряется.
+    """
+    try:
+        get_broker().publish(channel, message)
+    except Exception:
+        logger.exception('Событие для канала %s не отправлено.', channel)
+
+
+def publish(channel, message):
+    """Публикация сообщения после фиксации транзакции.
+
+    Без EVENTS_BROKER события выключены и не публикуются.
+    """
+    if settings.EVENTS_BROKER:
+        transaction.on_commit(lambda: send_message(channel, message))
+
+
+def publish_event(channel, event, data):
+    """Публикация события для клиентов."""
+    publish(channel, sse_frame(event, data))
+
+
+def publish_follow(user_id, author_id, following):
+    """Изменение подписки для открытых соединений пользователя.
+
+    Соединения начинают или перестают получать рецепты автора
+    без переподключения.
+    """
+    publish(follows_channel(user_id), json.dumps(
+        {'author': author_id, 'following': following},
+    ))
+
+
+def events_metrics():
+    """Метрики событий в формате (имя, значение)."""
+    yield 'foodgram_events_connections', stats['connections']
+    yield 'foodgram_events_delivered_total', stats['delivered']
+    yield 'foodgram_events_dropped_total', stats['dropped']
+
+
+def events_token(user):
+    """Подписанный токен потока событий для ?token=.
+
+    EventSource в браузере не передает заголовки, поэтому клиент
+    получает токен запросом POST /api/events/token/ и подключается
+    с ним. Токен действует EVENTS_TOKEN_MAX_AGE секунд.
+    """
+    return signing.dumps(user.pk, salt=SIGNING_SALT)
+
+
+def token_user(token):
+    """Активный пользователь по токену потока событий или None."""
+    try:
+        user_id = signing.loads(
+            token, salt=SIGNING_SALT, max_age=settings.EVENTS_TOKEN_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+def authenticate(scope):
+    """Пользователь по ?token= или заголовку Authorization: Token."""
+    token = parse_qs(
+        scope.get('query_string', b'').decode('latin-1'),
+    ).get('token')
+    if token:
+        return token_user(token[0])
+    keyword, _, key = dict(scope['headers']).get(
+        b'authorization', b'',
+    ).decode('latin-1').partition(' ')
+    if keyword != CachedTokenAuthentication.keyword or not key:
+        return None
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except exceptions.AuthenticationFailed:
+        return None
+    return user
+
+
+def followed_channels(user_id):
+    """Каналы пользователя и авторов, на которых он подписан."""
+    return [user_channel(user_id), follows_channel(user_id), *(
+        author_channel(author_id) for author_id in Follow.objects.filter(
+            user_id=user_id,
+        ).values_list('author_id', flat=True)
+    )]
+
+
+async def send_response(send, status, body):
+    """Ответ без потока событий (ошибка)."""
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps({'detail': body}, ensure_ascii=False).encode(),
+    })
+
+
+def follow(subscription, message):
+    """Подписка соединения на автора или отписка от него."""
+    data = json.loads(message)
+    channel = author_channel(data['author'])
+    if data['following']:
+        subscription.add(channel)
+    else:
+        subscription.discard(channel)
+
+
+async def stream(subscription, follows, send):
+    """Отправка событий подписки до ее закрытия."""
+    await send({
+        'type': 'http.response.start', 'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': b'retry: 5000\n\n', 'more_body': True,
+    })
+    while True:
+        try:
+            item = await asyncio.wait_for(
+                subscription.get(), settings.EVENTS_HEARTBEAT,
+            )
+        except asyncio.TimeoutError:
+            item = ('', ': ping\n\n')
+        if item is None:
+            return
+        channel, message = item
+        if channel == follows:
+            follow(subscription, message)
+            continue
+        await send({
+            'type': 'http.response.body',
+            'body': message.encode(), 'more_body': True,
+        })
+
+
+async def event_stream(scope, receive, send):
+    """ASGI-приложение потока событий (Server-Sent Events).
+
+    Передает клиенту события recipe (новый рецепт автора, на которого
+    он подписан) и cart (изменение корзины). Соединение в ожидании
+    не занимает потоков и соединений с БД: к базе обращаются только
+    при подключении. Раз в EVENTS_HEARTBEAT секунд отправляется
+    комментарий, чтобы прокси не закрывали соединение.
+    """
+    if not settings.EVENTS_BROKER:
+        await send_response(send, 404, 'События отключены.')
+        return
+    if scope['method'] != 'GET':
+        await send_response(send, 405, 'Метод не разрешен.')
+        return
+    if stats['connections'] >= settings.EVENTS_MAX_CONNECTIONS:
+        await send_response(send, 503, 'Слишком много соединений.')
+        return
+    user = await offload(authenticate, scope)
+    if user is None:
+        await send_response(send, 401, 'Учетные данные не были предоставлены.')
+        return
+    subscription = get_broker().subscribe(
+        await offload(followed_channels, user.pk),
+    )
+    stats['connections'] += 1
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.close()
+
+    watcher = asyncio.ensure_future(wait_disconnect())
+    try:
+        await stream(subscription, follows_channel(user.pk), send)
+    finally:
+        stats['connections'] -= 1
+        watcher.cancel()
+        subscription.close()
@@ -0,0 +1,39 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    """Объект изменился после получения клиентом (If-Match)."""
+
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Объект изменен другим запросом, загрузите его заново.'
+    default_code = 'precondition_failed'
+
+
+class SyncTokenExpired(APIException):
+    """Токен синхронизации старше журнала изменений."""
+
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Токен устарел, загрузите данные заново.'
+    default_code = 'sync_token_expired'
+
+
+class UploadConflict(APIException):
+    """Часть файла не с той позиции или загрузка уже пишется."""
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Часть файла не совпадает с принятыми данными.'
+    default_code = 'upload_conflict'
+
+    def __init__(self, offset):
+        super().__init__()
+        # offset - число, а не строка ошибки.
+        self.detail = {'detail': self.detail, 'offset': offset}
+
+
+class UploadTooLarge(APIException):
+    """Файл или часть файла больше допустимого."""
+
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Часть выходит за размер загрузки.'
+    default_code = 'upload_too_large'
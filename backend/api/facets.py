@@ -0,0 +1,517 @@
+import threading
+import time
+
+from collections import defaultdict, namedtuple
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from api.sync import head, visible_txid
+from recipes.models import ChangeLog, IngredientInRecipe, Recipe
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(bitmap):
+        """Число единичных битов (int.bit_count есть с Python 3.10)."""
+        return bin(bitmap).count('1')
+
+# Фильтры RecipeFilter, которых нет в индексе: их проверяет БД.
+DB_FILTERS = ('author', 'is_favorited', 'is_in_shopping_cart')
+
+# Параметры запроса каждого измерения (без них считаются счетчики
+# значений измерения).
+DIMENSIONS = {
+    'tags': ('tags',),
+    'cooking_time': ('cooking_time_min', 'cooking_time_max'),
+    'ingredients': ('ingredients', 'exclude_ingredients'),
+}
+
+# Рецепт в индексе: позиция бита и значения измерений.
+Entry = namedtuple('Entry', 'position cooking_time tags ingredients')
+
+
+def to_bitmap(positions):
+    """Битовая маска (int) с единицами в позициях positions."""
+    if not positions:
+        return 0
+    data = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+def time_buckets():
+    """Интервалы времени приготовления из RECIPE_FACETS_COOKING_TIME.
+
+    Список (название, от, до), у последнего интервала до = None.
+    """
+    buckets = []
+    low = 1
+    for bound in settings.RECIPE_FACETS_COOKING_TIME.split(','):
+        bound = int(bound)
+        buckets.append((f'{low}-{bound}', low, bound))
+        low = bound + 1
+    buckets.append((f'{low}+', low, None))
+    return buckets
+
+
+def make_query(data):
+    """Условия индекса из cleaned_data RecipeFilter."""
+    low = data.get('cooking_time_min')
+    high = data.get('cooking_time_max')
+    return {
+        'tags': tuple(tag.pk for tag in data.get('tags') or ()),
+        'ingredients': tuple(
+            ingredient.pk for ingredient in data.get('ingredients') or ()
+        ),
+        'exclude_ingredients': tuple(
+            ingredient.pk
+            for ingredient in data.get('exclude_ingredients') or ()
+        ),
+        'cooking_time': (
+            None if low is None else int(low),
+            None if high is None else int(high),
+        ),
+    }
+
+
+def in_index(data):
+    """Можно ли ответить на запрос только по индексу."""
+    return settings.RECIPE_FACETS and not any(
+        data.get(name) for name in DB_FILTERS
+    )
+
+
+class FacetIndex:
+    """Битовые индексы рецептов в памяти процесса.
+
+    Для каждого тега, ингредиента, времени приготовления и интервала
+    времени хранится маска (int), в которой бит рецепта - его позиция
+    в порядке публикации. Новые рецепты получают следующие позиции,
+    поэтому старшие биты - новые рецепты, и страница списка в порядке
+    -pub_date читается от старшего бита. Условия запроса объединяются
+    побитовыми И/ИЛИ/НЕ, число рецептов - число единичных битов.
+
+    Индекс строится при первом запросе и догоняет базу по журналу
+    изменений (ChangeLog) не чаще раза в RECIPE_FACETS_REFRESH_INTERVAL
+    секунд: изменения из других процессов и узлов видны без общего
+    состояния. Если изменений больше RECIPE_FACETS_REBUILD_CHANGES,
+    индекс строится заново.
+
+    Позиции удаленных рецептов остаются пустыми, пока их доля
+    не превысит RECIPE_FACETS_COMPACT_RATIO: тогда рецепты
+    перенумеровываются подряд (compact), и маски не растут
+    с каждым удалением.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built = False
+        self.checked = 0.0
+        self.builds = 0
+        self.compactions = 0
+        self.changes = 0
+        self.reset()
+
+    def reset(self):
+        """Пустой индекс."""
+        self.cursor = (0, 0)
+        self.buckets = time_buckets()
+        self.entries = {}
+        self.positions = []
+        self.all = 0
+        self.maps = {
+            'tags': {}, 'ingredients': {}, 'times': {}, 'buckets': {},
+        }
+
+    def bucket(self, minutes):
+        """Название интервала для времени приготовления."""
+        for name, _, high in self.buckets:
+            if high is None or minutes <= high:
+                return name
+        return None
+
+    def keys(self, entry):
+        """Маски, в которые входит рецепт: (измерение, значение)."""
+        yield 'times', entry.cooking_time
+        yield 'buckets', self.bucket(entry.cooking_time)
+        for tag in entry.tags:
+            yield 'tags', tag
+        for ingredient in entry.ingredients:
+            yield 'ingredients', ingredient
+
+    @staticmethod
+    def load(ids, using):
+        """Время приготовления, теги и ингредиенты рецептов из БД.
+
+        ids = None - все рецепты в порядке публикации.
+        """
+        recipes = Recipe.objects.using(using)
+        tags = Recipe.tags.through.objects.using(using)
+        ingredients = IngredientInRecipe.objects.using(using)
+        if ids is not None:
+            recipes = recipes.filter(pk__in=ids)
+            tags = tags.filter(recipe_id__in=ids)
+            ingredients = ingredients.filter(recipe_id__in=ids)
+        recipe_tags = defaultdict(list)
+        for recipe_id, tag_id in tags.values_list('recipe_id', 'tag_id'):
+            recipe_tags[recipe_id].append(tag_id)
+        recipe_ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in ingredients.values_list(
+            'recipe_id', 'ingredient_id',
+        ):
+            recipe_ingredients[recipe_id].append(ingredient_id)
+        return [
+            (pk, cooking_time, tuple(recipe_tags[pk]),
+             tuple(recipe_ingredients[pk]))
+            for pk, cooking_time in recipes.order_by(
+                'pub_date', 'pk',
+            ).values_list('pk', 'cooking_time')
+        ]
+
+    def fill(self, rows):
+        """Маски рецептов rows (как из load) с позициями по порядку."""
+        cursor = self.cursor
+        self.reset()
+        self.cursor = cursor
+        pending = defaultdict(list)
+        for position, (pk, cooking_time, tags, ingredients) in enumerate(
+            rows,
+        ):
+            entry = Entry(position, cooking_time, tags, ingredients)
+            self.entries[pk] = entry
+            self.positions.append(pk)
+            for key in self.keys(entry):
+                pending[key].append(position)
+        self.all = (1 << len(rows)) - 1
+        for (name, value), positions in pending.items():
+            self.maps[name][value] = to_bitmap(positions)
+
+    def build(self, using):
+        """Построение индекса по всем рецептам."""
+        cursor = head()
+        self.fill(self.load(None, using))
+        self.cursor = cursor
+        self.built = True
+        self.builds += 1
+
+    def compact(self):
+        """Перенумерация рецептов без позиций удаленных.
+
+        Порядок рецептов сохраняется, БД не читается. Маски,
+        полученные до перенумерации, относятся к прежнему списку
+        positions, который остается у тех, кто его получил.
+        """
+        self.fill([
+            (pk, *self.entries[pk][1:])
+            for pk in self.positions if pk is not None
+        ])
+        self.compactions += 1
+
+    def add(self, pk, entry):
+        """Добавление рецепта в маски."""
+        bit = 1 << entry.position
+        self.entries[pk] = entry
+        self.all |= bit
+        for name, value in self.keys(entry):
+            bitmaps = self.maps[name]
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+
+    def remove(self, pk):
+        """Удаление рецепта из масок, возвращает его позицию."""
+        entry = self.entries.pop(pk, None)
+        if entry is None:
+            return None
+        bit = 1 << entry.position
+        self.all &= ~bit
+        for name, value in self.keys(entry):
+            bitmaps = self.maps[name]
+            bitmaps[value] &= ~bit
+            if not bitmaps[value]:
+                del bitmaps[value]
+        return entry.position
+
+    def apply(self, ids, using):
+        """Перечитывание измененных рецептов из БД.
+
+        Рецепт сохраняет свою позицию, новые рецепты добавляются
+        в конец в порядке публикации, удаленные убираются из масок.
+        """
+        rows = {row[0]: row for row in self.load(ids, using)}
+        for pk in ids:
+            if pk not in rows:
+                position = self.remove(pk)
+                if position is not None:
+                    self.positions[position] = None
+        for pk, cooking_time, tags, ingredients in rows.values():
+            position = self.remove(pk)
+            if position is None:
+                position = len(self.positions)
+                self.positions.append(pk)
+            self.add(pk, Entry(position, cooking_time, tags, ingredients))
+        self.changes += len(ids)
+        dead = len(self.positions) - len(self.entries)
+        if dead > len(self.positions) * settings.RECIPE_FACETS_COMPACT_RATIO:
+            self.compact()
+
+    def catch_up(self, using):
+        """Применение изменений рецептов из журнала после self.cursor."""
+        limit = settings.RECIPE_FACETS_REBUILD_CHANGES
+        xmin = visible_txid(using)
+        txid, pk = self.cursor
+        after = Q(txid__gt=txid) | Q(txid=txid, id__gt=pk)
+        if xmin is not None:
+            after &= Q(txid__lt=xmin)
+        entries = list(
+            ChangeLog.objects.using(using).filter(after, user__isnull=True)
+            .order_by('txid', 'id')
+            .values_list('txid', 'id', 'object_id')[:limit + 1],
+        )
+        if len(entries) > limit:
+            self.build(using)
+            return
+        if entries:
+            self.apply({entry[2] for entry in entries}, using)
+            self.cursor = max(self.cursor, entries[-1][:2])
+        if xmin is not None:
+            self.cursor = max(self.cursor, (xmin, 0))
+
+    def refresh(self):
+        """Построение индекса или применение новых изменений."""
+        interval = settings.RECIPE_FACETS_REFRESH_INTERVAL
+        if self.built and time.monotonic() - self.checked < interval:
+            return
+        with self.lock:
+            if self.built and time.monotonic() - self.checked < interval:
+                return
+            using = ChangeLog.objects.db
+            if self.built:
+                self.catch_up(using)
+            else:
+                self.build(using)
+            self.checked = time.monotonic()
+
+    def expire(self):
+        """Проверка журнала при следующем запросе (после записи)."""
+        self.checked = 0.0
+
+    def masks(self, query):
+        """Маски условий запроса по измерениям."""
+        maps = self.maps
+        masks = {}
+        if query['tags']:
+            masks['tags'] = reduce(or_, (
+                maps['tags'].get(tag, 0) for tag in query['tags']
+            ))
+        included = [
+            maps['ingredients'].get(ingredient, 0)
+            for ingredient in query['ingredients']
+        ]
+        excluded = [
+            maps['ingredients'].get(ingredient, 0)
+            for ingredient in query['exclude_ingredients']
+        ]
+        if included or excluded:
+            masks['ingredients'] = (
+                reduce(and_, included, self.all)
+                & ~reduce(or_, excluded, 0)
+            )
+        low, high = query['cooking_time']
+        if low is not None or high is not None:
+            masks['cooking_time'] = reduce(or_, (
+                bitmap for minutes, bitmap in maps['times'].items()
+                if (low is None or minutes >= low)
+                and (high is None or minutes <= high)
+            ), 0)
+        return masks
+
+    def combine(self, masks, skip=None):
+        """Рецепты, подходящие под все условия, кроме измерения skip."""
+        return reduce(and_, (
+            mask for name, mask in masks.items() if name != skip
+        ), self.all)
+
+    def search(self, query):
+        """Маска рецептов, подходящих под запрос, и список positions.
+
+        Список позиций нужен page(): после перестроения индекса
+        у self.positions другая нумерация.
+        """
+        self.refresh()
+        with self.lock:
+            return self.combine(self.masks(query)), self.positions
+
+    def counts(self, query):
+        """Число рецептов по запросу и по значениям измерений.
+
+        Счетчики значения измерения считаются без условий этого
+        измерения: выбор тега не обнуляет счетчики других тегов.
+        Для ингредиентов возвращаются только указанные в запросе.
+        """
+        self.refresh()
+        with self.lock:
+            masks = self.masks(query)
+            maps = self.maps
+            tags = self.combine(masks, 'tags')
+            times = self.combine(masks, 'cooking_time')
+            ingredients = self.combine(masks, 'ingredients')
+            return {
+                'count': popcount(self.combine(masks)),
+                'tags': {
+                    tag: popcount(tags & bitmap)
+                    for tag, bitmap in maps['tags'].items()
+                },
+                'cooking_time': {
+                    name: popcount(times & maps['buckets'].get(name, 0))
+                    for name, _, _ in self.buckets
+                },
+                'ingredients': {
+                    ingredient: popcount(
+                        ingredients & maps['ingredients'].get(ingredient, 0),
+                    )
+                    for ingredient in (
+                        *query['ingredients'], *query['exclude_ingredients'],
+                    )
+                },
+            }
+
+    def page(self, bitmap, positions, start, stop):
+        """id рецептов маски с номерами [start, stop) от новых к старым.
+
+        positions - список позиций из search() вместе с маской.
+        bin() дает строку от старшего бита, единицы ищутся str.find.
+        """
+        with self.lock:
+            digits = bin(bitmap)[2:]
+            top = len(digits) - 1
+            ids = []
+            index = -1
+            for number in range(stop):
+                index = digits.find('1', index + 1)
+                if index < 0:
+                    break
+                if number >= start:
+                    ids.append(positions[top - index])
+            return ids
+
+
+facet_index = FacetIndex()
+
+
+class FacetIds:
+    """id рецептов маски для пагинатора: число и срезы без запросов."""
+
+    def __init__(self, bitmap, positions):
+        self.bitmap = bitmap
+        self.positions = positions
+        self.total = None
+
+    def count(self):
+        """Число рецептов."""
+        if self.total is None:
+            self.total = popcount(self.bitmap)
+        return self.total
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop, _ = key.indices(self.count())
+        return facet_index.page(self.bitmap, self.positions, start, stop)
+
+
+class FacetResult:
+    """Рецепты маски для пагинатора.
+
+    Число рецептов берется из индекса, рецепты страницы загружаются
+    из queryset по id в порядке индекса.
+    """
+
+    def __init__(self, bitmap, positions, queryset):
+        self.ids = FacetIds(bitmap, positions)
+        self.queryset = queryset
+
+    def count(self):
+        """Число рецептов."""
+        return self.ids.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        ids = self.ids[key]
+        recipes = {
+            recipe.pk: recipe
+            for recipe in self.queryset.filter(pk__in=ids)
+        }
+        return [recipes[pk] for pk in ids if pk in recipes]
+
+
+def search(data, queryset):
+    """Рецепты по фильтрам из индекса или None.
+
+    None - индекс выключен или в запросе есть условия, которых
+    в индексе нет (DB_FILTERS): фильтрует БД.
+    """
+    if not in_index(data):
+        return None
+    return FacetResult(*facet_index.search(make_query(data)), queryset)
+
+
+def db_counts(filtered, query):
+    """Счетчики FacetIndex.counts запросами к БД.
+
+    filtered(skip) - рецепты по фильтрам запроса без параметров
+    измерения skip (None - со всеми фильтрами).
+    """
+    buckets = time_buckets()
+    times = filtered('cooking_time').aggregate(**{
+        f'bucket_{index}': Count('pk', filter=Q(
+            cooking_time__gte=low,
+            **({} if high is None else {'cooking_time__lte': high}),
+        ))
+        for index, (_, low, high) in enumerate(buckets)
+    })
+    ingredients = (*query['ingredients'], *query['exclude_ingredients'])
+    return {
+        'count': filtered(None).count(),
+        'tags': dict(
+            Recipe.tags.through.objects.filter(
+                recipe__in=filtered('tags').values('pk'),
+            ).order_by().values('tag_id').annotate(count=Count('pk'))
+            .values_list('tag_id', 'count'),
+        ),
+        'cooking_time': {
+            name: times[f'bucket_{index}']
+            for index, (name, _, _) in enumerate(buckets)
+        },
+        'ingredients': {
+            **dict.fromkeys(ingredients, 0),
+            **dict(
+                IngredientInRecipe.objects.filter(
+                    recipe__in=filtered('ingredients').values('pk'),
+                    ingredient__in=ingredients,
+                ).order_by().values('ingredient_id')
+                .annotate(count=Count('pk'))
+                .values_list('ingredient_id', 'count'),
+            ),
+        },
+    }
+
+
+def facets_metrics():
+    """Метрики индекса в формате (имя, значение)."""
+    yield 'foodgram_facets_recipes', len(facet_index.entries)
+    yield 'foodgram_facets_builds_total', facet_index.builds
+    yield 'foodgram_facets_compactions_total', facet_index.compactions
+    yield 'foodgram_facets_dead_positions', (
+        len(facet_index.positions) - len(facet_index.entries)
+    )
+    yield 'foodgram_facets_changes_total', facet_index.changes
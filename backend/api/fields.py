@@ -1,16 +1,54 @@
 import base64
+import hashlib
+import os
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from rest_framework import serializers
 
+from api.uploads import UPLOAD_PREFIX, uploaded_image
+
+
+def content_name(file):
+    """Имя файла по хэшу содержимого.
+
+    Файл с другим содержимым получает другое имя, поэтому ссылки
+    на файлы не меняют содержимое и кэшируются без проверки.
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    _, ext = os.path.splitext(file.name or '')
+    return f'{digest.hexdigest()[:16]}{ext.lower()}'
+
 
 class Base64ImageField(serializers.ImageField):
-    """Декодирование изображений."""
+    """Декодирование изображений.
+
+    Принимает файл из multipart/form-data, строку base64 и ссылку
+    upload:<токен> на загрузку (/api/uploads/). С DIRECT_UPLOADS_ONLY
+    принимаются только ссылки на загрузки.
+    """
 
     def to_internal_value(self, data):
-        """Декодирует изображения из формата base64."""
+        """Декодирует изображения из base64 и загрузок."""
+        if isinstance(data, str) and data.startswith(UPLOAD_PREFIX):
+            data = uploaded_image(
+                data[len(UPLOAD_PREFIX):], self.context['request'].user,
+            )
+            if isinstance(data, str):
+                # Ключ объекта в хранилище: картинку проверит
+                # фоновая задача validate_uploaded_image.
+                return data
+        elif settings.DIRECT_UPLOADS_ONLY:
+            raise serializers.ValidationError(
+                'Загрузите картинку через /api/uploads/.',
+            )
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
             data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+        image = super().to_internal_value(data)
+        image.name = content_name(image)
+        return image
@@ -0,0 +1,53 @@
+import mimetypes
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+
+SIGNING_SALT = 'api.files'
+
+
+def file_response(name, filename, content_type=None):
+    """Ответ с файлом из хранилища для скачивания.
+
+    Из объектного хранилища клиент скачивает файл сам по временной
+    ссылке. При заданном PROTECTED_MEDIA_LOCATION файл отдает nginx
+    по X-Accel-Redirect из внутреннего location, иначе - Django.
+    """
+    if hasattr(default_storage, 'signed_url'):
+        return HttpResponseRedirect(default_storage.signed_url(
+            name, filename, settings.SIGNED_URL_MAX_AGE,
+        ))
+    content_type = content_type or mimetypes.guess_type(filename)[0]
+    if settings.PROTECTED_MEDIA_LOCATION:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.PROTECTED_MEDIA_LOCATION + name
+        )
+    else:
+        response = FileResponse(
+            default_storage.open(name), content_type=content_type,
+        )
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+def load_signed_file(token):
+    """Имя файла и имя для скачивания из подписанной ссылки.
+
+    Вызывает signing.BadSignature для неверной или устаревшей ссылки.
+    """
+    return signing.loads(
+        token, salt=SIGNING_SALT, max_age=settings.SIGNED_URL_MAX_AGE,
+    )
+
+
+def signed_file_url(request, name, filename):
+    """Временная ссылка на файл без авторизации.
+
+    Ссылка подписана SECRET_KEY и действует SIGNED_URL_MAX_AGE секунд.
+    """
+    token = signing.dumps([name, filename], salt=SIGNING_SALT)
+    return request.build_absolute_uri(reverse('signed-file', args=[token]))
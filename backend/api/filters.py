@@ -1,6 +1,7 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
 
 
 class IngredientFilter(FilterSet):
@@ -19,8 +20,21 @@ class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all())
+        queryset=Tag.objects.all(),
+        method='filter_tags')
     author = filters.CharFilter(field_name='author')
+    cooking_time_min = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte',
+    )
+    cooking_time_max = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte',
+    )
+    ingredients = filters.ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(),
+        method='filter_ingredients')
+    exclude_ingredients = filters.ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(),
+        method='filter_exclude_ingredients')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart',
@@ -28,7 +42,45 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+            'cooking_time_min', 'cooking_time_max', 'ingredients',
+            'exclude_ingredients',
+        )
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов.
+
+        Подзапрос EXISTS вместо соединения с DISTINCT позволяет читать
+        рецепты по индексу pub_date до заполнения страницы.
+        """
+        if not value:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__in=value,
+            ),
+        ))
+
+    def filter_ingredients(self, queryset, name, value):
+        """Рецепты со всеми указанными ингредиентами."""
+        for ingredient in value:
+            queryset = queryset.filter(Exists(
+                IngredientInRecipe.objects.filter(
+                    recipe=OuterRef('pk'), ingredient=ingredient,
+                ),
+            ))
+        return queryset
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        """Рецепты без указанных ингредиентов."""
+        if not value:
+            return queryset
+        return queryset.filter(~Exists(
+            IngredientInRecipe.objects.filter(
+                recipe=OuterRef('pk'), ingredient__in=value,
+            ),
+        ))
 
     def filter_is_favorited(self, queryset, name, value):
         """Получение избранных рецептов."""
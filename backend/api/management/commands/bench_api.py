@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import (
+    api_scenarios, bench_settings, compare_results, format_table,
+    run_scenario, save_results,
+)
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Команда для замера производительности основных эндпоинтов API."""
+
+    help = ('Прогон основных запросов API через тестовый клиент '
+            'на данных seed_bench.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--only', nargs='*', default=(),
+            help='Запустить только указанные сценарии.',
+        )
+        parser.add_argument('--output', help='Файл для сохранения JSON.')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего запуска для сравнения.',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.1,
+            help='Допустимый рост задержки при сравнении (доля).',
+        )
+
+    def handle(self, *args, **options):
+        """Прогон сценариев."""
+        scenarios = api_scenarios()
+        if scenarios is None:
+            raise CommandError('Нет данных: выполните seed_bench.')
+        if options['only']:
+            unknown = set(options['only']) - set(scenarios)
+            if unknown:
+                raise CommandError(f'Неизвестные сценарии: {unknown}')
+            scenarios = {
+                name: scenario for name, scenario in scenarios.items()
+                if name in options['only']
+            }
+
+        results = []
+        with bench_settings():
+            for name, scenario in scenarios.items():
+                results.append(run_scenario(
+                    name, scenario, options['iterations'],
+                    warmup=options['warmup'],
+                ))
+        self.stdout.write(format_table(results))
+
+        if options['output']:
+            save_results(
+                options['output'], results,
+                iterations=options['iterations'],
+                recipes=Recipe.objects.count(),
+                users=User.objects.count(),
+            )
+        if options['compare']:
+            regressions = compare_results(
+                options['compare'], results, options['threshold'],
+            )
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            if regressions:
+                raise CommandError('Обнаружены регрессии.')
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from foodgram.cache import SharedMemoryCache
+
+# Значение размером с пару (пользователь, токен) в кэше токенов.
+VALUE = {'user': list(range(60)), 'token': 'f' * 40}
+
+
+def make_cache(kind, location):
+    """Кэш Django заданного вида без срока действия записей."""
+    params = {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': 100000}}
+    if kind == 'locmem':
+        return LocMemCache(location, params)
+    if kind == 'filebased':
+        return FileBasedCache(location, params)
+    return SharedMemoryCache(location, {'TIMEOUT': None})
+
+
+def zipf_keys(seed, count, keys):
+    """Ключи с распределением, близким к закону Ципфа."""
+    generator = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    return generator.choices(range(keys), weights, k=count)
+
+
+def hit_rate_worker(kind, location, seed, operations, keys):
+    """get с заполнением при промахе (~1 мс), возвращает число попаданий."""
+    cache = make_cache(kind, location)
+    hits = 0
+    for key in zipf_keys(seed, operations, keys):
+        if cache.get(key) is not None:
+            hits += 1
+            continue
+        time.sleep(0.001)
+        cache.set(key, VALUE)
+    return hits
+
+
+class Command(BaseCommand):
+    """Сравнение кэша в разделяемой памяти с LocMemCache и FileBasedCache."""
+
+    help = ('Замеряет время set и get (попадание и промах) в одном '
+            'процессе и долю попаданий, когда несколько процессов, как '
+            'воркеры gunicorn, читают одни и те же ключи.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--operations', type=int, default=20000)
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--keys', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        """Замер."""
+        operations = options['operations']
+        processes = options['processes']
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f'{"backend":<11}{"set us":>9}{"hit us":>9}{"miss us":>9}'
+            f'{"hit rate":>10}',
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for kind in ('locmem', 'filebased', 'shared'):
+                location = os.path.join(directory, kind)
+                cache = make_cache(kind, location)
+                timings = self.timings(cache, min(operations, 5000))
+                cache.clear()
+                with context.Pool(processes) as pool:
+                    hits = sum(pool.starmap(hit_rate_worker, [
+                        (kind, location, seed, operations // processes,
+                         options['keys'])
+                        for seed in range(processes)
+                    ]))
+                total = operations // processes * processes
+                self.stdout.write(
+                    f'{kind:<11}'
+                    + ''.join(f'{value * 1e6:>9.1f}' for value in timings)
+                    + f'{hits / total:>10.1%}',
+                )
+
+    @staticmethod
+    def timings(cache, operations):
+        """Среднее время set, get с попаданием и get с промахом, секунд."""
+        results = []
+        for name, run in (
+            ('set', lambda key: cache.set(key, VALUE)),
+            ('hit', lambda key: cache.get(key)),
+            ('miss', lambda key: cache.get(f'missing-{key}')),
+        ):
+            started = time.perf_counter()
+            for key in range(operations):
+                run(key)
+            results.append((time.perf_counter() - started) / operations)
+        return results
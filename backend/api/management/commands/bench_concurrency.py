@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+
+from api.benchmark import (
+    bench_settings, format_table, save_results, summarize,
+)
+
+
+class Command(BaseCommand):
+    """Сравнение пропускной способности синхронного и ASGI режимов."""
+
+    help = ('Прогон запросов через WSGI-обработчик последовательно '
+            '(как синхронный воркер) и через ASGI-обработчик '
+            'с заданным числом одновременных запросов.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument(
+            '--path', nargs='*',
+            default=['/api/recipes/', '/api/tags/', '/api/ingredients/'],
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--output', help='Файл для сохранения JSON.')
+
+    def handle(self, *args, **options):
+        """Прогон сценариев."""
+        if not settings.ASYNC_VIEWS:
+            raise CommandError(
+                'Асинхронные представления выключены: '
+                'запустите с SERVER_MODE=asgi или ASYNC_VIEWS=True.',
+            )
+        results = []
+        with bench_settings():
+            for path in options['path']:
+                results.append(self.run_sync(path, options['requests']))
+                results.append(asyncio.run(self.run_async(
+                    path, options['requests'], options['concurrency'],
+                )))
+        self.stdout.write(format_table(results))
+        if options['output']:
+            save_results(
+                options['output'], results,
+                concurrency=options['concurrency'],
+                async_db_threads=settings.ASYNC_DB_THREADS,
+            )
+
+    def run_sync(self, path, count):
+        """Последовательные запросы, как в синхронном воркере."""
+        client = Client()
+        client.get(path)
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(count):
+            request_started = time.perf_counter()
+            response = client.get(path)
+            latencies.append(time.perf_counter() - request_started)
+            errors += response.status_code != 200
+        elapsed = time.perf_counter() - started
+        return summarize(f'wsgi {path}', latencies, [], elapsed, errors)
+
+    async def run_async(self, path, count, concurrency):
+        """Одновременные запросы через ASGI-обработчик."""
+        client = AsyncClient()
+        await client.get(path)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def request():
+            nonlocal errors
+            async with semaphore:
+                request_started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - request_started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(count)))
+        elapsed = time.perf_counter() - started
+        return summarize(
+            f'asgi x{concurrency} {path}', latencies, [], elapsed, errors,
+        )
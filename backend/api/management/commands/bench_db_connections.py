@@ -0,0 +1,92 @@
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections
+
+from api.benchmark import format_table, save_results, summarize
+from foodgram.db.pool import pool_stats, reset_pools
+from recipes.models import Tag
+
+MODES = {
+    'connect': {'CONN_MAX_AGE': 0, 'POOL': None},
+    'persistent': {'CONN_MAX_AGE': 600, 'POOL': None},
+    'pool': {'CONN_MAX_AGE': 0, 'POOL': {'MIN_SIZE': 2, 'MAX_SIZE': 20}},
+}
+
+
+class Command(BaseCommand):
+    """Сравнение задержки запросов с разными режимами соединений с БД."""
+
+    help = ('Имитация HTTP-запросов с одним запросом к БД: новое '
+            'соединение на запрос, постоянные соединения и пул.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument(
+            '--mode', nargs='*', choices=MODES, default=list(MODES),
+        )
+        parser.add_argument('--output', help='Файл для сохранения JSON.')
+
+    def handle(self, *args, **options):
+        """Прогон режимов."""
+        if connection.settings_dict['ENGINE'] != 'foodgram.db.postgresql':
+            raise CommandError('Бенчмарк рассчитан на PostgreSQL.')
+        original = {
+            key: connection.settings_dict.get(key) for key in MODES['pool']
+        }
+        results = []
+        try:
+            for mode in options['mode']:
+                results.append(self.run_mode(
+                    mode, options['requests'], options['threads'],
+                ))
+        finally:
+            self.configure(original)
+        self.stdout.write(format_table(results))
+        if options['output']:
+            save_results(
+                options['output'], results, threads=options['threads'],
+            )
+
+    def configure(self, values):
+        """Меняет настройки соединения во всех потоках."""
+        connections.close_all()
+        connections.settings['default'].update(values)
+        reset_pools()
+
+    def run_mode(self, mode, count, threads):
+        """Прогон одного режима."""
+        self.configure(MODES[mode])
+
+        def request():
+            started = time.perf_counter()
+            close_old_connections()
+            list(Tag.objects.all()[:1])
+            close_old_connections()
+            return time.perf_counter() - started
+
+        def worker(requests):
+            try:
+                return [request() for _ in range(requests)]
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [
+                executor.submit(worker, count // threads)
+                for _ in range(threads)
+            ]
+            latencies = [
+                latency for future in futures for latency in future.result()
+            ]
+        elapsed = time.perf_counter() - started
+        result = summarize(f'{mode} x{threads}', latencies, [], elapsed)
+        stats = pool_stats('default')
+        if stats is not None:
+            result['pool'] = stats
+        return result
@@ -0,0 +1,186 @@
+import asyncio
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.asynchronous import offload
+from api.benchmark import format_table, save_results, summarize
+from api.events import author_channel, event_stream, send_message, sse_frame
+from recipes.models import Follow
+
+
+class Connection:
+    """Клиент потока событий в памяти: ASGI receive/send без сокета."""
+
+    def __init__(self, token):
+        self.scope = {
+            'type': 'http', 'method': 'GET', 'path': '/api/events/',
+            'query_string': b'',
+            'headers': [(b'authorization', f'Token {token}'.encode())],
+        }
+        self.ready = asyncio.Event()
+        self.received = asyncio.Event()
+        self.closed = asyncio.Event()
+        self.status = None
+        self.ready_at = None
+        self.received_at = None
+
+    async def receive(self):
+        """Соединение остается открытым до закрытия клиентом."""
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        """Отметки о начале потока и о полученном событии."""
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+            if self.status != 200:
+                self.ready_at = time.perf_counter()
+                self.ready.set()
+            return
+        body = message.get('body', b'')
+        if body.startswith(b'retry:'):
+            self.ready_at = time.perf_counter()
+            self.ready.set()
+        elif body.startswith(b'event:'):
+            self.received_at = time.perf_counter()
+            self.received.set()
+
+
+class Command(BaseCommand):
+    """Нагрузочная проверка потока событий большим числом соединений."""
+
+    help = ('Открывает заданное число соединений /api/events/ в одном '
+            'процессе, измеряет время подключения, память на соединение '
+            'и задержку доставки события о новом рецепте всем '
+            'подписчикам автора. Нужны данные seed_bench.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--rounds', type=int, default=10)
+        parser.add_argument(
+            '--users', type=int, default=100,
+            help='Число подписчиков, между которыми делятся соединения.',
+        )
+        parser.add_argument(
+            '--broker',
+            help='Класс брокера, по умолчанию EVENTS_BROKER или LocalBroker.',
+        )
+        parser.add_argument('--output', help='Файл для сохранения JSON.')
+
+    def handle(self, *args, **options):
+        """Прогон сценария."""
+        author = (
+            Follow.objects.values('author_id')
+            .annotate(followers=Count('id')).order_by('-followers').first()
+        )
+        if author is None:
+            raise CommandError(
+                'Нет подписок: сначала выполните manage.py seed_bench.',
+            )
+        author_id = author['author_id']
+        tokens = [
+            Token.objects.get_or_create(user_id=user_id)[0].key
+            for user_id in Follow.objects.filter(author_id=author_id)
+            .values_list('user_id', flat=True)[:options['users']]
+        ]
+        broker = (
+            options['broker'] or settings.EVENTS_BROKER
+            or 'api.events.LocalBroker'
+        )
+        with override_settings(
+            EVENTS_BROKER=broker,
+            EVENTS_MAX_CONNECTIONS=options['connections'] + 1,
+        ):
+            results, memory = asyncio.run(self.run(
+                author_id, tokens, options['connections'], options['rounds'],
+            ))
+        self.stdout.write(format_table(results))
+        self.stdout.write(
+            f'Брокер: {broker}, '
+            f'память на соединение: {memory / 1024:.1f} КБ',
+        )
+        if options['output']:
+            save_results(
+                options['output'], results,
+                connections=options['connections'],
+                broker=broker,
+                memory_per_connection=memory,
+            )
+
+    async def run(self, author_id, tokens, count, rounds):
+        """Подключение, рассылки и отключение соединений."""
+        connections = [
+            Connection(tokens[index % len(tokens)]) for index in range(count)
+        ]
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        tasks = [
+            asyncio.ensure_future(event_stream(
+                connection.scope, connection.receive, connection.send,
+            ))
+            for connection in connections
+        ]
+        await asyncio.gather(*(
+            connection.ready.wait() for connection in connections
+        ))
+        connect_latencies = [
+            connection.ready_at - started for connection in connections
+        ]
+        connect_elapsed = time.perf_counter() - started
+        memory = (
+            tracemalloc.get_traced_memory()[0] - memory_before
+        ) / count
+        tracemalloc.stop()
+        errors = sum(connection.status != 200 for connection in connections)
+        results = [summarize(
+            f'connect x{count}', connect_latencies, [], connect_elapsed,
+            errors,
+        )]
+
+        # PostgresBroker начинает LISTEN в отдельном потоке
+        # при первой подписке.
+        await asyncio.sleep(0.5)
+        fanout_latencies = []
+        missed = 0
+        started = time.perf_counter()
+        for index in range(rounds):
+            for connection in connections:
+                connection.received.clear()
+            published = time.perf_counter()
+            await offload(
+                send_message, author_channel(author_id),
+                sse_frame('recipe', {'id': index, 'author': author_id}),
+            )
+            try:
+                await asyncio.wait_for(asyncio.gather(*(
+                    connection.received.wait() for connection in connections
+                    if connection.status == 200
+                )), 10)
+            except asyncio.TimeoutError:
+                pass
+            for connection in connections:
+                if connection.status != 200:
+                    continue
+                if connection.received.is_set():
+                    fanout_latencies.append(
+                        connection.received_at - published,
+                    )
+                else:
+                    missed += 1
+        results.append(summarize(
+            f'fanout x{count}', fanout_latencies, [],
+            time.perf_counter() - started, missed,
+        ))
+
+        for connection in connections:
+            connection.closed.set()
+        await asyncio.gather(*tasks)
+        return results, memory
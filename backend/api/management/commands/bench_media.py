@@ -0,0 +1,109 @@
+import json
+import re
+import time
+import urllib.error
+import urllib.request
+
+from urllib.parse import urljoin
+
+from django.core.management.base import BaseCommand, CommandError
+
+MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+class BrowserCache:
+    """Кэш HTTP-клиента с учетом Cache-Control, ETag и Last-Modified."""
+
+    def __init__(self):
+        self.entries = {}
+        self.stats = dict.fromkeys(
+            ('requests', 'not_modified', 'cached', 'bytes'), 0,
+        )
+
+    def get(self, url):
+        """Содержимое по ссылке из кэша или с сервера."""
+        entry = self.entries.get(url)
+        if entry is not None and entry['expires'] > time.monotonic():
+            self.stats['cached'] += 1
+            return entry['body']
+        request = urllib.request.Request(url)
+        if entry is not None:
+            for header, validator in (
+                ('If-None-Match', 'etag'),
+                ('If-Modified-Since', 'last_modified'),
+            ):
+                if entry[validator]:
+                    request.add_header(header, entry[validator])
+        self.stats['requests'] += 1
+        try:
+            with urllib.request.urlopen(request) as response:
+                body = response.read()
+                headers = response.headers
+        except urllib.error.HTTPError as error:
+            if error.code != 304 or entry is None:
+                raise
+            self.stats['not_modified'] += 1
+            entry['expires'] = self.expires(error.headers)
+            return entry['body']
+        self.stats['bytes'] += len(body)
+        self.entries[url] = {
+            'body': body,
+            'expires': self.expires(headers),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        }
+        return body
+
+    @staticmethod
+    def expires(headers):
+        """Момент устаревания ответа по Cache-Control."""
+        cache_control = headers.get('Cache-Control', '')
+        match = MAX_AGE.search(cache_control)
+        if 'no-cache' in cache_control or match is None:
+            return 0
+        return time.monotonic() + int(match.group(1))
+
+
+class Command(BaseCommand):
+    """Подсчет запросов к картинкам при повторных просмотрах ленты."""
+
+    help = ('Открывает ленту рецептов несколько раз клиентом с кэшем '
+            'браузера и считает запросы, ответы 304 и переданные байты. '
+            'Запускается против nginx из docker-compose.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--base-url', default='http://localhost/')
+        parser.add_argument('--visits', type=int, default=5)
+        parser.add_argument('--pages', type=int, default=3)
+        parser.add_argument('--limit', type=int, default=6)
+
+    def handle(self, *args, **options):
+        """Прогон просмотров."""
+        api = BrowserCache()
+        media = BrowserCache()
+        base_url = options['base_url']
+        for _ in range(options['visits']):
+            for page in range(1, options['pages'] + 1):
+                url = urljoin(
+                    base_url,
+                    f'/api/recipes/?page={page}&limit={options["limit"]}',
+                )
+                try:
+                    data = json.loads(api.get(url))
+                except (OSError, ValueError) as error:
+                    raise CommandError(f'{url}: {error}')
+                for recipe in data['results']:
+                    media.get(urljoin(base_url, recipe['image']))
+
+        self.stdout.write(
+            f'{"ресурс":<10}{"запросов":>10}{"304":>8}'
+            f'{"из кэша":>10}{"байт":>12}',
+        )
+        for name, cache in (('api', api), ('картинки', media)):
+            stats = cache.stats
+            self.stdout.write(
+                f'{name:<10}{stats["requests"]:>10}'
+                f'{stats["not_modified"]:>8}{stats["cached"]:>10}'
+                f'{stats["bytes"]:>12}',
+            )
@@ -0,0 +1,80 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.benchmark import bench_settings
+from recipes.management.commands.seed_bench import USER_PREFIX
+from recipes.models import Recipe
+
+User = get_user_model()
+
+# Способы сборки ответа: настройки, с которыми выполняется запрос.
+PATHS = {
+    'serializer': {'RECIPE_DOCUMENTS': False, 'RECIPE_SQL_JSON': False},
+    'documents': {'RECIPE_DOCUMENTS': True, 'RECIPE_SQL_JSON': False},
+    'sql': {'RECIPE_DOCUMENTS': False, 'RECIPE_SQL_JSON': True},
+}
+
+
+class Command(BaseCommand):
+    """Замер сборки JSON рецептов разными способами."""
+
+    help = ('Запрашивает список и карточку рецепта данных seed_bench '
+            'всеми способами сборки ответа и выводит процессорное '
+            'время приложения на запрос. Совпадение ответов проверяет '
+            'tests/test_recipe_json.py.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        """Замер."""
+        if connection.vendor != 'postgresql':
+            raise CommandError('JSON собирается только в PostgreSQL.')
+        user = (
+            User.objects.filter(username__startswith=USER_PREFIX)
+            .annotate(cart=Count('shopping_cart'))
+            .filter(cart__gt=0).order_by('id').first()
+        )
+        if user is None:
+            raise CommandError('Нет данных: выполните seed_bench.')
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        scenarios = {
+            'recipes_list': f'/api/recipes/?limit={options["limit"]}',
+            'recipe_detail': f'/api/recipes/{Recipe.objects.first().pk}/',
+        }
+        with bench_settings():
+            self.benchmark(client, options['iterations'], scenarios)
+
+    def benchmark(self, client, iterations, scenarios):
+        """Процессорное время приложения на запрос для каждого способа.
+
+        Время PostgreSQL не учитывается: time.process_time считает
+        только текущий процесс.
+        """
+        self.stdout.write(f'{"scenario":<20}' + ''.join(
+            f'{path + " ms":>16}' for path in PATHS
+        ))
+        for name, url in scenarios.items():
+            cpu = {}
+            for path, overrides in PATHS.items():
+                with override_settings(**overrides):
+                    client.get(url)
+                    started = time.process_time()
+                    for _ in range(iterations):
+                        client.get(url)
+                    cpu[path] = (
+                        (time.process_time() - started) / iterations * 1000
+                    )
+            self.stdout.write(f'{name:<20}' + ''.join(
+                f'{value:>16.2f}' for value in cpu.values()
+            ))
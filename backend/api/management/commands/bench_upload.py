@@ -0,0 +1,225 @@
+import base64
+import json
+import math
+import os
+import sys
+import tempfile
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.benchmark import bench_settings
+from recipes.management.commands.seed_bench import USER_PREFIX
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+MB = 1024 * 1024
+
+# Префикс названий рецептов, созданных командой.
+NAME_PREFIX = 'bench-upload-'
+
+
+class Command(BaseCommand):
+    """Пиковая память при загрузке картинки рецепта разными способами."""
+
+    help = ('Создает рецепт с картинкой заданного размера через JSON '
+            'с base64, multipart/form-data и загрузку по частям, '
+            'измеряет пиковую память Python на запрос (tracemalloc) '
+            'и завершается с ошибкой, если multipart или загрузка '
+            'по частям превышают предел.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--size-mb', type=float, default=10)
+        parser.add_argument('--chunk-mb', type=float, default=2)
+        parser.add_argument(
+            '--max-peak-mb', type=float,
+            help='Предел памяти multipart и загрузки по частям, по '
+                 'умолчанию FILE_UPLOAD_MAX_MEMORY_SIZE + 1 МБ.',
+        )
+
+    def handle(self, *args, **options):
+        """Замер и проверка предела."""
+        user = User.objects.filter(
+            username__startswith=USER_PREFIX,
+        ).order_by('id').first()
+        tag = Tag.objects.first()
+        ingredient = Ingredient.objects.first()
+        if user is None or tag is None or ingredient is None:
+            raise CommandError('Нет данных: выполните seed_bench.')
+        self.token = Token.objects.get_or_create(user=user)[0].key
+        self.recipe = {
+            'tags': [tag.pk],
+            'ingredients': [{'id': ingredient.pk, 'amount': 1}],
+            'text': 'Рецепт для замера загрузки картинки.',
+            'cooking_time': 10,
+        }
+        self.handler = WSGIHandler()
+        size = int(options['size_mb'] * MB)
+        limit = (
+            options['max_peak_mb'] * MB if options['max_peak_mb']
+            else settings.FILE_UPLOAD_MAX_MEMORY_SIZE + MB
+        )
+
+        with tempfile.TemporaryDirectory() as directory, bench_settings():
+            with override_settings(UPLOAD_DIR=directory):
+                self.directory = directory
+                tracemalloc.start()
+                try:
+                    results = [
+                        ('json_base64', *self.json_base64(size)),
+                        ('multipart', *self.multipart(size)),
+                        ('chunked', *self.chunked(
+                            size, int(options['chunk_mb'] * MB),
+                        )),
+                    ]
+                finally:
+                    tracemalloc.stop()
+                    self.cleanup()
+
+        self.stdout.write(
+            f'Картинка {size / MB:.1f} МБ, предел {limit / MB:.1f} МБ',
+        )
+        self.stdout.write(f'{"scenario":<14}{"status":>8}{"peak MB":>10}')
+        for name, status, peak in results:
+            self.stdout.write(f'{name:<14}{status:>8}{peak / MB:>10.2f}')
+        failed = [
+            name for name, status, peak in results
+            if status not in (200, 201)
+            or name != 'json_base64' and peak > limit
+        ]
+        if failed:
+            raise CommandError(
+                f'Ошибка или превышен предел памяти: {", ".join(failed)}.',
+            )
+
+    def image_file(self, size):
+        """PNG из случайных пикселей примерно size байт на диске."""
+        side = int(math.sqrt(size / 3))
+        path = os.path.join(self.directory, f'{uuid.uuid4().hex}.png')
+        Image.frombytes(
+            'RGB', (side, side), os.urandom(side * side * 3),
+        ).save(path, compress_level=1)
+        return path
+
+    def body_file(self, body):
+        """Тело запроса во временном файле, чтобы не держать его в памяти."""
+        path = os.path.join(self.directory, uuid.uuid4().hex)
+        with open(path, 'wb') as file:
+            file.write(body)
+        return path
+
+    def request(self, method, path, body_path, content_type,
+                offset=0, length=None, headers=None):
+        """Запрос к WSGI-обработчику и пиковая память на него.
+
+        Тело читается обработчиком из файла, поэтому в замер попадает
+        только память, выделенная при обработке запроса.
+        """
+        if length is None:
+            length = os.path.getsize(body_path) - offset
+        with open(body_path, 'rb') as body:
+            body.seek(offset)
+            environ = {
+                'REQUEST_METHOD': method,
+                'PATH_INFO': path,
+                'QUERY_STRING': '',
+                'SERVER_NAME': 'testserver',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'CONTENT_TYPE': content_type,
+                'CONTENT_LENGTH': str(length),
+                'HTTP_AUTHORIZATION': f'Token {self.token}',
+                'wsgi.input': body,
+                'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http',
+                'wsgi.multithread': False,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+                **(headers or {}),
+            }
+            statuses = []
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            response = self.handler(
+                environ, lambda status, headers: statuses.append(status),
+            )
+            content = b''.join(response)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            response.close()
+        return int(statuses[0].split()[0]), peak, content
+
+    def recipe_data(self):
+        """Поля нового рецепта без картинки."""
+        return {**self.recipe, 'name': NAME_PREFIX + uuid.uuid4().hex}
+
+    def json_base64(self, size):
+        """Картинка строкой base64 в JSON."""
+        with open(self.image_file(size), 'rb') as file:
+            image = base64.b64encode(file.read()).decode()
+        body = self.body_file(json.dumps({
+            **self.recipe_data(), 'image': f'data:image/png;base64,{image}',
+        }).encode())
+        del image
+        status, peak, _ = self.request(
+            'POST', '/api/recipes/', body, 'application/json',
+        )
+        return status, peak
+
+    def multipart(self, size):
+        """Картинка частью multipart/form-data, поля - частью data."""
+        with open(self.image_file(size), 'rb') as image:
+            body = self.body_file(encode_multipart(BOUNDARY, {
+                'data': json.dumps(self.recipe_data()),
+                'image': image,
+            }))
+        status, peak, _ = self.request(
+            'POST', '/api/recipes/', body, MULTIPART_CONTENT,
+        )
+        return status, peak
+
+    def chunked(self, size, chunk):
+        """Загрузка по частям и рецепт со ссылкой на нее."""
+        image = self.image_file(size)
+        total = os.path.getsize(image)
+        status, peak, content = self.request(
+            'POST', '/api/uploads/', self.body_file(json.dumps({
+                'size': total, 'name': 'image.png',
+            }).encode()), 'application/json',
+        )
+        if status != 201:
+            return status, peak
+        upload = json.loads(content)
+        peaks = [peak]
+        for offset in range(0, total, chunk):
+            status, peak, _ = self.request(
+                'PATCH', f'/api/uploads/{upload["id"]}/', image,
+                'application/offset+octet-stream',
+                offset=offset, length=min(chunk, total - offset),
+                headers={'HTTP_UPLOAD_OFFSET': str(offset)},
+            )
+            peaks.append(peak)
+            if status != 200:
+                return status, max(peaks)
+        status, peak, _ = self.request(
+            'POST', '/api/recipes/', self.body_file(json.dumps({
+                **self.recipe_data(), 'image': upload['image'],
+            }).encode()), 'application/json',
+        )
+        return status, max(*peaks, peak)
+
+    @staticmethod
+    def cleanup():
+        """Удаление рецептов команды и их картинок."""
+        for recipe in Recipe.objects.filter(name__startswith=NAME_PREFIX):
+            recipe.image.delete(save=False)
+            recipe.delete()
@@ -0,0 +1,124 @@
+import io
+import json
+import os
+import uuid
+
+import requests
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.benchmark import bench_settings
+from api.uploads import INCOMING_PREFIX, direct_uploads
+from recipes.management.commands.seed_bench import USER_PREFIX
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+# Префикс названий рецептов, созданных командой.
+NAME_PREFIX = 'check-storage-'
+
+
+class Command(BaseCommand):
+    """Проверка загрузки картинок напрямую в объектное хранилище."""
+
+    help = ('Загружает картинку и файл, не являющийся картинкой, '
+            'по подписанной форме из /api/uploads/, создает рецепты '
+            'со ссылками на загрузки и выполняет проверку картинок '
+            'сразу. Завершается с ошибкой, если картинка не заменена '
+            'проверенной копией или файл не отклонен.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument(
+            '--create-bucket', action='store_true',
+            help='Создать бакет OBJECT_STORAGE_BUCKET, если его нет.',
+        )
+
+    def handle(self, *args, **options):
+        """Проверка."""
+        if not direct_uploads():
+            raise CommandError('Объектное хранилище не настроено: '
+                               'задайте OBJECT_STORAGE_BUCKET.')
+        if options['create_bucket']:
+            bucket = default_storage.bucket
+            if bucket.creation_date is None:
+                bucket.create()
+        user = User.objects.filter(
+            username__startswith=USER_PREFIX,
+        ).order_by('id').first()
+        tag = Tag.objects.first()
+        ingredient = Ingredient.objects.first()
+        if user is None or tag is None or ingredient is None:
+            raise CommandError('Нет данных: выполните seed_bench.')
+        self.client = Client(
+            HTTP_AUTHORIZATION=(
+                f'Token {Token.objects.get_or_create(user=user)[0].key}'
+            ),
+        )
+        self.recipe = {
+            'tags': [tag.pk],
+            'ingredients': [{'id': ingredient.pk, 'amount': 1}],
+            'text': 'Рецепт для проверки объектного хранилища.',
+            'cooking_time': 10,
+        }
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+        with bench_settings(), override_settings(TASKS_EAGER=True):
+            try:
+                image = self.create_recipe(buffer.getvalue())
+                rejected = self.create_recipe(os.urandom(4096))
+            finally:
+                self.cleanup()
+        if image.startswith(INCOMING_PREFIX) or not image:
+            raise CommandError(f'Картинка не проверена: {image!r}.')
+        if rejected:
+            raise CommandError(f'Файл не отклонен: {rejected!r}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинка сохранена как {image}, файл не-картинка отклонен.',
+        ))
+
+    def create_recipe(self, content):
+        """Загрузка файла в хранилище и рецепт с ним.
+
+        Возвращает имя картинки рецепта после проверки.
+        """
+        response = self.client.post(
+            '/api/uploads/', {'size': len(content), 'name': 'image.png'},
+            content_type='application/json',
+        )
+        if response.status_code != 201:
+            raise CommandError(f'/api/uploads/: {response.status_code}')
+        upload = response.json()
+        stored = requests.post(
+            upload['url'], data=upload['fields'],
+            files={'file': ('image.png', content)}, timeout=30,
+        )
+        if stored.status_code not in (200, 201, 204):
+            raise CommandError(f'Хранилище: {stored.status_code} '
+                               f'{stored.text[:200]}')
+        response = self.client.post(
+            '/api/recipes/', json.dumps({
+                **self.recipe,
+                'name': NAME_PREFIX + uuid.uuid4().hex,
+                'image': upload['image'],
+            }), content_type='application/json',
+        )
+        if response.status_code != 201:
+            raise CommandError(f'/api/recipes/: {response.status_code} '
+                               f'{response.content[:200]!r}')
+        return Recipe.objects.get(pk=response.json()['id']).image.name
+
+    @staticmethod
+    def cleanup():
+        """Удаление рецептов команды и их картинок."""
+        for recipe in Recipe.objects.filter(name__startswith=NAME_PREFIX):
+            if recipe.image:
+                recipe.image.delete(save=False)
+            recipe.delete()
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.benchmark import api_scenarios, bench_settings, seq_scans
+
+
+class Command(BaseCommand):
+    """Проверка планов запросов основных эндпоинтов API."""
+
+    help = ('Выполняет основные запросы API на данных seed_bench, '
+            'получает EXPLAIN каждого SELECT и завершается с ошибкой, '
+            'если большая таблица читается последовательно.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument(
+            '--min-rows', type=int, default=10000,
+            help='Меньшие таблицы можно читать последовательно.',
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Обновить статистику таблиц перед проверкой.',
+        )
+        parser.add_argument(
+            '--only', nargs='*', default=(),
+            help='Проверить только указанные сценарии.',
+        )
+
+    def handle(self, *args, **options):
+        """Проверка планов."""
+        if connection.vendor != 'postgresql':
+            raise CommandError('Планы проверяются только в PostgreSQL.')
+        scenarios = api_scenarios()
+        if scenarios is None:
+            raise CommandError('Нет данных: выполните seed_bench.')
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.table_rows = {}
+
+        problems = []
+        with bench_settings():
+            for name, scenario in scenarios.items():
+                if options['only'] and name not in options['only']:
+                    continue
+                with CaptureQueriesContext(connection) as context:
+                    scenario()
+                for query in context.captured_queries:
+                    problems.extend(
+                        (name, table, query['sql'])
+                        for table in seq_scans(query['sql'])
+                        if self.rows(table) >= options['min_rows']
+                    )
+
+        for name, table, sql in problems:
+            self.stdout.write(self.style.ERROR(
+                f'{name}: Seq Scan по {table}\n    {sql}',
+            ))
+        if problems:
+            raise CommandError(
+                f'Последовательное чтение больших таблиц: {len(problems)}.',
+            )
+        self.stdout.write(self.style.SUCCESS('Планы запросов в порядке.'))
+
+    def rows(self, table):
+        """Оценка числа строк таблицы по статистике."""
+        if table not in self.table_rows:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [table],
+                )
+                self.table_rows[table] = cursor.fetchone()[0]
+        return self.table_rows[table]
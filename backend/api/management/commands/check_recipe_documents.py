@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.serializers import render_recipe_documents, save_recipe_documents
+from recipes.models import Recipe, RecipeDocument
+
+
+class Command(BaseCommand):
+    """Проверка готовых представлений рецептов (RecipeDocument)."""
+
+    help = ('Собирает представление каждого рецепта заново и сравнивает '
+            'с сохраненным. С --fix пересобирает отсутствующие '
+            'и устаревшие, без него завершается с ошибкой при различиях.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Пересобрать отсутствующие и устаревшие представления.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.RECIPE_DOCUMENT_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        """Проверка порциями по id рецептов."""
+        missing = stale = checked = 0
+        last_pk = 0
+        while True:
+            recipe_ids = list(Recipe.objects.filter(
+                pk__gt=last_pk,
+            ).order_by('pk').values_list(
+                'pk', flat=True,
+            )[:options['batch_size']])
+            if not recipe_ids:
+                break
+            last_pk = recipe_ids[-1]
+            stored = dict(RecipeDocument.objects.filter(
+                recipe_id__in=recipe_ids,
+            ).values_list('recipe_id', 'data'))
+            wrong = []
+            for pk, data in render_recipe_documents(recipe_ids).items():
+                if pk not in stored:
+                    missing += 1
+                elif stored[pk] != data:
+                    stale += 1
+                else:
+                    continue
+                wrong.append(pk)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Рецепт {pk}: расходится.')
+            checked += len(recipe_ids)
+            if wrong and options['fix']:
+                save_recipe_documents(wrong)
+
+        self.stdout.write(
+            f'Проверено: {checked}, отсутствует: {missing}, '
+            f'устарело: {stale}.',
+        )
+        if (missing or stale) and not options['fix']:
+            raise CommandError(
+                'Представления расходятся с рецептами: '
+                'выполните с --fix.',
+            )
+        if missing or stale:
+            self.stdout.write(self.style.SUCCESS('Представления пересобраны.'))
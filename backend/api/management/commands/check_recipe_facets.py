@@ -0,0 +1,133 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from api.benchmark import bench_settings
+from api.facets import facet_index, time_buckets
+from recipes.models import IngredientInRecipe, Recipe, Tag
+
+
+class Command(BaseCommand):
+    """Сравнение фильтров по битовому индексу с фильтрами в БД."""
+
+    help = ('Выполняет случайные запросы списка рецептов и счетчиков '
+            '/api/recipes/facets/ с индексом и без него, завершается '
+            'с ошибкой при различии ответов и выводит время построения '
+            'индекса и ответа по нему. Нужны данные seed_bench.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument(
+            '--queries', type=int, default=100,
+            help='Число случайных запросов.',
+        )
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Сравнение и замер."""
+        if not Recipe.objects.exists():
+            raise CommandError('Нет данных: выполните seed_bench.')
+        generator = random.Random(options['seed'])
+        tags = list(Tag.objects.values_list('slug', flat=True))
+        ingredients = list(
+            IngredientInRecipe.objects.values_list(
+                'ingredient_id', flat=True,
+            ).distinct()[:200],
+        )
+        urls = [
+            self.random_query(generator, tags, ingredients, options['limit'])
+            for _ in range(options['queries'])
+        ]
+
+        client = Client()
+        mismatches = 0
+        with bench_settings():
+            for query in urls:
+                for path in ('/api/recipes/', '/api/recipes/facets/'):
+                    expected = self.get(client, path + query, False)
+                    actual = self.get(client, path + query, True)
+                    if expected != actual:
+                        mismatches += 1
+                        self.stdout.write(self.style.ERROR(
+                            f'{path}{query}: ответы различаются',
+                        ))
+            self.stdout.write(
+                f'Сравнено ответов: {len(urls) * 2}, '
+                f'различий: {mismatches}.',
+            )
+            with override_settings(RECIPE_FACETS=True):
+                self.benchmark(generator, tags, ingredients)
+        if mismatches:
+            raise CommandError('Ответы различаются.')
+
+    @staticmethod
+    def random_query(generator, tags, ingredients, limit):
+        """Строка запроса со случайным сочетанием фильтров."""
+        params = [f'limit={limit}', f'page={generator.randint(1, 3)}']
+        for slug in generator.sample(tags, generator.randint(0, 2)):
+            params.append(f'tags={slug}')
+        if generator.random() < 0.5:
+            params.append(f'cooking_time_max={generator.choice((20, 45, 90))}')
+        if generator.random() < 0.3:
+            params.append(f'cooking_time_min={generator.choice((10, 30))}')
+        count = min(len(ingredients), generator.randint(0, 2))
+        for ingredient in generator.sample(ingredients, count):
+            params.append(f'ingredients={ingredient}')
+        if ingredients and generator.random() < 0.3:
+            params.append(
+                f'exclude_ingredients={generator.choice(ingredients)}',
+            )
+        return '?' + '&'.join(params)
+
+    @staticmethod
+    def get(client, url, facets):
+        """Код и тело ответа с индексом или без него.
+
+        Сравниваются и ответы с ошибкой: страница за пределами
+        результатов должна давать 404 в обоих случаях.
+        """
+        with override_settings(RECIPE_FACETS=facets):
+            response = client.get(url)
+        return response.status_code, response.content
+
+    def benchmark(self, generator, tags, ingredients):
+        """Время построения индекса и ответов по нему."""
+        tag_ids = list(Tag.objects.filter(slug__in=tags).values_list(
+            'pk', flat=True,
+        ))
+        started = time.perf_counter()
+        facet_index.build(Recipe.objects.db)
+        self.stdout.write(
+            f'Построение индекса: {len(facet_index.entries)} рецептов, '
+            f'{(time.perf_counter() - started) * 1000:.1f} мс.',
+        )
+        buckets = [high for _, _, high in time_buckets() if high]
+        queries = [
+            {
+                'tags': tuple(generator.sample(
+                    tag_ids, min(len(tag_ids), generator.randint(0, 2)),
+                )),
+                'ingredients': tuple(generator.sample(
+                    ingredients, min(len(ingredients), 1),
+                )),
+                'exclude_ingredients': (),
+                'cooking_time': (None, generator.choice(buckets)),
+            }
+            for _ in range(200)
+        ]
+        for name, run in (
+            ('search', lambda query: facet_index.search(query)),
+            ('counts', lambda query: facet_index.counts(query)),
+            ('page', lambda query: facet_index.page(
+                *facet_index.search(query), 0, 50,
+            )),
+        ):
+            started = time.perf_counter()
+            for query in queries:
+                run(query)
+            elapsed = (time.perf_counter() - started) / len(queries)
+            self.stdout.write(f'{name:<8}{elapsed * 1e6:>10.1f} мкс')
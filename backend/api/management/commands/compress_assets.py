@@ -0,0 +1,73 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import compression
+
+EXTENSIONS = (
+    '.css', '.html', '.js', '.json', '.map', '.svg', '.txt', '.xml',
+    '.yaml', '.yml',
+)
+# Сжатие выполняется один раз, поэтому с максимальной степенью.
+GZIP_LEVEL = 9
+
+
+class Command(BaseCommand):
+    """Запись сжатых копий статики и документации."""
+
+    help = ('Создает рядом со статическими файлами и документацией '
+            'копии .gz для отдачи nginx (gzip_static) без сжатия '
+            'на лету.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument(
+            'paths', nargs='*',
+            default=[settings.STATIC_ROOT, settings.BASE_DIR / 'docs'],
+        )
+        parser.add_argument(
+            '--min-size', type=int, default=settings.COMPRESSION_MIN_SIZE,
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать существующие сжатые копии.',
+        )
+
+    def handle(self, *args, **options):
+        """Сжатие файлов."""
+        written = original = compressed = 0
+        for path in self.files(options['paths'], options['min_size']):
+            target = path + '.gz'
+            if not options['force'] and self.is_fresh(path, target):
+                continue
+            with open(path, 'rb') as file:
+                data = file.read()
+            content = compression.compress(data, 'gzip', level=GZIP_LEVEL)
+            with open(target, 'wb') as file:
+                file.write(content)
+            written += 1
+            original += len(data)
+            compressed += len(content)
+        self.stdout.write(
+            f'Записано файлов: {written}, {original} -> {compressed} байт.',
+        )
+
+    @staticmethod
+    def files(paths, min_size):
+        """Файлы подходящих типов не меньше min_size байт."""
+        for root_path in paths:
+            for root, _, names in os.walk(root_path):
+                for name in names:
+                    path = os.path.join(root, name)
+                    if (name.endswith(EXTENSIONS)
+                            and os.path.getsize(path) >= min_size):
+                        yield path
+
+    @staticmethod
+    def is_fresh(path, target):
+        """Сжатая копия существует и не старше исходного файла."""
+        return (
+            os.path.exists(target)
+            and os.path.getmtime(target) >= os.path.getmtime(path)
+        )
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.metrics import load_snapshots
+
+
+class Command(BaseCommand):
+    """Команда для вывода сводки метрик по представлениям."""
+
+    help = 'Сводка метрик запросов по снимкам всех процессов.'
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument(
+            '--sort', default='total',
+            choices=('total', 'count', 'p99', 'queries', 'duplicates'),
+            help='Поле для сортировки.',
+        )
+
+    def handle(self, *args, **options):
+        """Вывод сводки."""
+        endpoints = load_snapshots(settings.METRICS_DIR)
+        rows = []
+        for endpoint, stats in endpoints.items():
+            wall = stats.histograms['wall_seconds']
+            if not wall.count:
+                continue
+            queries = stats.histograms['queries']
+            duplicates = stats.histograms['duplicate_queries']
+            rows.append({
+                'endpoint': endpoint,
+                'count': wall.count,
+                'total': wall.total,
+                'avg': wall.total / wall.count,
+                'p99': wall.quantile(0.99),
+                'db': stats.histograms['db_seconds'].total / wall.count,
+                'serializer': (
+                    stats.histograms['serializer_seconds'].total / wall.count
+                ),
+                'queries': queries.total / wall.count,
+                'duplicates': duplicates.total / wall.count,
+            })
+        rows.sort(key=lambda row: row[options['sort']], reverse=True)
+        self.stdout.write(
+            f'{"endpoint":<45}{"count":>8}{"avg ms":>9}{"p99 ms":>9}'
+            f'{"db ms":>9}{"ser ms":>9}{"queries":>9}{"dup":>7}',
+        )
+        for row in rows:
+            self.stdout.write(
+                f'{row["endpoint"]:<45}{row["count"]:>8}'
+                f'{row["avg"] * 1000:>9.1f}{row["p99"] * 1000:>9.1f}'
+                f'{row["db"] * 1000:>9.1f}{row["serializer"] * 1000:>9.1f}'
+                f'{row["queries"]:>9.1f}{row["duplicates"]:>7.1f}',
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.uploads import purge_uploads
+
+
+class Command(BaseCommand):
+    """Удаление незавершенных загрузок по частям."""
+
+    help = ('Удаляет файлы загрузок из UPLOAD_DIR старше UPLOAD_MAX_AGE. '
+            'Токены таких загрузок уже недействительны.')
+
+    def handle(self, *args, **options):
+        """Удаление файлов."""
+        self.stdout.write(f'Удалено загрузок: {purge_uploads()}.')
@@ -0,0 +1,297 @@
+import json
+import os
+import random
+import time
+
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+_current_sample = ContextVar('metrics_sample', default=None)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами.
+
+    Обновление - одно присваивание элемента списка без блокировок:
+    под GIL возможна потеря единичных наблюдений при гонке потоков,
+    что для статистики допустимо и не стоит захвата мьютекса.
+    """
+
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Добавляет наблюдение."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, data):
+        """Добавляет значения из снимка другой гистограммы."""
+        for index, value in enumerate(data['counts']):
+            self.counts[index] += value
+        self.total += data['total']
+        self.count += data['count']
+
+    def quantile(self, q):
+        """Оценка квантиля по верхней границе корзины."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, value in enumerate(self.counts):
+            seen += value
+            if seen >= rank:
+                if index < len(self.buckets):
+                    return self.buckets[index]
+                return float('inf')
+        return float('inf')
+
+    def snapshot(self):
+        """Состояние гистограммы для сохранения."""
+        return {
+            'counts': list(self.counts),
+            'total': self.total,
+            'count': self.count,
+        }
+
+
+class EndpointStats:
+    """Набор гистограмм одного представления."""
+
+    HISTOGRAMS = {
+        'wall_seconds': LATENCY_BUCKETS,
+        'db_seconds': LATENCY_BUCKETS,
+        'serializer_seconds': LATENCY_BUCKETS,
+        'queries': COUNT_BUCKETS,
+        'duplicate_queries': COUNT_BUCKETS,
+    }
+
+    def __init__(self):
+        self.histograms = {
+            name: Histogram(buckets)
+            for name, buckets in self.HISTOGRAMS.items()
+        }
+
+    def observe(self, sample):
+        """Учитывает один запрос."""
+        self.histograms['wall_seconds'].observe(sample.wall)
+        self.histograms['db_seconds'].observe(sample.db_time)
+        self.histograms['serializer_seconds'].observe(sample.serializer_time)
+        self.histograms['queries'].observe(sample.queries)
+        self.histograms['duplicate_queries'].observe(sample.duplicates)
+
+
+class Sample:
+    """Измерения одного запроса."""
+
+    __slots__ = (
+        'started', 'wall', 'db_time', 'queries', 'sql',
+        'serializer_time', 'serializer_depth',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.sql = Counter()
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    @property
+    def duplicates(self):
+        """Число повторов одинаковых запросов (признак N+1)."""
+        return self.queries - len(self.sql)
+
+
+class Registry:
+    """Метрики процесса по представлениям."""
+
+    def __init__(self):
+        self.endpoints = {}
+        self.collectors = []
+        self.last_dump = time.monotonic()
+
+    def stats(self, endpoint):
+        """Статистика представления, создается при первом обращении."""
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            return self.endpoints.setdefault(endpoint, EndpointStats())
+        return stats
+
+    def observe(self, endpoint, sample):
+        """Сохраняет измерения запроса."""
+        self.stats(endpoint).observe(sample)
+        interval = settings.METRICS_DUMP_INTERVAL
+        if interval and time.monotonic() - self.last_dump > interval:
+            self.dump()
+
+    def register_collector(self, collector):
+        """Подключает источник дополнительных метрик.
+
+        collector - вызываемый объект, возвращающий
+        пары (имя метрики, значение).
+        """
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def snapshot(self):
+        """Состояние всех гистограмм процесса."""
+        return {
+            endpoint: {
+                name: histogram.snapshot()
+                for name, histogram in stats.histograms.items()
+            }
+            for endpoint, stats in list(self.endpoints.items())
+        }
+
+    def dump(self):
+        """Записывает снимок метрик процесса в METRICS_DIR."""
+        self.last_dump = time.monotonic()
+        directory = settings.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(tmp_path, path)
+
+    def prometheus(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        for name, buckets in EndpointStats.HISTOGRAMS.items():
+            metric = f'foodgram_request_{name}'
+            lines.append(f'# TYPE {metric} histogram')
+            for endpoint, stats in sorted(self.endpoints.items()):
+                histogram = stats.histograms[name]
+                label = f'endpoint="{endpoint}"'
+                cumulative = 0
+                for bound, value in zip(buckets, histogram.counts):
+                    cumulative += value
+                    lines.append(
+                        f'{metric}_bucket{{{label},le="{bound}"}} '
+                        f'{cumulative}',
+                    )
+                lines.append(
+                    f'{metric}_bucket{{{label},le="+Inf"}} {histogram.count}',
+                )
+                lines.append(f'{metric}_sum{{{label}}} {histogram.total}')
+                lines.append(f'{metric}_count{{{label}}} {histogram.count}')
+        for collector in self.collectors:
+            for name, value in collector():
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def snapshot_is_stale(path, pid):
+    """Снимок завершенного процесса или не обновлявшийся METRICS_SNAPSHOT_TTL.
+
+    После перезапуска воркеров снимки прежних процессов остаются
+    в каталоге и завышали бы итоги.
+    """
+    if time.time() - os.path.getmtime(path) > settings.METRICS_SNAPSHOT_TTL:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def load_snapshots(directory):
+    """Объединяет снимки метрик работающих процессов.
+
+    Устаревшие снимки удаляются. Снимок процесса, который продолжает
+    работать, будет записан заново при следующем сохранении.
+    """
+    endpoints = {}
+    if not os.path.isdir(directory):
+        return endpoints
+    for filename in os.listdir(directory):
+        pid, ext = os.path.splitext(filename)
+        if ext != '.json' or not pid.isdigit():
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            if snapshot_is_stale(path, int(pid)):
+                os.remove(path)
+                continue
+            with open(path, encoding='utf-8') as file:
+                snapshot = json.load(file)
+        except FileNotFoundError:
+            continue
+        for endpoint, histograms in snapshot.items():
+            stats = endpoints.setdefault(endpoint, EndpointStats())
+            for name, data in histograms.items():
+                stats.histograms[name].merge(data)
+    return endpoints
+
+
+def start_sample():
+    """Начинает измерение запроса с учетом частоты выборки."""
+    if random.random() >= settings.METRICS_SAMPLE_RATE:
+        return None, None
+    sample = Sample()
+    return sample, _current_sample.set(sample)
+
+
+def finish_sample(token):
+    """Завершает измерение запроса."""
+    _current_sample.reset(token)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """Обертка выполнения SQL: время и повторы запросов."""
+    sample = _current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.db_time += time.perf_counter() - started
+        sample.queries += 1
+        sample.sql[sql] += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """Подключает обертку SQL к новому соединению с БД."""
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+@contextmanager
+def serializer_timer():
+    """Время сериализации; вложенные вызовы учитываются один раз."""
+    sample = _current_sample.get()
+    if sample is None:
+        yield
+        return
+    sample.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.serializer_depth -= 1
+        if not sample.serializer_depth:
+            sample.serializer_time += time.perf_counter() - started
@@ -0,0 +1,137 @@
+import time
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from api import metrics
+from api.compression import (
+    COMPRESSIBLE_TYPES, choose_encoding, compress, compressed_cache,
+)
+
+
+def view_name(view_func, method):
+    """Имя представления и действия, например RecipeViewSet.list."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{cls.__name__}.{action}'
+
+
+def request_view_name(request):
+    """Имя представления, обработавшего запрос."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return view_name(match.func, request.method)
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Сбор метрик запросов по представлениям.
+
+    Время ответа, время и число запросов к БД, повторяющиеся запросы
+    и время сериализации. Измеряется доля запросов METRICS_SAMPLE_RATE.
+    Работает и в WSGI, и в ASGI режиме без переключения потоков.
+    """
+
+    def __call__(self, request):
+        if getattr(self, '_is_coroutine', None):
+            return self.__acall__(request)
+        sample, token = metrics.start_sample()
+        if sample is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_sample(token)
+        self.record(request, sample)
+        return response
+
+    async def __acall__(self, request):
+        sample, token = metrics.start_sample()
+        if sample is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_sample(token)
+        self.record(request, sample)
+        return response
+
+    def record(self, request, sample):
+        """Сохраняет измерения запроса."""
+        sample.wall = time.perf_counter() - sample.started
+        metrics.registry.observe(request_view_name(request), sample)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжатие ответов brotli или gzip по заголовку Accept-Encoding.
+
+    Сжимаются ответы не меньше COMPRESSION_MIN_SIZE байт с текстовыми
+    типами содержимого. Для представлений с атрибутом
+    cache_compressed = True сжатые данные берутся из кэша по хэшу тела.
+    В ASGI режиме сжатие выполняется в пуле потоков.
+    """
+
+    def __call__(self, request):
+        if getattr(self, '_is_coroutine', None):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        from api.asynchronous import offload
+
+        response = await self.get_response(request)
+        if not self.should_compress(request, response):
+            return response
+        return await offload(self.process_response, request, response)
+
+    def should_compress(self, request, response):
+        """Подходит ли ответ для сжатия."""
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.has_header('Content-Encoding')
+            and len(response.content) >= settings.COMPRESSION_MIN_SIZE
+            and response.get('Content-Type', '').startswith(
+                COMPRESSIBLE_TYPES,
+            )
+        )
+
+    def process_response(self, request, response):
+        """Сжатие тела ответа."""
+        if not self.should_compress(request, response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        )
+        if encoding is None:
+            return response
+        if self.cache_compressed(request):
+            content = compressed_cache.get_or_compress(
+                response.content, encoding,
+            )
+        else:
+            content = compress(response.content, encoding)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    @staticmethod
+    def cache_compressed(request):
+        """Кэшируется ли сжатый ответ представления."""
+        match = getattr(request, 'resolver_match', None)
+        view_class = getattr(match.func, 'cls', None) if match else None
+        return (
+            request.method == 'GET'
+            and getattr(view_class, 'cache_compressed', False)
+        )
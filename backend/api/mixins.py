@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.db.routers import routing_state
+
+
+class ReplicaReadMixin:
+    """Чтение с реплик БД для безопасных действий представления.
+
+    Аутентификация и проверка прав выполняются на основной базе.
+    После записи пользователь на REPLICA_PIN_SECONDS закрепляется
+    за основной базой, чтобы видеть свои изменения.
+    """
+
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        """Обработка запроса с состоянием маршрутизации БД."""
+        with routing_state() as self.routing:
+            try:
+                return super().dispatch(request, *args, **kwargs)
+            finally:
+                self.pin_writer(request)
+
+    def initial(self, request, *args, **kwargs):
+        """Разрешение чтения с реплик после аутентификации."""
+        super().initial(request, *args, **kwargs)
+        if not settings.DATABASE_REPLICAS:
+            return
+        self.routing.use_replicas = (
+            request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+            and not (request.user.is_authenticated
+                     and cache.get(self.pin_key(request.user)))
+        )
+
+    def pin_writer(self, request):
+        """Закрепляет за основной базой пользователя, менявшего данные."""
+        user = getattr(request, 'user', None)
+        if self.routing.written and user and user.is_authenticated:
+            cache.set(self.pin_key(user), True, settings.REPLICA_PIN_SECONDS)
+
+    @staticmethod
+    def pin_key(user):
+        """Ключ кэша закрепления пользователя за основной базой."""
+        return f'replica-pin:{user.pk}'
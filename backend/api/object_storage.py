@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.utils.functional import cached_property
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from api.storage import CONTENT_NAME
+
+
+class ObjectStorage(S3Boto3Storage):
+    """S3-совместимое хранилище (AWS S3, MinIO, Yandex Object Storage).
+
+    Как и ContentAddressedStorage, не дублирует файлы с именем
+    по хэшу содержимого. Клиенты загружают картинки напрямую
+    в хранилище по подписанной форме (presigned POST), через API
+    проходит только ключ объекта.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        """Существующее имя для файлов с хэшем содержимого."""
+        if CONTENT_NAME.search(name) and self.exists(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        """Сохранение файла, если его еще нет."""
+        if CONTENT_NAME.search(name) and self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    @cached_property
+    def signing_client(self):
+        """Клиент S3 для подписи ссылок.
+
+        Ссылки открывают клиенты, поэтому адрес хранилища в них -
+        OBJECT_STORAGE_PUBLIC_ENDPOINT, если внутри сети оно доступно
+        по другому адресу. Подпись не требует обращения к хранилищу.
+        """
+        return self._create_session().client(
+            's3',
+            region_name=self.region_name,
+            endpoint_url=(
+                settings.OBJECT_STORAGE_PUBLIC_ENDPOINT or self.endpoint_url
+            ),
+            config=self.config,
+            use_ssl=self.use_ssl,
+            verify=self.verify,
+        )
+
+    def key(self, name):
+        """Ключ объекта с учетом AWS_LOCATION."""
+        return self._normalize_name(clean_name(name))
+
+    def presigned_post(self, name, content_type, max_size, expires):
+        """Форма для загрузки объекта name клиентом напрямую.
+
+        Хранилище само проверяет тип и размер файла: форма с другим
+        Content-Type или файлом больше max_size отклоняется.
+        """
+        return self.signing_client.generate_presigned_post(
+            self.bucket_name, self.key(name),
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_size],
+            ],
+            ExpiresIn=expires,
+        )
+
+    def signed_url(self, name, filename, expires):
+        """Временная ссылка на скачивание закрытого файла."""
+        return self.signing_client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket_name,
+                'Key': self.key(name),
+                'ResponseContentDisposition':
+                    f'attachment; filename={filename}',
+            },
+            ExpiresIn=expires,
+        )
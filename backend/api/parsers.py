@@ -0,0 +1,44 @@
+import json
+
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class Files(MultiValueDict):
+    """Файлы формы для объединения с данными в обычном dict.
+
+    DRF объединяет данные и файлы вызовом dict.update. Для подкласса
+    dict без своего __iter__ он копирует внутренние списки значений,
+    и поле image получает список вместо файла; с __iter__ значения
+    берутся через __getitem__ - последний файл каждой части.
+    """
+
+    def __iter__(self):
+        return super().__iter__()
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """multipart/form-data с полями запроса в JSON.
+
+    Поля, как в JSON-запросе, передаются частью data, файлы -
+    отдельными частями (image). Файлы читает обработчик загрузки
+    Django блоками: больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся
+    во временный файл, и картинка не хранится в памяти целиком.
+    Размер части data ограничен DATA_UPLOAD_MAX_MEMORY_SIZE. Без
+    части data поля формы возвращаются как есть.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Разбор формы и JSON из части data."""
+        result = super().parse(stream, media_type, parser_context)
+        payload = result.data.get('data')
+        if payload is None:
+            return result
+        try:
+            data = json.loads(payload)
+        except ValueError as error:
+            raise ParseError(f'Часть data - неверный JSON: {error}')
+        if not isinstance(data, dict):
+            raise ParseError('Часть data должна быть объектом JSON.')
+        return DataAndFiles(data, Files(result.files.lists()))
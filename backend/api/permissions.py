@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
 
@@ -18,3 +20,15 @@ class IsAuthorOrReadOnly(BasePermission):
         return (
             request.method in SAFE_METHODS
             or request.user == obj.author)
+
+
+class IsMetricsScraper(BasePermission):
+    """Доступ к метрикам - администратору или по токену сборщика."""
+
+    def has_permission(self, request, view):
+        """Разрешения на уровне запроса."""
+        token = request.META.get('HTTP_X_METRICS_TOKEN')
+        return (request.user.is_staff
+                or bool(settings.METRICS_TOKEN and token
+                        and constant_time_compare(
+                            token, settings.METRICS_TOKEN)))
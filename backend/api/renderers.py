@@ -0,0 +1,76 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+encoder = JSONEncoder()
+
+
+class RawJSON:
+    """Готовый JSON-текст, который выводится без повторной сериализации.
+
+    Может быть ответом целиком или значением словаря ответа
+    (например, results страницы).
+    """
+
+    def __init__(self, content):
+        if isinstance(content, str):
+            content = content.encode()
+        self.content = content
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson.
+
+    Без установленного orjson и при запросе отступов
+    работает как стандартный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Сериализация данных в JSON."""
+        if data is None:
+            return b''
+        if isinstance(data, RawJSON):
+            return data.content
+        if isinstance(data, dict) and any(
+            isinstance(value, RawJSON) for value in data.values()
+        ):
+            return b'{%s}' % b','.join(
+                self.render(str(key)) + b':' + (
+                    b'null' if value is None else self.render(value)
+                )
+                for key, value in data.items()
+            )
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent:
+            return super().render(
+                data, accepted_media_type, renderer_context,
+            )
+        return orjson.dumps(
+            data, default=encoder.default, option=orjson.OPT_NON_STR_KEYS,
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Ответ в формате MessagePack (Accept: application/msgpack)."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Сериализация данных в MessagePack."""
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data, default=encoder.default, use_bin_type=True,
+        )
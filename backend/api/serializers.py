@@ -1,15 +1,95 @@
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import models, transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
+from api.exceptions import PreconditionFailed
 from api.fields import Base64ImageField
-from recipes.models import Follow, Ingredient, IngredientInRecipe, Recipe, Tag
+from api.metrics import serializer_timer
+from api.renderers import ORJSONRenderer
+from api.viewer import get_viewer
+from recipes.models import (
+    Follow, Ingredient, IngredientInRecipe, Recipe, RecipeDocument, Tag,
+)
 
 User = get_user_model()
 
 
-class CustomUserSerializer(UserSerializer):
+class TimedSerializerMixin:
+    """Учет времени сериализации в метриках запроса."""
+
+    @property
+    def data(self):
+        """Представление данных с замером времени."""
+        with serializer_timer():
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Сериализатор списков с замером времени."""
+
+
+class ViewerListSerializer(TimedListSerializer):
+    """Сериализатор списков с загрузкой отношений пользователя.
+
+    Перед сериализацией элементов отношения текущего пользователя
+    ко всем объектам списка загружаются в контекст запроса.
+    """
+
+    def to_representation(self, data):
+        """Представление списка после загрузки отношений."""
+        if isinstance(data, models.Manager):
+            data = data.all()
+        data = list(data)
+        self.child.prime_viewer(data)
+        return super().to_representation(data)
+
+
+def sparse_fieldsets(request):
+    """Параметры ?fields= и ?expand= запроса.
+
+    Возвращает (выбранные поля или None, раскрываемые связи).
+    """
+    def names(param):
+        value = request.query_params.get(param) if request else None
+        return set(filter(None, value.split(','))) if value else None
+
+    return names('fields'), names('expand') or set()
+
+
+class SparseFieldsMixin:
+    """Выбор полей ответа параметрами ?fields= и ?expand=.
+
+    Поля, не перечисленные в fields, не выводятся. Если fields задан,
+    связи из Meta.expandable выводятся как id, кроме указанных
+    в expand. Параметры действуют только на корневой сериализатор.
+    """
+
+    def get_fields(self):
+        """Поля с учетом параметров запроса."""
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        selected, expand = sparse_fieldsets(self.context.get('request'))
+        if parent is not None or selected is None:
+            return fields
+        for name in getattr(self.Meta, 'expandable', ()):
+            if name in selected and name not in expand:
+                field = fields[name]
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True,
+                    many=isinstance(field, serializers.ListSerializer),
+                    **({'source': field.source} if field.source else {}),
+                )
+        return {
+            name: field for name, field in fields.items()
+            if name in selected
+        }
+
+
+class CustomUserSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                           UserSerializer):
     """Сериализатор для пользователя."""
 
     is_subscribed = serializers.SerializerMethodField(read_only=True)
@@ -18,12 +98,21 @@ class CustomUserSerializer(UserSerializer):
         model = User
         fields = ('email', 'id', 'username',
                   'first_name', 'last_name', 'is_subscribed')
+        list_serializer_class = ViewerListSerializer
+
+    @property
+    def viewer(self):
+        """Отношения текущего пользователя."""
+        return get_viewer(self.context.get('request'))
+
+    def prime_viewer(self, users):
+        """Загрузка подписок на пользователей списка."""
+        if 'is_subscribed' in self.fields:
+            self.viewer.prime(authors=[user.pk for user in users])
 
     def get_is_subscribed(self, obj):
         """Подписан ли пользователь на автора."""
-        user = self.context.get('request').user
-        return (user.is_authenticated
-                and user.follower.filter(author=obj).exists())
+        return self.viewer.is_subscribed(obj)
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -35,7 +124,8 @@ class CustomUserCreateSerializer(UserCreateSerializer):
                   'first_name', 'last_name')
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class RecipeShortSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """Сериализатор для коротких представлений рецептов в списках."""
 
     image = Base64ImageField()
@@ -43,6 +133,7 @@ class RecipeShortSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
+        list_serializer_class = TimedListSerializer
 
 
 class FollowSerializer(CustomUserSerializer):
@@ -86,20 +177,23 @@ class FollowSerializer(CustomUserSerializer):
         return obj.recipes.count()
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для ингредиентов."""
 
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
+        list_serializer_class = TimedListSerializer
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для тегов."""
 
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
+        list_serializer_class = TimedListSerializer
 
 
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
@@ -142,7 +236,8 @@ class IngredientInRecipeWriteSerializer(serializers.ModelSerializer):
         return amount
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                       serializers.ModelSerializer):
     """Сериализатор для чтения рецептов."""
 
     author = CustomUserSerializer(read_only=True)
@@ -159,21 +254,70 @@ class RecipeSerializer(serializers.ModelSerializer):
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
             'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
         )
+        expandable = ('author', 'tags')
+        list_serializer_class = ViewerListSerializer
+
+    @property
+    def viewer(self):
+        """Отношения текущего пользователя."""
+        return get_viewer(self.context.get('request'))
+
+    def prime_viewer(self, recipes):
+        """Загрузка отношений к рецептам списка и их авторам."""
+        flags = {'is_favorited', 'is_in_shopping_cart'} & set(self.fields)
+        self.viewer.prime(
+            authors=[recipe.author_id for recipe in recipes]
+            if isinstance(self.fields.get('author'), CustomUserSerializer)
+            else (),
+            recipes=[recipe.pk for recipe in recipes] if flags else (),
+        )
 
     def get_is_favorited(self, recipe):
         """Добавлен ли рецепт в избранное."""
-        user = self.context.get('request').user
-        return (user.is_authenticated
-                and user.favorites.filter(recipe=recipe).exists())
+        return self.viewer.is_favorited(recipe)
 
     def get_is_in_shopping_cart(self, recipe):
         """Добавлен ли рецепт в список покупок."""
-        user = self.context.get('request').user
-        return (user.is_authenticated
-                and user.shopping_cart.filter(recipe=recipe).exists())
-
-
-class RecipeWriteSerializer(serializers.ModelSerializer):
+        return self.viewer.is_in_shopping_cart(recipe)
+
+
+def render_recipe_documents(recipe_ids):
+    """JSON рецептов для RecipeDocument: словарь id -> текст.
+
+    Рецепт сериализуется без запроса: поля пользователя равны false
+    и только задают порядок ключей, изображение - путь без хоста.
+    """
+    recipes = Recipe.objects.for_representation().filter(
+        pk__in=recipe_ids,
+    ).order_by()
+    renderer = ORJSONRenderer()
+    return {
+        item['id']: renderer.render(item).decode()
+        for item in RecipeSerializer(recipes, many=True).data
+    }
+
+
+@transaction.atomic
+def save_recipe_documents(recipe_ids):
+    """Пересборка RecipeDocument рецептов, возвращает id -> текст.
+
+    Строки рецептов блокируются, поэтому параллельные пересборки
+    одного рецепта выполняются по очереди и не теряют изменений.
+    """
+    recipe_ids = list(Recipe.objects.filter(
+        pk__in=recipe_ids,
+    ).select_for_update().order_by('pk').values_list('pk', flat=True))
+    documents = render_recipe_documents(recipe_ids)
+    RecipeDocument.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeDocument.objects.bulk_create([
+        RecipeDocument(recipe_id=pk, data=data)
+        for pk, data in documents.items()
+    ])
+    return documents
+
+
+class RecipeWriteSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """Сериализатор для записи (создания и модификации) рецептов."""
 
     tags = serializers.PrimaryKeyRelatedField(many=True,
@@ -232,11 +376,24 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.save_ingredients(recipe, ingredients)
+        save_recipe_documents([recipe.pk])
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        """Сериализация модификации рецепта."""
+        """Сериализация модификации рецепта.
+
+        Строка рецепта блокируется до конца транзакции. Если передан
+        expected_versions (версии из If-Match), а текущая версия
+        рецепта в него не входит, изменение отклоняется с кодом 412.
+        """
+        expected_versions = validated_data.pop('expected_versions', None)
+        version = Recipe.objects.select_for_update().values_list(
+            'version', flat=True,
+        ).get(pk=instance.pk)
+        if expected_versions is not None and version not in expected_versions:
+            raise PreconditionFailed
+        validated_data['version'] = version + 1
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         if tags:
@@ -244,10 +401,21 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         if ingredients:
             instance.ingredients.clear()
             self.save_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        recipe = super().update(instance, validated_data)
+        save_recipe_documents([recipe.pk])
+        return recipe
 
     def to_representation(self, instance):
         """Возвращаем прдеставление в таком же виде, как и GET-запрос."""
         request = self.context.get('request')
         context = {'request': request}
         return RecipeSerializer(instance, context=context).data
+
+
+class UploadSerializer(serializers.Serializer):
+    """Параметры новой загрузки файла по частям."""
+
+    size = serializers.IntegerField(min_value=1)
+    name = serializers.CharField(
+        required=False, default='', allow_blank=True, max_length=255,
+    )
@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.documents import schedule_refresh
+from api.events import (
+    author_channel, publish_event, publish_follow, user_channel,
+)
+from api.facets import facet_index
+from recipes.models import Follow, Ingredient, Recipe, ShoppingCart, Tag
+
+User = get_user_model()
+
+# Поля пользователя, входящие в представление рецепта (RecipeDocument).
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Сброс кэша при выходе (удалении токена)."""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, update_fields=None, **kwargs):
+    """Сброс кэша при смене пароля, деактивации и изменении профиля."""
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    token_cache.delete(*Token.objects.filter(
+        user=instance,
+    ).values_list('key', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    """Пересборка представлений рецептов с измененным тегом."""
+    if not kwargs.get('created'):
+        schedule_refresh(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    """Пересборка представлений рецептов с измененным ингредиентом."""
+    if not kwargs.get('created'):
+        schedule_refresh(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(sender, instance, update_fields=None, **kwargs):
+    """Значения полей автора до сохранения для author_changed."""
+    instance._author_fields = None
+    if instance.pk is None or (
+        update_fields and not AUTHOR_FIELDS & set(update_fields)
+    ):
+        return
+    instance._author_fields = User.objects.filter(
+        pk=instance.pk,
+    ).values(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, **kwargs):
+    """Пересборка представлений рецептов автора при изменении профиля.
+
+    Сохранения без изменения полей автора (смена пароля, активация,
+    вход) представления не пересобирают и версии рецептов не меняют.
+    """
+    previous = getattr(instance, '_author_fields', None)
+    if created or previous is None or all(
+        previous[field] == getattr(instance, field)
+        for field in AUTHOR_FIELDS
+    ):
+        return
+    schedule_refresh(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    """Проверка журнала индексом фильтров при следующем запросе.
+
+    Процесс, изменивший рецепт, видит изменение сразу, остальные -
+    через RECIPE_FACETS_REFRESH_INTERVAL.
+    """
+    transaction.on_commit(facet_index.expire)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    """Событие о новом рецепте для подписчиков автора."""
+    if created:
+        publish_event(author_channel(instance.author_id), 'recipe', {
+            'id': instance.pk,
+            'name': instance.name,
+            'author': instance.author_id,
+        })
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def cart_changed(sender, instance, **kwargs):
+    """Событие об изменении корзины для пользователя."""
+    publish_event(user_channel(instance.user_id), 'cart', {
+        'recipe': instance.recipe_id,
+        'in_cart': 'created' in kwargs,
+    })
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    """Подписка открытых соединений на рецепты нового автора."""
+    publish_follow(instance.user_id, instance.author_id, 'created' in kwargs)
@@ -0,0 +1,111 @@
+from django.core.files.storage import default_storage
+from django.db import connections
+
+from api.renderers import ORJSONRenderer
+from recipes.models import (
+    Favorite, Follow, Ingredient, IngredientInRecipe, Recipe, ShoppingCart,
+    Tag,
+)
+
+
+def _tables():
+    """Имена таблиц для подстановки в запрос."""
+    return {
+        'recipe': Recipe._meta.db_table,
+        'recipe_tags': Recipe.tags.through._meta.db_table,
+        'tag': Tag._meta.db_table,
+        'ingredient': Ingredient._meta.db_table,
+        'ingredient_recipe': IngredientInRecipe._meta.db_table,
+        'user': Recipe._meta.get_field('author').related_model._meta.db_table,
+        'favorite': Favorite._meta.db_table,
+        'cart': ShoppingCart._meta.db_table,
+        'follow': Follow._meta.db_table,
+    }
+
+
+# JSON собирается склейкой строк, а не json_build_object: так порядок
+# ключей и разделители без пробелов совпадают с выводом рендерера.
+# to_json() экранирует строки так же, как orjson. Адрес картинки
+# строит хранилище (кодирование имени, домен хранилища), поэтому
+# запрос возвращает JSON до и после него и имя файла отдельно.
+RECIPE_JSON_SQL = """
+SELECT '{{"id":' || r.id
+    || ',"tags":[' || COALESCE((
+        SELECT string_agg(
+            '{{"id":' || t.id
+            || ',"name":' || to_json(t.name)::text
+            || ',"color":' || to_json(t.color)::text
+            || ',"slug":' || to_json(t.slug)::text || '}}',
+            ',' ORDER BY t.name
+        )
+        FROM {recipe_tags} rt JOIN {tag} t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = r.id
+    ), '') || ']'
+    || ',"author":{{"email":' || to_json(u.email)::text
+    || ',"id":' || u.id
+    || ',"username":' || to_json(u.username)::text
+    || ',"first_name":' || to_json(u.first_name)::text
+    || ',"last_name":' || to_json(u.last_name)::text
+    || ',"is_subscribed":' || EXISTS(
+        SELECT 1 FROM {follow}
+        WHERE user_id = %(viewer)s AND author_id = r.author_id
+    )::text || '}}'
+    || ',"ingredients":[' || COALESCE((
+        SELECT string_agg(
+            '{{"id":' || i.id
+            || ',"name":' || to_json(i.name)::text
+            || ',"measurement_unit":' || to_json(i.measurement_unit)::text
+            || ',"amount":' || ir.amount || '}}',
+            ',' ORDER BY ir.id
+        )
+        FROM {ingredient_recipe} ir
+        JOIN {ingredient} i ON i.id = ir.ingredient_id
+        WHERE ir.recipe_id = r.id
+    ), '') || ']'
+    || ',"is_favorited":' || EXISTS(
+        SELECT 1 FROM {favorite}
+        WHERE user_id = %(viewer)s AND recipe_id = r.id
+    )::text
+    || ',"is_in_shopping_cart":' || EXISTS(
+        SELECT 1 FROM {cart}
+        WHERE user_id = %(viewer)s AND recipe_id = r.id
+    )::text
+    || ',"name":' || to_json(r.name)::text
+    || ',"image":',
+    r.image,
+    ',"text":' || to_json(r.text)::text
+    || ',"cooking_time":' || r.cooking_time
+    || '}}'
+FROM unnest(%(ids)s::bigint[]) WITH ORDINALITY AS page(id, position)
+JOIN {recipe} r ON r.id = page.id
+JOIN {user} u ON u.id = r.author_id
+ORDER BY page.position
+"""
+
+
+def image_json(name, request):
+    """Адрес картинки в JSON, как его выводит сериализатор."""
+    if not name:
+        return 'null'
+    url = request.build_absolute_uri(default_storage.url(name))
+    return ORJSONRenderer().render(url).decode()
+
+
+def recipe_json(ids, request, using):
+    """JSON-представления рецептов, собранные базой данных.
+
+    Возвращает список строк в порядке ids, по строке на найденный
+    рецепт. Строки совпадают байт в байт с выводом RecipeSerializer
+    без ?fields= и ?expand=.
+    """
+    user = request.user
+    params = {
+        'ids': list(ids),
+        'viewer': user.pk if user.is_authenticated else None,
+    }
+    with connections[using].cursor() as cursor:
+        cursor.execute(RECIPE_JSON_SQL.format(**_tables()), params)
+        return [
+            head + image_json(image, request) + tail
+            for head, image, tail in cursor.fetchall()
+        ]
@@ -0,0 +1,25 @@
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_NAME = re.compile(r'(^|/)[0-9a-f]{16}\.\w+$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, не дублирующее файлы с именем по хэшу содержимого.
+
+    Файл с таким именем уже содержит те же данные, поэтому повторная
+    загрузка возвращает существующее имя вместо копии с суффиксом.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        """Существующее имя для файлов с хэшем содержимого."""
+        if CONTENT_NAME.search(name) and self.exists(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        """Сохранение файла, если его еще нет."""
+        if CONTENT_NAME.search(name) and self.exists(name):
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,131 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from api.exceptions import SyncTokenExpired
+from api.serializers import RecipeSerializer
+from recipes.models import ChangeLog, Favorite, Follow, Recipe, ShoppingCart
+
+SALT = 'api.sync'
+
+# Тип записи журнала -> модель и поле с id объекта.
+USER_ROWS = {
+    ChangeLog.FAVORITE: (Favorite, 'recipe_id', 'favorites'),
+    ChangeLog.SHOPPING_CART: (ShoppingCart, 'recipe_id', 'shopping_cart'),
+    ChangeLog.FOLLOW: (Follow, 'author_id', 'follows'),
+}
+
+
+def make_token(cursor):
+    """Непрозрачный токен для позиции (txid, id) в журнале."""
+    return signing.dumps(list(cursor), salt=SALT)
+
+
+def read_token(token):
+    """Позиция в журнале из токена.
+
+    Токен старше SYNC_RETENTION_DAYS может указывать на удаленные
+    строки журнала, клиент должен загрузить данные заново (410).
+    """
+    try:
+        txid, pk = signing.loads(
+            token, salt=SALT,
+            max_age=timezone.timedelta(days=settings.SYNC_RETENTION_DAYS),
+        )
+    except signing.SignatureExpired:
+        raise SyncTokenExpired
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ValidationError({'since': 'Неверный токен синхронизации.'})
+    return txid, pk
+
+
+def visible_txid(using):
+    """Номер самой старой незавершенной транзакции PostgreSQL.
+
+    Все транзакции с меньшим номером завершены, поэтому их строки
+    журнала уже не появятся позади выданной позиции. В SQLite
+    транзакции выполняются по одной, ограничения нет (None).
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def head():
+    """Позиция конца журнала для первой синхронизации."""
+    using = ChangeLog.objects.db
+    xmin = visible_txid(using)
+    if xmin is not None:
+        return xmin, 0
+    last = ChangeLog.objects.using(using).order_by('-id').values_list(
+        'id', flat=True,
+    ).first()
+    return 0, last or 0
+
+
+def read_changes(user, cursor, limit):
+    """Строки журнала пользователя после позиции cursor.
+
+    Возвращает (строки, следующая позиция, есть ли еще строки).
+    Общие строки рецептов и строки пользователя читаются отдельными
+    запросами по индексу (user, txid, id).
+    """
+    using = ChangeLog.objects.db
+    xmin = visible_txid(using)
+    txid, pk = cursor
+    after = Q(txid__gt=txid) | Q(txid=txid, id__gt=pk)
+    if xmin is not None:
+        after &= Q(txid__lt=xmin)
+    log = ChangeLog.objects.using(using).filter(after).order_by('txid', 'id')
+    entries = sorted(
+        [*log.filter(user__isnull=True)[:limit + 1],
+         *log.filter(user=user)[:limit + 1]],
+        key=lambda entry: (entry.txid, entry.id),
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if entries:
+        cursor = max(cursor, (entries[-1].txid, entries[-1].id))
+    if not has_more and xmin is not None:
+        cursor = max(cursor, (xmin, 0))
+    return entries, cursor, has_more
+
+
+def sync_payload(user, entries, request):
+    """Текущее состояние объектов, упомянутых в строках журнала.
+
+    Для каждого объекта возвращается его состояние на момент
+    запроса, а не история изменений: измененные рецепты целиком,
+    id добавленных строк избранного, корзины и подписок и id
+    удаленных объектов (deleted_*).
+    """
+    touched = defaultdict(set)
+    for entry in entries:
+        touched[entry.kind].add(entry.object_id)
+    recipes = RecipeSerializer(
+        Recipe.objects.for_representation().filter(
+            pk__in=touched[ChangeLog.RECIPE],
+        ).order_by('pk'),
+        many=True, context={'request': request},
+    ).data
+    payload = {
+        'recipes': recipes,
+        'deleted_recipes': sorted(
+            touched[ChangeLog.RECIPE] - {recipe['id'] for recipe in recipes},
+        ),
+    }
+    for kind, (model, field, name) in USER_ROWS.items():
+        present = set(model.objects.filter(
+            user=user, **{f'{field}__in': touched[kind]},
+        ).values_list(field, flat=True))
+        payload[name] = sorted(present)
+        payload[f'deleted_{name}'] = sorted(touched[kind] - present)
+    return payload
@@ -0,0 +1,80 @@
+import logging
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+
+from api.fields import content_name
+from api.serializers import save_recipe_documents
+from api.uploads import INCOMING_PREFIX
+from recipes.models import Recipe
+from tasks.decorators import task
+
+logger = logging.getLogger(__name__)
+
+# Форматы Pillow для картинок, загруженных напрямую в хранилище.
+IMAGE_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+
+@task
+@transaction.atomic
+def refresh_recipe_documents(recipe_ids):
+    """Фоновая пересборка представлений рецептов.
+
+    Версии рецептов увеличиваются: изменились их теги,
+    ингредиенты или автор, и ETag прежних ответов устарели.
+    """
+    Recipe.objects.filter(pk__in=recipe_ids).bump_versions()
+    return len(save_recipe_documents(recipe_ids))
+
+
+def verified_image(name):
+    """Имя проверенной копии картинки из хранилища или None.
+
+    Картинка читается из хранилища в обработчике задач: Pillow
+    проверяет формат, файл сохраняется под именем по хэшу
+    содержимого в каталог картинок рецептов.
+    """
+    field = Recipe._meta.get_field('image')
+    with default_storage.open(name) as file:
+        try:
+            image = Image.open(file)
+            image.verify()
+        except Exception:
+            return None
+        if image.format not in IMAGE_FORMATS:
+            return None
+        file.seek(0)
+        return default_storage.save(
+            field.generate_filename(None, content_name(file)), file,
+        )
+
+
+@task
+def validate_uploaded_image(recipe_id, name):
+    """Проверка картинки, загруженной клиентом напрямую в хранилище.
+
+    Рецепт начинает ссылаться на проверенную копию, загруженный
+    объект удаляется. Если картинка не прошла проверку, у рецепта
+    картинка сбрасывается. Если картинку рецепта уже заменили,
+    рецепт не меняется.
+    """
+    if not default_storage.exists(name):
+        return None
+    checked = verified_image(name)
+    if checked is None:
+        logger.warning('Картинка %s рецепта %s не прошла проверку.',
+                       name, recipe_id)
+    with transaction.atomic():
+        recipes = Recipe.objects.filter(pk=recipe_id, image=name)
+        if recipes.update(image=checked or ''):
+            Recipe.objects.filter(pk=recipe_id).bump_versions()
+            save_recipe_documents([recipe_id])
+    default_storage.delete(name)
+    return checked
+
+
+def check_uploaded_image(recipe):
+    """Постановка проверки картинки, загруженной напрямую."""
+    if recipe.image.name.startswith(INCOMING_PREFIX):
+        validate_uploaded_image.delay(recipe.pk, recipe.image.name)
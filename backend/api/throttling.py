@@ -0,0 +1,68 @@
+import time
+
+from collections import Counter
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+throttled = Counter()
+
+
+def parse_rate(rate):
+    """Емкость и время полного восполнения корзины: '10/min' -> (10, 60)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def throttle_metrics():
+    """Метрики ограничения запросов в формате (имя, значение)."""
+    for scope, value in list(throttled.items()):
+        yield f'foodgram_throttled_total{{scope="{scope}"}}', value
+
+
+class ActionTokenBucketThrottle(BaseThrottle):
+    """Ограничение частоты запросов корзиной токенов.
+
+    Область ограничения задается для действия атрибутом представления
+    throttle_actions = {действие: область}, лимит области - в
+    DEFAULT_THROTTLE_RATES, пустой лимит отключает ограничение.
+    Корзина ведется отдельно для каждого пользователя, для анонимных -
+    для каждого IP, и хранится в кэше Django. Емкость корзины равна
+    лимиту, поэтому допускается кратковременный всплеск.
+    """
+
+    cache = cache
+
+    def allow_request(self, request, view):
+        """Списание токена из корзины клиента."""
+        scope = getattr(view, 'throttle_actions', {}).get(
+            getattr(view, 'action', None),
+        )
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if not rate:
+            return True
+        capacity, period = parse_rate(rate)
+        refill = capacity / period
+        key = f'throttle:{scope}:{self.get_client(request)}'
+        now = time.time()
+        tokens, updated = self.cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        if tokens < 1:
+            self.wait_seconds = (1 - tokens) / refill
+            throttled[scope] += 1
+            return False
+        self.cache.set(key, (tokens - 1, now), period)
+        return True
+
+    def get_client(self, request):
+        """Пользователь или IP-адрес клиента."""
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def wait(self):
+        """Время до появления токена, секунд."""
+        return self.wait_seconds
@@ -0,0 +1,235 @@
+import fcntl
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import NotFound, ValidationError
+
+from api.exceptions import UploadConflict, UploadTooLarge
+
+SIGNING_SALT = 'api.uploads'
+
+# Размер блока при чтении тела запроса и копировании.
+BLOCK_SIZE = 64 * 1024
+
+# Префикс значения поля image со ссылкой на загрузку.
+UPLOAD_PREFIX = 'upload:'
+
+# Каталог хранилища для картинок, загруженных клиентами напрямую
+# и еще не проверенных.
+INCOMING_PREFIX = 'incoming/'
+
+# Типы картинок, которые можно загрузить напрямую в хранилище.
+IMAGE_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+
+class UploadedImage(File):
+    """Файл завершенной загрузки.
+
+    temporary_file_path позволяет FileSystemStorage переместить файл
+    на место, а ImageField - проверить картинку по пути без чтения
+    в память.
+    """
+
+    def temporary_file_path(self):
+        """Путь к файлу загрузки."""
+        return self.file.name
+
+
+def upload_path(upload):
+    """Путь к файлу загрузки в UPLOAD_DIR."""
+    return os.path.join(settings.UPLOAD_DIR, upload['file'])
+
+
+def direct_uploads():
+    """Загружают ли клиенты файлы напрямую в хранилище."""
+    return hasattr(default_storage, 'presigned_post')
+
+
+def create_upload(user, size, filename):
+    """Новая загрузка размером size байт, возвращает (токен, данные).
+
+    Токен подписан SECRET_KEY и содержит владельца, размер
+    и расширение файла, поэтому загрузкам не нужна таблица в БД:
+    принятое число байт - размер файла в UPLOAD_DIR.
+    """
+    if size > settings.UPLOAD_MAX_SIZE:
+        raise UploadTooLarge(
+            f'Размер файла больше {settings.UPLOAD_MAX_SIZE} байт.',
+        )
+    _, ext = os.path.splitext(filename or '')
+    upload = {
+        'user': user.pk,
+        'file': uuid.uuid4().hex,
+        'size': size,
+        'ext': ext.lower()[:10],
+    }
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    open(upload_path(upload), 'xb').close()
+    return signing.dumps(upload, salt=SIGNING_SALT), upload
+
+
+def create_direct_upload(user, size, filename):
+    """Загрузка напрямую в объектное хранилище, возвращает ответ API.
+
+    Клиент отправляет файл формой из url и fields, затем передает
+    image из ответа в поле image рецепта. Байты картинки через API
+    не проходят, проверяет ее фоновая задача validate_uploaded_image.
+    """
+    if size > settings.UPLOAD_MAX_SIZE:
+        raise UploadTooLarge(
+            f'Размер файла больше {settings.UPLOAD_MAX_SIZE} байт.',
+        )
+    _, ext = os.path.splitext(filename or '')
+    content_type = IMAGE_TYPES.get(ext.lower())
+    if content_type is None:
+        raise ValidationError({'name': (
+            f'Допустимые расширения: {", ".join(IMAGE_TYPES)}.'
+        )})
+    upload = {
+        'user': user.pk,
+        'key': f'{INCOMING_PREFIX}{uuid.uuid4().hex}{ext.lower()}',
+        'size': size,
+    }
+    form = default_storage.presigned_post(
+        upload['key'], content_type, size,
+        settings.OBJECT_STORAGE_UPLOAD_EXPIRES,
+    )
+    token = signing.dumps(upload, salt=SIGNING_SALT)
+    return {
+        'id': token,
+        'size': size,
+        'url': form['url'],
+        'fields': form['fields'],
+        'image': UPLOAD_PREFIX + token,
+    }
+
+
+def load_upload(token, user):
+    """Данные загрузки пользователя по токену или 404."""
+    try:
+        upload = signing.loads(
+            token, salt=SIGNING_SALT, max_age=settings.UPLOAD_MAX_AGE,
+        )
+    except signing.BadSignature:
+        raise NotFound('Загрузка не найдена.')
+    if upload['user'] != user.pk:
+        raise NotFound('Загрузка не найдена.')
+    return upload
+
+
+def load_chunked_upload(token, user):
+    """Данные загрузки по частям через API по токену или 404."""
+    upload = load_upload(token, user)
+    if 'file' not in upload or not os.path.exists(upload_path(upload)):
+        raise NotFound('Загрузка не найдена.')
+    return upload
+
+
+def upload_offset(upload):
+    """Число принятых байт."""
+    return os.path.getsize(upload_path(upload))
+
+
+def append_chunk(upload, offset, stream, length):
+    """Дописывает часть файла из потока запроса блоками BLOCK_SIZE.
+
+    offset - позиция части, должна совпадать с числом принятых байт:
+    иначе часть повторяется или пропущена, и клиент получает 409
+    с актуальным offset. Одновременная запись в загрузку тоже
+    отклоняется. Возвращает новое число принятых байт.
+    """
+    with open(upload_path(upload), 'ab') as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadConflict(offset=upload_offset(upload))
+        current = file.seek(0, os.SEEK_END)
+        if offset != current:
+            raise UploadConflict(offset=current)
+        if current + length > upload['size']:
+            raise UploadTooLarge
+        remaining = length
+        while remaining and stream is not None:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            file.write(block)
+            remaining -= len(block)
+        return file.tell()
+
+
+def uploaded_image(token, user):
+    """Картинка завершенной загрузки для поля image.
+
+    Для загрузки по частям - файл, для загрузки напрямую
+    в хранилище - ключ объекта (str): картинку проверит фоновая
+    задача, API читает только размер объекта.
+    """
+    try:
+        upload = load_upload(token, user)
+    except NotFound as error:
+        raise ValidationError(error.detail)
+    if 'key' in upload:
+        if not default_storage.exists(upload['key']):
+            raise ValidationError('Файл не загружен в хранилище.')
+        if default_storage.size(upload['key']) != upload['size']:
+            raise ValidationError('Размер файла не совпадает с заявленным.')
+        return upload['key']
+    if not os.path.exists(upload_path(upload)):
+        raise ValidationError('Загрузка не найдена.')
+    if upload_offset(upload) != upload['size']:
+        raise ValidationError('Загрузка файла не завершена.')
+    return UploadedImage(
+        open(upload_path(upload), 'rb'), name='upload' + upload['ext'],
+    )
+
+
+def delete_upload(upload):
+    """Удаление файла загрузки."""
+    if 'key' in upload:
+        default_storage.delete(upload['key'])
+        return
+    try:
+        os.remove(upload_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def purge_uploads():
+    """Удаление файлов загрузок старше UPLOAD_MAX_AGE.
+
+    Токены таких загрузок уже недействительны. Возвращает число
+    удаленных файлов.
+    """
+    if not os.path.isdir(settings.UPLOAD_DIR):
+        return 0
+    border = time.time() - settings.UPLOAD_MAX_AGE
+    deleted = 0
+    with os.scandir(settings.UPLOAD_DIR) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < border:
+                os.remove(entry.path)
+                deleted += 1
+    return deleted
+
+
+def upload_state(token, upload, offset):
+    """Ответ API о состоянии загрузки."""
+    return {
+        'id': token,
+        'size': upload['size'],
+        'offset': offset,
+        'complete': offset == upload['size'],
+        'image': UPLOAD_PREFIX + token,
+    }
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api.asynchronous import async_urls
 from api.views import (
-    CustomUserViewSet, IngredientViewSet, RecipeViewSet, TagViewSet,
+    CustomUserViewSet, EventsTokenView, IngredientViewSet, MetricsView,
+    RecipeViewSet, SignedFileView, SyncView, TagViewSet, UploadDetailView,
+    UploadView,
 )
 
 router = DefaultRouter()
@@ -11,9 +15,34 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('users', CustomUserViewSet, basename='users')
 
+# Маршруты, GET и HEAD которых выполняются в пуле потоков (ASGI).
+ASYNC_URL_NAMES = (
+    'recipes-list',
+    'recipes-detail',
+    'recipes-facets',
+    'recipes-download-shopping-cart',
+    'tags-list',
+    'tags-detail',
+    'ingredients-list',
+    'ingredients-detail',
+)
+
+router_urls = router.urls
+if settings.ASYNC_VIEWS:
+    router_urls = async_urls(router_urls, ASYNC_URL_NAMES)
+
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('_metrics', MetricsView.as_view(), name='metrics'),
+    path('files/<str:token>/', SignedFileView.as_view(), name='signed-file'),
+    path('events/token/', EventsTokenView.as_view(), name='events-token'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('uploads/', UploadView.as_view(), name='uploads'),
+    path(
+        'uploads/<str:token>/', UploadDetailView.as_view(),
+        name='upload-detail',
+    ),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -0,0 +1,65 @@
+from recipes.models import Favorite, Follow, ShoppingCart
+
+
+class ViewerContext:
+    """Отношения текущего пользователя к авторам и рецептам запроса.
+
+    Подписки, избранное и список покупок загружаются одним запросом
+    на каждое отношение для всех id страницы и дальше проверяются
+    по множествам в памяти. Еще не загруженные id догружаются
+    при первом обращении.
+    """
+
+    def __init__(self, user):
+        self.user = user if user and user.is_authenticated else None
+        self.authors = set()
+        self.recipes = set()
+        self.following = set()
+        self.favorites = set()
+        self.cart = set()
+
+    def prime(self, authors=(), recipes=()):
+        """Загружает отношения для новых id авторов и рецептов."""
+        if self.user is None:
+            return
+        authors = set(authors) - self.authors
+        recipes = set(recipes) - self.recipes
+        if authors:
+            self.authors |= authors
+            self.following.update(Follow.objects.filter(
+                user=self.user, author__in=authors,
+            ).order_by().values_list('author_id', flat=True))
+        if recipes:
+            self.recipes |= recipes
+            self.favorites.update(Favorite.objects.filter(
+                user=self.user, recipe__in=recipes,
+            ).order_by().values_list('recipe_id', flat=True))
+            self.cart.update(ShoppingCart.objects.filter(
+                user=self.user, recipe__in=recipes,
+            ).order_by().values_list('recipe_id', flat=True))
+
+    def is_subscribed(self, author):
+        """Подписан ли пользователь на автора."""
+        self.prime(authors=(author.pk,))
+        return author.pk in self.following
+
+    def is_favorited(self, recipe):
+        """Добавлен ли рецепт в избранное."""
+        self.prime(recipes=(recipe.pk,))
+        return recipe.pk in self.favorites
+
+    def is_in_shopping_cart(self, recipe):
+        """Добавлен ли рецепт в список покупок."""
+        self.prime(recipes=(recipe.pk,))
+        return recipe.pk in self.cart
+
+
+def get_viewer(request):
+    """Контекст текущего пользователя, общий для всего запроса."""
+    if request is None:
+        return ViewerContext(None)
+    viewer = getattr(request, 'viewer', None)
+    if viewer is None:
+        viewer = ViewerContext(request.user)
+        request.viewer = viewer
+    return viewer
@@ -1,39 +1,107 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core import signing
+from django.db import connections
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag, urlencode
 from django_filters.rest_framework import DjangoFilterBackend
+from django_filters.utils import translate_validation
 from djoser.views import UserViewSet
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from api.authentication import token_cache
+from api.coalescing import coalesce
+from api.documents import recipe_documents
+from api.events import events_token
+from api.facets import (
+    DIMENSIONS, FacetResult, db_counts, facet_index, in_index, make_query,
+    search,
+)
+from api.files import file_response, load_signed_file, signed_file_url
 from api.filters import IngredientFilter, RecipeFilter
+from api.metrics import registry
+from api.mixins import ReplicaReadMixin
 from api.pagination import CustomPagination
-from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from api.parsers import MultiPartJSONParser
+from api.permissions import (
+    IsAdminOrReadOnly, IsAuthorOrReadOnly, IsMetricsScraper,
+)
+from api.renderers import ORJSONRenderer, RawJSON
 from api.serializers import (
     CustomUserSerializer, FollowSerializer, IngredientSerializer,
     RecipeSerializer, RecipeShortSerializer, RecipeWriteSerializer,
-    TagSerializer,
+    TagSerializer, UploadSerializer, sparse_fieldsets,
+)
+from api.sql_json import recipe_json
+from api.sync import (
+    head, make_token, read_changes, read_token, sync_payload,
 )
+from api.tasks import check_uploaded_image
+from api.uploads import (
+    append_chunk, create_direct_upload, create_upload, delete_upload,
+    direct_uploads, load_chunked_upload, load_upload, upload_offset,
+    upload_state,
+)
+from api.viewer import get_viewer
 from recipes.models import (
-    Favorite, Follow, Ingredient, IngredientInRecipe, Recipe, ShoppingCart,
+    Favorite, Follow, Ingredient, Recipe, ShoppingCart, ShoppingListDocument,
     Tag,
 )
+from recipes.shopping_list import FORMATS, render_document
+from users.tasks import delete_user, history_size
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ReplicaReadMixin, UserViewSet):
     """Представление для пользователей."""
 
     http_method_names = ['get', 'post', 'delete']
+    replica_actions = ('list',)
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        """Пользователи только с выбранными в ?fields= столбцами."""
+        queryset = super().get_queryset()
+        fields, _ = sparse_fieldsets(self.request)
+        if fields is None or self.request.method not in SAFE_METHODS:
+            return queryset
+        columns = ('email', 'username', 'first_name', 'last_name')
+        return queryset.only(
+            'id', *[name for name in columns if name in fields],
+        )
+
+    def perform_destroy(self, instance):
+        """Удаление пользователя.
+
+        Выход при удалении себя выполняет djoser в destroy(), токены
+        пользователя и их записи в кэше токенов удаляются здесь при
+        любом способе удаления. Пользователь с историей больше
+        USER_DELETE_ASYNC_THRESHOLD строк сразу деактивируется
+        и удаляется фоновой задачей.
+        """
+        tokens = Token.objects.filter(user=instance)
+        token_cache.delete(*tokens.values_list('key', flat=True))
+        tokens.delete()
+        if history_size(instance.pk) < settings.USER_DELETE_ASYNC_THRESHOLD:
+            super().perform_destroy(instance)
+            return
+        instance.is_active = False
+        instance.save(update_fields=('is_active',))
+        delete_user.delay(instance.pk)
+
     @action(
         detail=True,
         methods=('post', 'delete'),
@@ -74,27 +142,40 @@ class CustomUserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, ReadOnlyModelViewSet):
     """Представление для ингредиентов."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    cache_compressed = True
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     pagination_class = None
+    throttle_actions = {'list': 'ingredients'}
+
+    def list(self, request, *args, **kwargs):
+        """Список ингредиентов, общий для одновременных запросов."""
+        def build():
+            return super(IngredientViewSet, self).list(
+                request, *args, **kwargs,
+            ).data
 
+        key = f'ingredients:{request.query_params.urlencode()}'
+        return Response(coalesce(key, build))
 
-class TagViewSet(ReadOnlyModelViewSet):
+
+class TagViewSet(ReplicaReadMixin, ReadOnlyModelViewSet):
     """Представление для тегов."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    cache_compressed = True
     pagination_class = None
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, ModelViewSet):
     """Представление для рецептов."""
 
     http_method_names = ['get', 'post', 'patch', 'delete']
@@ -103,16 +184,214 @@ class RecipeViewSet(ModelViewSet):
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    parser_classes = (JSONParser, MultiPartJSONParser)
+    throttle_actions = {'download_shopping_cart': 'shopping_list'}
+    replica_actions = ('list', 'retrieve', 'facets')
+
+    def get_queryset(self):
+        """Рецепты со связанными объектами, нужными для ответа."""
+        if self.request.method not in SAFE_METHODS:
+            return Recipe.objects.all()
+        if self.use_documents():
+            return Recipe.objects.with_documents()
+        return Recipe.objects.for_representation(
+            *sparse_fieldsets(self.request),
+        )
 
     def get_serializer_class(self):
         """Выбор сериализатора в зависимости от метода."""
-        if self.action in SAFE_METHODS:
+        if self.request.method in SAFE_METHODS:
             return RecipeSerializer
         return RecipeWriteSerializer
 
+    def use_documents(self):
+        """Чтение рецептов из RecipeDocument.
+
+        Готовые представления содержат все поля рецепта, поэтому
+        используются только без ?fields=.
+        """
+        fields, _ = sparse_fieldsets(self.request)
+        return (
+            settings.RECIPE_DOCUMENTS
+            and self.action in ('list', 'retrieve')
+            and fields is None
+        )
+
+    def sql_json_db(self):
+        """База для сборки JSON средствами PostgreSQL или None.
+
+        Путь включается RECIPE_SQL_JSON и используется только для
+        JSON-ответа без отступов, ?fields= и ?expand=.
+        """
+        request = self.request
+        renderer = request.accepted_renderer
+        if not (
+            settings.RECIPE_SQL_JSON
+            and type(renderer) is ORJSONRenderer
+            and not renderer.get_indent(request.accepted_media_type, {})
+            and sparse_fieldsets(request) == (None, set())
+        ):
+            return None
+        using = self.get_queryset().db
+        if connections[using].vendor != 'postgresql':
+            return None
+        return using
+
+    def get_filterset(self, queryset, skip=()):
+        """Проверенный RecipeFilter по параметрам запроса без skip."""
+        params = self.request.query_params.copy()
+        for name in skip:
+            params.pop(name, None)
+        filterset = RecipeFilter(
+            params, queryset=queryset, request=self.request,
+        )
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        return filterset
+
+    def filter_queryset(self, queryset):
+        """Фильтрация списка по битовому индексу (RECIPE_FACETS).
+
+        Если в запросе есть условия, которых нет в индексе,
+        фильтрует БД.
+        """
+        if self.action != 'list' or not settings.RECIPE_FACETS:
+            return super().filter_queryset(queryset)
+        filterset = self.get_filterset(queryset)
+        result = search(filterset.form.cleaned_data, queryset)
+        return filterset.qs if result is None else result
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов."""
+        using = self.sql_json_db()
+        if using is not None:
+            return self.sql_json_list(request, using)
+        if not self.use_documents():
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()),
+        )
+        return self.get_paginated_response(recipe_documents(page, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт по id с ETag и Last-Modified.
+
+        If-None-Match проверяется до сборки ответа: при совпадении
+        ETag возвращается 304 без сериализации рецепта.
+        """
+        recipe = self.get_version()
+        validators = self.validators(recipe)
+        response = get_conditional_response(
+            request, etag=validators['ETag'],
+        )
+        if response is None:
+            response = self.render_recipe(request, *args, **kwargs)
+        for header, value in validators.items():
+            response[header] = value
+        return response
+
+    def render_recipe(self, request, *args, **kwargs):
+        """Ответ с рецептом выбранным способом сборки."""
+        using = self.sql_json_db()
+        if using is not None:
+            return self.sql_json_retrieve(request, using)
+        if not self.use_documents():
+            return super().retrieve(request, *args, **kwargs)
+        return Response(recipe_documents([self.get_object()], request)[0])
+
+    def update(self, request, *args, **kwargs):
+        """Изменение рецепта с новыми ETag и Last-Modified в ответе."""
+        response = super().update(request, *args, **kwargs)
+        for header, value in self.validators(self.get_version()).items():
+            response[header] = value
+        return response
+
+    def perform_update(self, serializer):
+        """Сохранение рецепта с проверкой If-Match."""
+        check_uploaded_image(serializer.save(
+            expected_versions=self.if_match_versions(),
+        ))
+
+    def get_version(self):
+        """Рецепт запроса только с автором и версией."""
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return Recipe.objects.only(
+                'author', 'updated_at', 'version',
+            ).get(pk=self.kwargs[lookup])
+        except (Recipe.DoesNotExist, TypeError, ValueError):
+            raise Http404
+
+    def validators(self, recipe):
+        """ETag и Last-Modified рецепта для текущего пользователя.
+
+        Кроме версии рецепта ETag учитывает формат ответа и отношения
+        пользователя к рецепту и автору, которые в версию не входят.
+        """
+        viewer = get_viewer(self.request)
+        viewer.prime(authors=(recipe.author_id,), recipes=(recipe.pk,))
+        flags = (
+            recipe.author_id in viewer.following,
+            recipe.pk in viewer.favorites,
+            recipe.pk in viewer.cart,
+        )
+        return {
+            'ETag': quote_etag(
+                f'{recipe.version}-{self.request.accepted_renderer.format}-'
+                + ''.join(str(int(flag)) for flag in flags),
+            ),
+            'Last-Modified': http_date(recipe.updated_at.timestamp()),
+        }
+
+    def if_match_versions(self):
+        """Версии рецепта из If-Match, None - без проверки.
+
+        Сравнивается только версия из ETag, поэтому подходят и
+        ETag, ослабленные сжатием ответа (W/).
+        """
+        header = self.request.META.get('HTTP_IF_MATCH')
+        if header is None:
+            return None
+        etags = parse_etags(header)
+        if '*' in etags:
+            return None
+        versions = set()
+        for etag in etags:
+            version = etag.replace('W/', '', 1).strip('"').split('-')[0]
+            if version.isdigit():
+                versions.add(int(version))
+        return versions
+
+    def sql_json_list(self, request, using):
+        """Страница рецептов с JSON, собранным PostgreSQL."""
+        queryset = self.filter_queryset(self.get_queryset())
+        if isinstance(queryset, FacetResult):
+            ids = self.paginate_queryset(queryset.ids)
+        else:
+            ids = self.paginate_queryset(
+                queryset.prefetch_related(None).values_list('pk', flat=True),
+            )
+        results = RawJSON(
+            '[' + ','.join(recipe_json(ids, request, using)) + ']',
+        )
+        response = self.get_paginated_response([])
+        response.data['results'] = results
+        return response
+
+    def sql_json_retrieve(self, request, using):
+        """Рецепт с JSON, собранным PostgreSQL."""
+        try:
+            pk = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise Http404
+        rows = recipe_json((pk,), request, using)
+        if not rows:
+            raise Http404
+        return Response(RawJSON(rows[0]))
+
     def perform_create(self, serializer):
         """Сохранение объекта."""
-        serializer.save(author=self.request.user)
+        check_uploaded_image(serializer.save(author=self.request.user))
 
     def add_to(self, model, recipe, user):
         """Добавление рецепта в список."""
@@ -165,35 +444,199 @@ class RecipeViewSet(ModelViewSet):
             return self.add_to(Favorite, recipe, user)
         return self.delete_from(Favorite, recipe, user)
 
+    @action(detail=False, methods=('get',))
+    def facets(self, request):
+        """Число рецептов по фильтрам списка и по значениям фильтров.
+
+        tags - рецептов с каждым тегом, cooking_time - в каждом
+        интервале времени приготовления, ingredients - с каждым
+        ингредиентом из ?ingredients= и ?exclude_ingredients=.
+        Счетчики измерения считаются без его собственных фильтров.
+        """
+        queryset = Recipe.objects.all()
+        data = self.get_filterset(queryset).form.cleaned_data
+        query = make_query(data)
+        if in_index(data):
+            counts = facet_index.counts(query)
+        else:
+            counts = db_counts(
+                lambda skip: self.get_filterset(
+                    queryset, DIMENSIONS.get(skip, ()),
+                ).qs,
+                query,
+            )
+        tags = counts['tags']
+        return Response({
+            **counts,
+            'tags': {
+                slug: tags.get(pk, 0)
+                for pk, slug in Tag.objects.values_list('pk', 'slug')
+            },
+        })
+
     @action(
         detail=False,
         methods=('get',),
         permission_classes=(IsAuthenticated,),
     )
     def download_shopping_cart(self, request):
-        """Выгрузка списка покупок в файл."""
+        """Выгрузка списка покупок в файл (?type=txt или pdf).
+
+        Файлы создаются фоновой задачей после изменения корзины,
+        синхронно - только если они устарели. С ?link=true вместо
+        файла возвращается временная ссылка на него.
+        """
         user = request.user
+        file_type = request.query_params.get('type', 'txt')
+        if file_type not in FORMATS:
+            return Response(
+                {'errors': f'Доступные форматы: {", ".join(FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         if not user.shopping_cart.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        ingredients = (
-            IngredientInRecipe.objects.filter(
-                recipe__shopping_cart__user=user,
+        document = ShoppingListDocument.objects.filter(user=user).first()
+        if document is None or not document.is_fresh:
+            document = coalesce(
+                f'shopping_cart:{user.pk}', lambda: render_document(user.pk),
+            )
+
+        name = getattr(document, file_type).name
+        filename = f'{user.username}_shopping_list.{file_type}'
+        if request.query_params.get('link') == 'true':
+            return Response({'url': signed_file_url(request, name, filename)})
+        return file_response(name, filename, FORMATS[file_type])
+
+
+class SignedFileView(APIView):
+    """Скачивание файла по временной подписанной ссылке."""
+
+    authentication_classes = ()
+    permission_classes = ()
+
+    def get(self, request, token):
+        """Проверка подписи и отдача файла."""
+        try:
+            name, filename = load_signed_file(token)
+        except signing.BadSignature:
+            raise Http404
+        return file_response(name, filename)
+
+
+class EventsTokenView(APIView):
+    """Токен для подключения к потоку событий из браузера."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        """Подписанный токен и адрес потока событий с ним."""
+        token = events_token(request.user)
+        return Response({
+            'token': token,
+            'url': request.build_absolute_uri(
+                f'/api/events/?{urlencode({"token": token})}',
+            ),
+        }, status=status.HTTP_201_CREATED)
+
+
+class UploadView(APIView):
+    """Загрузка большого файла.
+
+    POST с {"size": байт, "name": имя файла} создает загрузку.
+    С объектным хранилищем ответ содержит форму (url и fields),
+    которой клиент отправляет файл напрямую в хранилище. Иначе
+    части отправляются в PATCH /api/uploads/<id>/ телом запроса
+    с заголовком Upload-Offset - позицией части; GET возвращает
+    принятое число байт, с него загрузка продолжается после обрыва.
+    Завершенная загрузка передается в поле image рецепта значением
+    из ответа (upload:<id>).
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        """Создание загрузки."""
+        serializer = UploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+        size = serializer.validated_data['size']
+        name = serializer.validated_data['name']
+        if direct_uploads():
+            return Response(
+                create_direct_upload(user, size, name),
+                status=status.HTTP_201_CREATED,
             )
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(quantity=Sum('amount')).order_by()
+        token, upload = create_upload(user, size, name)
+        return Response(
+            upload_state(token, upload, 0), status=status.HTTP_201_CREATED,
         )
 
-        shopping_list = ('Список покупок: \n\n')
-        shopping_list += ''.join([
-            f'- {ingredient["ingredient__name"]}, '
-            + f'({ingredient["ingredient__measurement_unit"]})'
-            + f' - {ingredient["quantity"]}\n'
-            for ingredient in ingredients
-        ])
 
-        filename = f'{user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={filename}'
+class UploadDetailView(APIView):
+    """Состояние загрузки по частям, прием частей и отмена загрузки."""
 
-        return response
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, token):
+        """Принятое число байт."""
+        upload = load_chunked_upload(token, request.user)
+        return Response(upload_state(token, upload, upload_offset(upload)))
+
+    def patch(self, request, token):
+        """Запись части файла из тела запроса без чтения в память."""
+        upload = load_chunked_upload(token, request.user)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError(
+                {'Upload-Offset': 'Укажите позицию части в байтах.'},
+            )
+        offset = append_chunk(upload, offset, request.stream, length)
+        return Response(upload_state(token, upload, offset))
+
+    def delete(self, request, token):
+        """Отмена загрузки."""
+        delete_upload(load_upload(token, request.user))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SyncView(APIView):
+    """Изменения рецептов, избранного, корзины и подписок.
+
+    Без ?since= возвращает только токен конца журнала: его нужно
+    получить до полной загрузки данных. С ?since= - изменения после
+    токена порциями по SYNC_PAGE_SIZE строк журнала и токен next
+    для следующего запроса; has_more - есть ли еще изменения.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """Порция изменений после токена."""
+        since = request.query_params.get('since')
+        if since is None:
+            entries, cursor, has_more = [], head(), False
+        else:
+            entries, cursor, has_more = read_changes(
+                request.user, read_token(since), settings.SYNC_PAGE_SIZE,
+            )
+        return Response({
+            **sync_payload(request.user, entries, request),
+            'next': make_token(cursor),
+            'has_more': has_more,
+        })
+
+
+class MetricsView(APIView):
+    """Метрики процесса в формате Prometheus."""
+
+    permission_classes = (IsMetricsScraper,)
+
+    def get(self, request):
+        """Выгрузка метрик."""
+        return HttpResponse(
+            registry.prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
@@ -0,0 +1,101 @@
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с оценкой числа строк для списка без фильтров.
+
+    COUNT(*) в PostgreSQL читает всю таблицу, поэтому для списка без
+    условий берется оценка pg_class.reltuples. Таблицы меньше
+    ADMIN_COUNT_ESTIMATE_THRESHOLD строк и отфильтрованные списки
+    считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        """Число объектов, для больших таблиц - оценка."""
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [connection.ops.quote_name(
+                    self.object_list.model._meta.db_table,
+                )],
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < settings.ADMIN_COUNT_ESTIMATE_THRESHOLD:
+            return super().count
+        return row[0]
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """Фильтр по связанному объекту с выбором через автодополнение.
+
+    В отличие от стандартного фильтра не выводит все связанные
+    объекты: значение ищется запросами к admin/autocomplete/.
+    У админа связанной модели должны быть заданы search_fields.
+    """
+
+    template = 'admin/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.parameter_name = f'{self.field_name}__id__exact'
+        super().__init__(request, params, model, model_admin)
+        field = model._meta.get_field(self.field_name)
+        self.widget_id = f'autocomplete-filter-{self.field_name}'
+        choice = forms.ModelChoiceField(
+            queryset=field.related_model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+        self.rendered_widget = choice.widget.render(
+            self.parameter_name, self.value(), {'id': self.widget_id},
+        )
+
+    def has_output(self):
+        """Фильтр выводится всегда."""
+        return True
+
+    def lookups(self, request, model_admin):
+        """Варианты не перечисляются."""
+        return ()
+
+    def queryset(self, request, queryset):
+        """Объекты, связанные с выбранным."""
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class ScalableAdminMixin:
+    """Список объектов для больших таблиц.
+
+    Оценка числа строк вместо COUNT(*), без повторного подсчета всей
+    таблицы при фильтрации и со скриптами фильтров-автодополнений.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        """Скрипты и стили select2 для фильтров-автодополнений."""
+        media = super().media
+        if any(
+            isinstance(item, type) and issubclass(item, AutocompleteFilter)
+            for item in self.list_filter
+        ):
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
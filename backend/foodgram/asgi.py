@@ -4,4 +4,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.events import event_stream  # noqa: E402
+
+# Поток событий обслуживается без Django: в Django 3.2 нет
+# асинхронных потоковых ответов.
+EVENTS_PATH = '/api/events/'
+
+
+async def application(scope, receive, send):
+    """Поток событий и остальные запросы Django."""
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        await event_stream(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
@@ -0,0 +1,409 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FGCACHE1'
+
+# Заголовок файла: метка, размер ячейки, число ячеек, число ячеек
+# в наборе, поколение. Поколение - последнее поле заголовка.
+HEADER = struct.Struct('<8sQQQQ')
+GENERATION = struct.Struct('<Q')
+GENERATION_OFFSET = HEADER.size - GENERATION.size
+HEADER_SIZE = 64
+
+# Заголовок ячейки: счетчик записи, хэш ключа, поколение, срок
+# действия (0 - бессрочно), длины ключа и значения. За ним - бит
+# обращения CLOCK, с DATA_OFFSET - ключ и значение.
+SLOT = struct.Struct('<QQQdII')
+SEQUENCE = struct.Struct('<Q')
+REFERENCE_OFFSET = SLOT.size
+DATA_OFFSET = 48
+
+# Попытки прочитать ячейку, которую в это время перезаписывают.
+READ_RETRIES = 8
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def key_hash(key):
+    """64-битный хэш ключа."""
+    return int.from_bytes(
+        hashlib.blake2b(key, digest_size=8).digest(), 'little',
+    )
+
+
+class Table:
+    """Файл таблицы, отображенный в память процесса.
+
+    Django создает экземпляр кэша в каждом потоке, а fcntl-блокировки
+    принадлежат процессу и снимаются при закрытии любого дескриптора
+    файла, поэтому файл, отображение и блокировки - общие для всех
+    экземпляров кэша с одним LOCATION в процессе.
+    """
+
+    def __init__(self, path, header, file_size, stripes):
+        self.path = path
+        self.header = header
+        self.file_size = file_size
+        self.stripes = stripes
+        self.open_lock = threading.Lock()
+        self.pid = None
+        self.counters = {
+            'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0,
+            'too_large': 0, 'read_retries': 0,
+        }
+
+    @property
+    def memory(self):
+        """Отображение файла в память текущего процесса."""
+        if self.pid != os.getpid():
+            with self.open_lock:
+                if self.pid != os.getpid():
+                    self.open()
+        return self.mapping
+
+    def open(self):
+        """Открывает файл, при необходимости создавая таблицу.
+
+        Файл с другой разметкой (изменились настройки) заменяется
+        новым: процессы, отобразившие прежний файл, работают с ним
+        до перезапуска и не получают ошибок доступа к памяти. Так
+        бывает при поэтапном перезапуске воркеров после смены
+        CACHE_SIZE или CACHE_SLOT_SIZE: пока работают старые воркеры,
+        у них своя копия кэша, и изменения и удаления (например,
+        сброс токенов при выходе) не доходят до новых воркеров
+        и обратно.
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            stat = os.fstat(fd)
+            try:
+                current = os.stat(self.path).st_ino == stat.st_ino
+            except FileNotFoundError:
+                current = False
+            if not current:
+                os.close(fd)
+                continue
+            if stat.st_size == 0:
+                os.ftruncate(fd, self.file_size)
+                os.pwrite(fd, self.header, 0)
+            elif (stat.st_size != self.file_size
+                  or os.pread(fd, GENERATION_OFFSET, 0)
+                  != self.header[:GENERATION_OFFSET]):
+                logger.warning(
+                    'Разметка кэша %s изменилась, файл создается заново; '
+                    'процессы со старой разметкой не видят изменений '
+                    'до перезапуска.', self.path,
+                )
+                os.unlink(self.path)
+                os.close(fd)
+                continue
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            break
+        self.fd = fd
+        self.mapping = mmap.mmap(fd, self.file_size)
+        self.locks = [threading.Lock() for _ in range(self.stripes + 1)]
+        self.pid = os.getpid()
+
+    @contextmanager
+    def locked(self, stripe):
+        """Блокировка полосы во всех процессах.
+
+        Полоса self.stripes защищает поколение.
+        """
+        memory = self.memory
+        with self.locks[stripe]:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield memory
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, stripe)
+
+
+def get_table(path, header, file_size, stripes):
+    """Общая для процесса таблица файла path."""
+    with _tables_lock:
+        table = _tables.get(path)
+        if table is not None and table.header == header:
+            return table
+        _tables[path] = Table(path, header, file_size, stripes)
+        return _tables[path]
+
+
+class SharedMemoryCache(BaseCache):
+    """Кэш Django в файле, отображенном в память всех процессов узла.
+
+    Воркеры gunicorn на одном узле видят одни и те же записи, поэтому
+    удаление или изменение записи в одном воркере сразу видно
+    в остальных. Файл - хэш-таблица фиксированного размера из ячеек
+    SLOT_SIZE байт, сгруппированных в наборы по WAYS ячеек; ключ
+    попадает в набор по хэшу. Если в наборе нет свободной ячейки,
+    вытесняется запись по алгоритму CLOCK. Значения, которые не
+    помещаются в ячейку, не кэшируются.
+
+    Чтение не берет блокировок: запись в ячейку увеличивает ее счетчик
+    до и после изменения, и чтение повторяется, если счетчик нечетный
+    или изменился. Изменения наборов защищены блокировками полос
+    (STRIPES) - блокировкой потока и fcntl-блокировкой байта файла.
+    clear() увеличивает поколение в заголовке: записи прежних
+    поколений считаются отсутствующими.
+
+    LOCATION - путь к файлу, обычно в /dev/shm. OPTIONS:
+        SIZE(int): Размер таблицы, байт.
+        SLOT_SIZE(int): Размер ячейки, байт.
+        WAYS(int): Число ячеек в наборе.
+        STRIPES(int): Число полос блокировок.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.slot_size = int(options.get('SLOT_SIZE', 4096))
+        self.ways = int(options.get('WAYS', 8))
+        self.stripes = int(options.get('STRIPES', 64))
+        size = int(options.get('SIZE', 32 * 1024 * 1024))
+        if self.slot_size <= DATA_OFFSET or not 0 < self.ways < 256:
+            raise ValueError('SLOT_SIZE или WAYS вне допустимых значений.')
+        self.sets = max(1, size // (self.slot_size * self.ways))
+        self.capacity = self.slot_size - DATA_OFFSET
+        # После заголовка - стрелки CLOCK наборов, по байту на набор.
+        self.slots_offset = HEADER_SIZE + -(-self.sets // 64) * 64
+        self.table = get_table(
+            location,
+            HEADER.pack(
+                MAGIC, self.slot_size, self.sets * self.ways, self.ways, 1,
+            ),
+            self.slots_offset + self.sets * self.ways * self.slot_size,
+            self.stripes,
+        )
+        self.counters = self.table.counters
+
+    @property
+    def memory(self):
+        """Отображение таблицы в память текущего процесса."""
+        return self.table.memory
+
+    def locked(self, stripe):
+        """Блокировка полосы таблицы."""
+        return self.table.locked(stripe)
+
+    def generation(self, memory):
+        """Текущее поколение записей."""
+        return GENERATION.unpack_from(memory, GENERATION_OFFSET)[0]
+
+    def locate(self, key):
+        """Хэш ключа, номер набора и смещение его первой ячейки."""
+        hashed = key_hash(key)
+        index = hashed % self.sets
+        offset = self.slots_offset + index * self.ways * self.slot_size
+        return hashed, index, offset
+
+    def lookup(self, key):
+        """Значение ключа (байты) без блокировок или None."""
+        memory = self.memory
+        hashed, _, base = self.locate(key)
+        generation = self.generation(memory)
+        for way in range(self.ways):
+            offset = base + way * self.slot_size
+            for _ in range(READ_RETRIES):
+                (sequence, slot_hash, slot_generation, expires,
+                 key_length, value_length) = SLOT.unpack_from(memory, offset)
+                if sequence & 1:
+                    self.counters['read_retries'] += 1
+                    continue
+                if (slot_hash != hashed or slot_generation != generation
+                        or key_length != len(key)
+                        or key_length + value_length > self.capacity):
+                    break
+                start = offset + DATA_OFFSET
+                data = memory[start:start + key_length + value_length]
+                if SEQUENCE.unpack_from(memory, offset)[0] != sequence:
+                    self.counters['read_retries'] += 1
+                    continue
+                if data[:key_length] != key:
+                    break
+                if expires and expires <= time.time():
+                    return None
+                memory[offset + REFERENCE_OFFSET] = 1
+                return data[key_length:]
+        return None
+
+    def find(self, memory, key, hashed, index, base):
+        """Ячейка ключа в наборе под блокировкой: (смещение, найдена).
+
+        Для нового ключа - свободная ячейка или вытесняемая по CLOCK:
+        стрелка набора проходит ячейки, сбрасывая бит обращения,
+        до первой ячейки без него.
+        """
+        generation = self.generation(memory)
+        now = time.time()
+        free = None
+        for way in range(self.ways):
+            offset = base + way * self.slot_size
+            _, slot_hash, slot_generation, expires, key_length, _ = (
+                SLOT.unpack_from(memory, offset)
+            )
+            live = (slot_generation == generation
+                    and not (expires and expires <= now))
+            if not live:
+                if free is None:
+                    free = offset
+                continue
+            start = offset + DATA_OFFSET
+            if (slot_hash == hashed
+                    and memory[start:start + key_length] == key):
+                return offset, True
+        if free is not None:
+            return free, False
+        hand = HEADER_SIZE + index
+        way = memory[hand] % self.ways
+        while memory[base + way * self.slot_size + REFERENCE_OFFSET]:
+            memory[base + way * self.slot_size + REFERENCE_OFFSET] = 0
+            way = (way + 1) % self.ways
+        memory[hand] = (way + 1) % self.ways
+        self.counters['evictions'] += 1
+        return base + way * self.slot_size, False
+
+    def write(self, memory, offset, hashed, generation, expires, key,
+              value):
+        """Запись ячейки с нечетным счетчиком на время изменения."""
+        sequence = SEQUENCE.unpack_from(memory, offset)[0]
+        SEQUENCE.pack_into(memory, offset, sequence + 1)
+        SLOT.pack_into(
+            memory, offset, sequence + 1, hashed, generation, expires,
+            len(key), len(value),
+        )
+        start = offset + DATA_OFFSET
+        memory[start:start + len(key) + len(value)] = key + value
+        memory[offset + REFERENCE_OFFSET] = 1
+        SEQUENCE.pack_into(memory, offset, sequence + 2)
+
+    def expires(self, timeout):
+        """Срок действия записи для заголовка ячейки."""
+        expires = self.get_backend_timeout(timeout)
+        return 0.0 if expires is None else expires
+
+    def store(self, key, value, timeout, only_new=False):
+        """Сохраняет байты value, возвращает, сохранены ли они."""
+        if len(key) + len(value) > self.capacity:
+            self.counters['too_large'] += 1
+            if not only_new:
+                self.remove(key)
+            return False
+        hashed, index, base = self.locate(key)
+        with self.locked(index % self.stripes) as memory:
+            offset, found = self.find(memory, key, hashed, index, base)
+            if only_new and found:
+                return False
+            self.write(
+                memory, offset, hashed, self.generation(memory),
+                self.expires(timeout), key, value,
+            )
+        self.counters['sets'] += 1
+        return True
+
+    def remove(self, key):
+        """Удаляет запись, возвращает, была ли она."""
+        hashed, index, base = self.locate(key)
+        with self.locked(index % self.stripes) as memory:
+            offset, found = self.find(memory, key, hashed, index, base)
+            if found:
+                sequence = SEQUENCE.unpack_from(memory, offset)[0]
+                SLOT.pack_into(memory, offset, sequence + 2, 0, 0, 0, 0, 0)
+        return found
+
+    def encode_key(self, key, version):
+        """Полный ключ в байтах."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key.encode()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.encode_key(key, version)
+        return self.store(
+            key, pickle.dumps(value, self.pickle_protocol), timeout,
+            only_new=True,
+        )
+
+    def get(self, key, default=None, version=None):
+        data = self.lookup(self.encode_key(key, version))
+        if data is None:
+            self.counters['misses'] += 1
+            return default
+        self.counters['hits'] += 1
+        return pickle.loads(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.store(
+            self.encode_key(key, version),
+            pickle.dumps(value, self.pickle_protocol), timeout,
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.encode_key(key, version)
+        hashed, index, base = self.locate(key)
+        with self.locked(index % self.stripes) as memory:
+            offset, found = self.find(memory, key, hashed, index, base)
+            if found:
+                start = offset + DATA_OFFSET + len(key)
+                length = SLOT.unpack_from(memory, offset)[5]
+                self.write(
+                    memory, offset, hashed, self.generation(memory),
+                    self.expires(timeout), key,
+                    memory[start:start + length],
+                )
+        return found
+
+    def delete(self, key, version=None):
+        return self.remove(self.encode_key(key, version))
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарное увеличение значения во всех процессах."""
+        encoded = self.encode_key(key, version)
+        hashed, index, base = self.locate(encoded)
+        with self.locked(index % self.stripes) as memory:
+            offset, found = self.find(memory, encoded, hashed, index, base)
+            if not found:
+                raise ValueError(f"Key '{key}' not found")
+            (_, _, generation, expires, key_length,
+             value_length) = SLOT.unpack_from(memory, offset)
+            start = offset + DATA_OFFSET + key_length
+            value = pickle.loads(memory[start:start + value_length]) + delta
+            data = pickle.dumps(value, self.pickle_protocol)
+            if len(encoded) + len(data) > self.capacity:
+                raise ValueError(f"Value of key '{key}' is too large")
+            self.write(
+                memory, offset, hashed, generation, expires, encoded, data,
+            )
+        return value
+
+    def clear(self):
+        """Сбрасывает все записи увеличением поколения."""
+        with self.locked(self.stripes) as memory:
+            GENERATION.pack_into(
+                memory, GENERATION_OFFSET, self.generation(memory) + 1,
+            )
+
+
+def shared_cache_metrics():
+    """Метрики кэшей в разделяемой памяти в формате (имя, значение)."""
+    for path, table in list(_tables.items()):
+        for name, value in table.counters.items():
+            yield f'foodgram_shared_cache_{name}{{path="{path}"}}', value
@@ -0,0 +1,303 @@
+from contextlib import contextmanager
+
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently as PostgresAddIndexConcurrently,
+)
+from django.db.backends.ddl_references import Statement
+from django.db.migrations import AddIndex
+from django.db.migrations.operations.base import Operation
+
+
+class AddIndexConcurrently(PostgresAddIndexConcurrently):
+    """Создание индекса без блокировки записи в таблицу.
+
+    В PostgreSQL индекс строится CREATE INDEX CONCURRENTLY, оставшийся
+    от прерванной сборки невалидный индекс сначала удаляется.
+    В остальных СУБД выполняется обычный CREATE INDEX.
+    Миграция с этой операцией должна быть неатомарной (atomic = False).
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        """Создание индекса."""
+        if schema_editor.connection.vendor != 'postgresql':
+            AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state,
+            )
+            return
+        self.drop_invalid(schema_editor)
+        super().database_forwards(
+            app_label, schema_editor, from_state, to_state,
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        """Удаление индекса."""
+        if schema_editor.connection.vendor != 'postgresql':
+            AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state,
+            )
+            return
+        super().database_backwards(
+            app_label, schema_editor, from_state, to_state,
+        )
+
+    def drop_invalid(self, schema_editor):
+        """Удаление невалидного индекса с тем же именем."""
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_index JOIN pg_class '
+                'ON pg_class.oid = pg_index.indexrelid '
+                'WHERE pg_class.relname = %s AND NOT pg_index.indisvalid',
+                [self.index.name],
+            )
+            invalid = cursor.fetchone() is not None
+        if invalid:
+            schema_editor.execute(
+                'DROP INDEX CONCURRENTLY IF EXISTS '
+                f'{schema_editor.quote_name(self.index.name)}',
+            )
+
+
+def foreign_keys(schema_editor, field):
+    """Имена ограничений внешнего ключа поля в PostgreSQL."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, field.model._meta.db_table,
+        )
+    return [
+        name for name, constraint in constraints.items()
+        if constraint['foreign_key']
+        and constraint['columns'] == [field.column]
+    ]
+
+
+class AddDatabaseCascade(Operation):
+    """Каскадное удаление строк по внешнему ключу средствами БД.
+
+    В PostgreSQL ограничение пересоздается с ON DELETE CASCADE
+    и NOT VALID: существующие строки не проверяются, пока таблица
+    заблокирована. Их проверяет ValidateDatabaseCascade в отдельной
+    неатомарной миграции. В SQLite создается триггер удаления.
+    Поле модели должно иметь on_delete=DO_NOTHING (см. миграцию
+    recipes 0003_db_cascade).
+    """
+
+    reversible = True
+
+    def __init__(self, model_name, name):
+        self.model_name = model_name
+        self.name = name
+
+    def deconstruct(self):
+        """Параметры для сериализации миграции."""
+        return (
+            self.__class__.__name__, [],
+            {'model_name': self.model_name, 'name': self.name},
+        )
+
+    def state_forwards(self, app_label, state):
+        """Состояние моделей не меняется."""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        """Включение каскадного удаления."""
+        model = to_state.apps.get_model(app_label, self.model_name)
+        self.set_cascade(schema_editor, model._meta.get_field(self.name))
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        """Отключение каскадного удаления."""
+        model = from_state.apps.get_model(app_label, self.model_name)
+        self.set_cascade(
+            schema_editor, model._meta.get_field(self.name), cascade=False,
+        )
+
+    def describe(self):
+        """Описание операции."""
+        return f'Database cascade for {self.model_name}.{self.name}'
+
+    @staticmethod
+    def set_cascade(schema_editor, field, cascade=True):
+        """ON DELETE CASCADE в PostgreSQL, триггер удаления в SQLite."""
+        connection = schema_editor.connection
+        quote = schema_editor.quote_name
+        table, column = field.model._meta.db_table, field.column
+        to_table = field.related_model._meta.db_table
+        to_column = field.target_field.column
+        if connection.vendor == 'sqlite':
+            trigger = quote(f'{table}_{column}_cascade')
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            if cascade:
+                schema_editor.execute(
+                    f'CREATE TRIGGER {trigger} BEFORE DELETE ON '
+                    f'{quote(to_table)} FOR EACH ROW BEGIN DELETE FROM '
+                    f'{quote(table)} WHERE {quote(column)} = '
+                    f'OLD.{quote(to_column)}; END',
+                )
+            return
+        if connection.vendor != 'postgresql':
+            return
+        # Ограничения новой таблицы создаются в конце миграции
+        # (deferred_sql), их нужно создать до пересоздания.
+        for statement in list(schema_editor.deferred_sql):
+            if (isinstance(statement, Statement)
+                    and statement.references_column(table, column)):
+                schema_editor.execute(statement)
+                schema_editor.deferred_sql.remove(statement)
+        on_delete = 'ON DELETE CASCADE' if cascade else ''
+        for name in foreign_keys(schema_editor, field):
+            schema_editor.execute(
+                f'ALTER TABLE {quote(table)} DROP CONSTRAINT '
+                f'{quote(name)}, ADD CONSTRAINT {quote(name)} '
+                f'FOREIGN KEY ({quote(column)}) REFERENCES '
+                f'{quote(to_table)} ({quote(to_column)}) {on_delete} '
+                'DEFERRABLE INITIALLY DEFERRED NOT VALID',
+            )
+
+
+class ValidateDatabaseCascade(Operation):
+    """Проверка существующих строк ограничения AddDatabaseCascade.
+
+    В PostgreSQL выполняется VALIDATE CONSTRAINT, который блокирует
+    только изменение схемы, но не запись в таблицу. Миграция с этой
+    операцией должна быть неатомарной (atomic = False): в одной
+    транзакции с ALTER TABLE блокировка ACCESS EXCLUSIVE держалась бы
+    до конца проверки. В остальных СУБД ничего не делает.
+    """
+
+    reversible = True
+
+    def __init__(self, model_name, name):
+        self.model_name = model_name
+        self.name = name
+
+    def deconstruct(self):
+        """Параметры для сериализации миграции."""
+        return (
+            self.__class__.__name__, [],
+            {'model_name': self.model_name, 'name': self.name},
+        )
+
+    def state_forwards(self, app_label, state):
+        """Состояние моделей не меняется."""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        """Проверка ограничения."""
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        field = to_state.apps.get_model(
+            app_label, self.model_name,
+        )._meta.get_field(self.name)
+        quote = schema_editor.quote_name
+        for name in foreign_keys(schema_editor, field):
+            schema_editor.execute(
+                f'ALTER TABLE {quote(field.model._meta.db_table)} '
+                f'VALIDATE CONSTRAINT {quote(name)}',
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        """Проверенное ограничение остается проверенным."""
+
+    def describe(self):
+        """Описание операции."""
+        return f'Validate database cascade for {self.model_name}.{self.name}'
+
+
+class KeepTriggers(Operation):
+    """Операции над таблицей модели с сохранением триггеров SQLite.
+
+    SQLite изменяет таблицу копированием в новую, при этом триггеры
+    каскадного удаления (AddDatabaseCascade) на ней удаляются, а
+    триггеры, ссылающиеся на нее, мешают переименованию. Такие триггеры
+    удаляются перед вложенными операциями и создаются заново после них.
+    В остальных СУБД операции выполняются как обычно.
+    """
+
+    def __init__(self, model_name, operations):
+        self.model_name = model_name
+        self.operations = operations
+
+    @property
+    def reversible(self):
+        """Обратимость всех вложенных операций."""
+        return all(operation.reversible for operation in self.operations)
+
+    def deconstruct(self):
+        """Параметры для сериализации миграции."""
+        return (
+            self.__class__.__name__, [],
+            {'model_name': self.model_name, 'operations': self.operations},
+        )
+
+    def state_forwards(self, app_label, state):
+        """Состояние после вложенных операций."""
+        for operation in self.operations:
+            operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        """Вложенные операции по порядку."""
+        states = self.states(app_label, from_state)
+        with self.triggers_dropped(app_label, schema_editor, from_state):
+            for operation, before, after in zip(
+                self.operations, states, states[1:],
+            ):
+                operation.database_forwards(
+                    app_label, schema_editor, before, after,
+                )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        """Отмена вложенных операций в обратном порядке."""
+        states = self.states(app_label, to_state)
+        with self.triggers_dropped(app_label, schema_editor, from_state):
+            for operation, before, after in reversed(list(zip(
+                self.operations, states, states[1:],
+            ))):
+                operation.database_backwards(
+                    app_label, schema_editor, after, before,
+                )
+
+    def describe(self):
+        """Описание операции."""
+        return (
+            f'Keep triggers on {self.model_name}: '
+            + '; '.join(operation.describe() for operation in self.operations)
+        )
+
+    def states(self, app_label, state):
+        """Состояния перед каждой вложенной операцией и после последней."""
+        states = [state]
+        for operation in self.operations:
+            state = state.clone()
+            operation.state_forwards(app_label, state)
+            states.append(state)
+        return states
+
+    @contextmanager
+    def triggers_dropped(self, app_label, schema_editor, state):
+        """Удаление и восстановление триггеров, связанных с таблицей."""
+        if schema_editor.connection.vendor != 'sqlite':
+            yield
+            return
+        table = state.apps.get_model(
+            app_label, self.model_name,
+        )._meta.db_table
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                'AND (tbl_name = %s OR sql LIKE %s)',
+                [table, f'%{schema_editor.quote_name(table)}%'],
+            )
+            triggers = cursor.fetchall()
+        for name, _ in triggers:
+            schema_editor.execute(
+                f'DROP TRIGGER {schema_editor.quote_name(name)}',
+            )
+        yield
+        for _, sql in triggers:
+            schema_editor.execute(sql)
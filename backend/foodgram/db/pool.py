@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+
+from collections import deque
+
+from psycopg2 import Error, OperationalError, extensions
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений psycopg2 одного процесса.
+
+    Args:
+        factory(callable): Создание нового соединения.
+        min_size(int): Число соединений, которые не закрываются по простою.
+        max_size(int): Максимальное число соединений.
+        timeout(float): Максимальное ожидание свободного соединения, секунд.
+        max_idle(float): Простой, после которого лишние соединения
+            закрываются, секунд.
+        check_after(float): Простой, после которого соединение
+            проверяется запросом SELECT 1 перед выдачей, секунд.
+    """
+
+    def __init__(self, factory, min_size=2, max_size=20, timeout=10,
+                 max_idle=300, check_after=30):
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.pid = os.getpid()
+        self.idle = deque()
+        self.in_use = 0
+        self.condition = threading.Condition()
+        self.counters = {
+            'created': 0, 'discarded': 0, 'waits': 0,
+            'wait_seconds': 0.0, 'timeouts': 0,
+        }
+
+    def getconn(self):
+        """Выдает соединение из пула, при необходимости ожидая его."""
+        conn, returned_at = self._acquire()
+        try:
+            if conn is not None and not self.is_healthy(conn, returned_at):
+                self.discard(conn)
+                conn = None
+            if conn is None:
+                conn = self.factory()
+                self.counters['created'] += 1
+        except Exception:
+            with self.condition:
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+        return conn
+
+    def _acquire(self):
+        """Резервирует место в пуле.
+
+        Возвращает свободное соединение и время его возврата в пул
+        или (None, None), если можно открыть новое соединение.
+        """
+        waiting_since = None
+        with self.condition:
+            while not self.idle and self.in_use >= self.max_size:
+                if waiting_since is None:
+                    waiting_since = time.monotonic()
+                    self.counters['waits'] += 1
+                remaining = self.timeout - (time.monotonic() - waiting_since)
+                if remaining <= 0:
+                    self.counters['timeouts'] += 1
+                    raise OperationalError(
+                        'Нет свободных соединений в пуле '
+                        f'за {self.timeout} с.',
+                    )
+                self.condition.wait(remaining)
+            self.in_use += 1
+            if waiting_since is not None:
+                self.counters['wait_seconds'] += (
+                    time.monotonic() - waiting_since
+                )
+            if self.idle:
+                return self.idle.pop()
+        return None, None
+
+    def putconn(self, conn):
+        """Возвращает соединение в пул."""
+        if not conn.closed:
+            try:
+                status = conn.info.transaction_status
+                if status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Error:
+                self.discard(conn)
+                with self.condition:
+                    self.in_use -= 1
+                    self.condition.notify()
+                return
+        now = time.monotonic()
+        with self.condition:
+            self.in_use -= 1
+            if conn.closed or self.pid != os.getpid():
+                self.counters['discarded'] += 1
+            else:
+                self.idle.append((conn, now))
+            while (len(self.idle) > self.min_size
+                   and now - self.idle[0][1] > self.max_idle):
+                self.discard(self.idle.popleft()[0])
+            self.condition.notify()
+
+    def is_healthy(self, conn, returned_at):
+        """Проверка соединения, долго пролежавшего в пуле."""
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Error:
+            return False
+        return True
+
+    def discard(self, conn):
+        """Закрывает соединение, не возвращая его в пул."""
+        self.counters['discarded'] += 1
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def stats(self):
+        """Состояние пула для метрик."""
+        return {
+            'in_use': self.in_use,
+            'idle': len(self.idle),
+            'max_size': self.max_size,
+            **self.counters,
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory, options):
+    """Пул соединений для базы alias в текущем процессе."""
+    pool = _pools.get(alias)
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            _pools[alias] = ConnectionPool(factory, **options)
+        return _pools[alias]
+
+
+def reset_pools():
+    """Закрывает свободные соединения и удаляет пулы процесса."""
+    with _pools_lock:
+        for pool in _pools.values():
+            with pool.condition:
+                while pool.idle:
+                    pool.discard(pool.idle.pop()[0])
+        _pools.clear()
+
+
+def pool_stats(alias):
+    """Состояние пула базы alias или None, если пула нет."""
+    pool = _pools.get(alias)
+    return pool.stats() if pool is not None else None
+
+
+def pool_metrics():
+    """Метрики пулов в формате (имя, значение)."""
+    for alias, pool in list(_pools.items()):
+        for name, value in pool.stats().items():
+            yield f'foodgram_db_pool_{name}{{alias="{alias}"}}', value
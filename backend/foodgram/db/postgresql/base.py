@@ -0,0 +1,93 @@
+from django.db.backends.postgresql.base import (
+    DatabaseWrapper as PostgreSQLDatabaseWrapper,
+)
+
+from foodgram.db.pool import get_pool
+
+POOL_OPTIONS = {
+    'MIN_SIZE': 'min_size',
+    'MAX_SIZE': 'max_size',
+    'TIMEOUT': 'timeout',
+    'MAX_IDLE': 'max_idle',
+    'CHECK_AFTER': 'check_after',
+}
+
+
+class DatabaseWrapper(PostgreSQLDatabaseWrapper):
+    """Бэкенд PostgreSQL с проверкой соединений и пулом.
+
+    CONN_HEALTH_CHECKS - постоянное соединение проверяется перед первым
+    запросом каждого HTTP-запроса, разорванное соединение открывается
+    заново вместо ошибки.
+    POOL - соединения берутся из пула процесса и возвращаются в него
+    вместо закрытия.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def pool(self):
+        """Пул соединений, если он включен в настройках."""
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        return get_pool(
+            self.alias,
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                self.get_connection_params(),
+            ),
+            {
+                # С проверками соединений каждое выданное из пула
+                # соединение проверяется запросом SELECT 1.
+                'check_after': (
+                    0 if self.settings_dict.get('CONN_HEALTH_CHECKS') else 30
+                ),
+                **{
+                    argument: options[key]
+                    for key, argument in POOL_OPTIONS.items()
+                    if key in options
+                },
+            },
+        )
+
+    def get_new_connection(self, conn_params):
+        """Новое соединение или соединение из пула."""
+        # Новое соединение проверять до конца запроса не нужно.
+        self.health_check_done = True
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.getconn()
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level,
+        )
+        return connection
+
+    def _close(self):
+        """Закрытие соединения или возврат в пул."""
+        pool = self.pool
+        if pool is None:
+            super()._close()
+            return
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        """Вызывается на границах HTTP-запроса."""
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        """Проверка постоянного соединения перед первым запросом."""
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and not self.in_atomic_block
+            and self.settings_dict.get('CONN_HEALTH_CHECKS')
+        ):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
@@ -0,0 +1,107 @@
+import random
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    """Маршрутизация запросов к БД в рамках одного HTTP-запроса.
+
+    Args:
+        use_replicas(bool): Чтение с реплик разрешено.
+        written(bool): В запросе уже была запись - дальнейшее чтение
+            идет с основной базы (read-your-writes).
+    """
+
+    __slots__ = ('use_replicas', 'written')
+
+    def __init__(self):
+        self.use_replicas = False
+        self.written = False
+
+
+@contextmanager
+def routing_state():
+    """Состояние маршрутизации на время обработки запроса."""
+    state = RoutingState()
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    """Чтение с реплик для разрешенных представлений.
+
+    Реплика выбирается случайно с учетом веса из DATABASE_REPLICAS
+    среди доступных. Недоступная реплика исключается
+    на REPLICA_RETRY_SECONDS, при отсутствии доступных реплик
+    чтение идет с основной базы.
+    """
+
+    def __init__(self):
+        self.checked_at = {}
+        self.down_until = {}
+
+    def db_for_read(self, model, **hints):
+        """База для чтения."""
+        state = _state.get()
+        if state is None or not state.use_replicas or state.written:
+            return None
+        return self.choose_replica()
+
+    def db_for_write(self, model, **hints):
+        """Запись всегда в основную базу."""
+        state = _state.get()
+        if state is not None:
+            state.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Реплики содержат те же данные, что и основная база."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Миграции выполняются только на основной базе."""
+        return db == DEFAULT_DB_ALIAS
+
+    def choose_replica(self):
+        """Случайная доступная реплика с учетом весов."""
+        candidates = dict(settings.DATABASE_REPLICAS)
+        while candidates:
+            alias = random.choices(
+                list(candidates), weights=list(candidates.values()),
+            )[0]
+            if self.is_healthy(alias):
+                return alias
+            del candidates[alias]
+        return None
+
+    def is_healthy(self, alias):
+        """Доступность реплики с периодической проверкой соединения."""
+        now = time.monotonic()
+        if self.down_until.get(alias, 0) > now:
+            return False
+        checked_at = self.checked_at.get(alias, 0)
+        if now - checked_at < settings.REPLICA_CHECK_SECONDS:
+            return True
+        self.checked_at[alias] = now
+        # ensure_connection() не проверяет уже открытое соединение,
+        # поэтому оборванное соединение проверяется запросом.
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            healthy = connection.is_usable()
+        except DatabaseError:
+            healthy = False
+        if not healthy:
+            connection.close()
+            self.down_until[alias] = now + settings.REPLICA_RETRY_SECONDS
+        return healthy
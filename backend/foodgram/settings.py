@@ -1,5 +1,6 @@
 import os
 
+from importlib.util import find_spec
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -35,10 +36,12 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'tasks.apps.TasksConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -48,12 +51,28 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
 ]
 
+if os.getenv('METRICS_ENABLED', default='False') == 'True':
+    MIDDLEWARE.insert(0, 'api.middleware.MetricsMiddleware')
+
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', default='0.1'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+METRICS_DIR = os.getenv('METRICS_DIR', default='/tmp/foodgram_metrics')
+METRICS_DUMP_INTERVAL = int(os.getenv('METRICS_DUMP_INTERVAL', default='30'))
+# Снимки, не обновлявшиеся дольше, не учитываются в отчете.
+METRICS_SNAPSHOT_TTL = int(os.getenv('METRICS_SNAPSHOT_TTL', default='3600'))
+
+# Сжатие ответов API (brotli, если установлен, и gzip).
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', default='1024'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', default='5'))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', default='6'))
+COMPRESSION_CACHE_BYTES = int(os.getenv('COMPRESSION_CACHE_BYTES', default=str(16 * 1024 * 1024)))
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'foodgram' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -68,19 +87,154 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+
+ASYNC_VIEWS = os.getenv(
+    'ASYNC_VIEWS', default=str(SERVER_MODE == 'asgi'),
+) == 'True'
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', default='16'))
+
 AUTH_USER_MODEL = 'users.User'
 
+DB_ENGINE = os.getenv('DB_ENGINE', default='django.db.backends.postgresql')
+if DB_ENGINE == 'django.db.backends.postgresql':
+    # Стандартный бэкенд с проверкой соединений и пулом.
+    DB_ENGINE = 'foodgram.db.postgresql'
+
+DB_POOL = os.getenv('DB_POOL', default='False') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
+        'ENGINE': DB_ENGINE,
         'NAME': os.getenv('DB_NAME', default='postgres'),
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='localhost'),
         'PORT': os.getenv('DB_PORT', default='5432'),
+        # С пулом соединение возвращается в пул в конце каждого запроса.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default='0' if DB_POOL else '60')),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', default='True') == 'True',
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', default='2')),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', default='20')),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default='10')),
+        } if DB_POOL else None,
     },
 }
 
+# Реплики для чтения: через запятую HOST[:PORT][@WEIGHT],
+# для SQLite вместо HOST указывается путь к файлу базы.
+DB_REPLICAS = [replica.strip() for replica in os.getenv('DB_REPLICAS', default='').split(',') if replica.strip()]
+DATABASE_REPLICAS = {}
+for number, replica in enumerate(DB_REPLICAS, start=1):
+    address, _, weight = replica.partition('@')
+    host, _, port = address.partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    if 'sqlite3' in DB_ENGINE:
+        DATABASES[alias]['NAME'] = host
+    else:
+        DATABASES[alias].update(HOST=host, PORT=port or DATABASES['default']['PORT'])
+    DATABASE_REPLICAS[alias] = float(weight or 1)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['foodgram.db.routers.ReplicaRouter']
+
+REPLICA_CHECK_SECONDS = int(os.getenv('DB_REPLICA_CHECK_SECONDS', default='5'))
+REPLICA_RETRY_SECONDS = int(os.getenv('DB_REPLICA_RETRY_SECONDS', default='30'))
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', default='10'))
+
+# С CACHE_PATH кэш Django - общий для всех воркеров узла кэш в файле
+# в разделяемой памяти (foodgram.cache.SharedMemoryCache), например
+# /dev/shm/foodgram-cache. По умолчанию (пустой CACHE_PATH) -
+# LocMemCache Django, отдельный в каждом процессе.
+CACHE_PATH = os.getenv('CACHE_PATH', default='')
+if CACHE_PATH:
+    CACHES = {
+        'default': {
+            'BACKEND': 'foodgram.cache.SharedMemoryCache',
+            'LOCATION': CACHE_PATH,
+            'OPTIONS': {
+                'SIZE': int(os.getenv('CACHE_SIZE', default=str(32 * 1024 * 1024))),
+                'SLOT_SIZE': int(os.getenv('CACHE_SLOT_SIZE', default='4096')),
+            },
+        },
+    }
+
+# Кэш токенов аутентификации: локальный LRU процесса
+# и, если указан алиас AUTH_TOKEN_CACHE, общий кэш Django.
+AUTH_TOKEN_CACHE = os.getenv('AUTH_TOKEN_CACHE', default='default' if CACHE_PATH else '')
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', default='10000'))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', default='300'))
+AUTH_TOKEN_CACHE_LOCAL_TTL = int(os.getenv('AUTH_TOKEN_CACHE_LOCAL_TTL', default='30'))
+
+# Фоновые задачи: очередь в БД, обработчики - manage.py run_workers.
+# TASKS_EAGER выполняет задачи сразу после фиксации транзакции.
+TASKS_EAGER = os.getenv('TASKS_EAGER', default='False') == 'True'
+TASKS_PROCESSES = int(os.getenv('TASKS_PROCESSES', default='1'))
+TASKS_THREADS = int(os.getenv('TASKS_THREADS', default='4'))
+TASKS_POLL_SECONDS = float(os.getenv('TASKS_POLL_SECONDS', default='1'))
+TASKS_LOCK_SECONDS = int(os.getenv('TASKS_LOCK_SECONDS', default='600'))
+TASKS_RESULT_TTL = int(os.getenv('TASKS_RESULT_TTL', default='86400'))
+TASKS_PURGE_SECONDS = int(os.getenv('TASKS_PURGE_SECONDS', default='600'))
+
+# Пользователь с историей больше порога удаляется фоновой задачей порциями.
+USER_DELETE_ASYNC_THRESHOLD = int(os.getenv('USER_DELETE_ASYNC_THRESHOLD', default='10000'))
+USER_DELETE_CHUNK_SIZE = int(os.getenv('USER_DELETE_CHUNK_SIZE', default='1000'))
+
+# Админка: для таблиц больше порога число строк берется из статистики.
+ADMIN_COUNT_ESTIMATE_THRESHOLD = int(os.getenv('ADMIN_COUNT_ESTIMATE_THRESHOLD', default='10000'))
+
+# Рецепты читаются из готовых представлений (RecipeDocument), после
+# изменения тега, ингредиента или автора они пересобираются порциями.
+RECIPE_DOCUMENTS = os.getenv('RECIPE_DOCUMENTS', default='True') == 'True'
+RECIPE_DOCUMENT_BATCH_SIZE = int(os.getenv('RECIPE_DOCUMENT_BATCH_SIZE', default='500'))
+
+# Синхронизация клиентов (/api/sync/): строк журнала в ответе и срок
+# хранения журнала, токены старше срока недействительны.
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', default='500'))
+SYNC_RETENTION_DAYS = int(os.getenv('SYNC_RETENTION_DAYS', default='30'))
+
+# События для клиентов (/api/events/, только SERVER_MODE=asgi).
+# LocalBroker доставляет события в пределах процесса, PostgresBroker -
+# всем процессам и узлам через LISTEN/NOTIFY. Пустой EVENTS_BROKER -
+# события выключены и не публикуются.
+EVENTS_BROKER = os.getenv('EVENTS_BROKER', default='')
+EVENTS_PG_CHANNEL = os.getenv('EVENTS_PG_CHANNEL', default='foodgram_events')
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', default='100'))
+EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', default='15'))
+EVENTS_MAX_CONNECTIONS = int(os.getenv('EVENTS_MAX_CONNECTIONS', default='10000'))
+# Время действия токена ?token= из POST /api/events/token/, секунд.
+EVENTS_TOKEN_MAX_AGE = int(os.getenv('EVENTS_TOKEN_MAX_AGE', default='60'))
+
+# Фильтры списка рецептов и счетчики /api/recipes/facets/ по битовым
+# индексам в памяти процесса (api.facets). Индекс догоняет базу
+# по журналу изменений не чаще раза в RECIPE_FACETS_REFRESH_INTERVAL
+# секунд и строится заново, если изменений больше
+# RECIPE_FACETS_REBUILD_CHANGES. Когда доля позиций удаленных рецептов
+# больше RECIPE_FACETS_COMPACT_RATIO, рецепты перенумеровываются.
+RECIPE_FACETS = os.getenv('RECIPE_FACETS', default='False') == 'True'
+RECIPE_FACETS_REFRESH_INTERVAL = float(os.getenv('RECIPE_FACETS_REFRESH_INTERVAL', default='1'))
+RECIPE_FACETS_REBUILD_CHANGES = int(os.getenv('RECIPE_FACETS_REBUILD_CHANGES', default='5000'))
+RECIPE_FACETS_COMPACT_RATIO = float(os.getenv('RECIPE_FACETS_COMPACT_RATIO', default='0.25'))
+# Верхние границы интервалов времени приготовления, минут.
+RECIPE_FACETS_COOKING_TIME = os.getenv('RECIPE_FACETS_COOKING_TIME', default='15,30,60,120')
+
+# Рецепты: JSON списка и карточки собирает PostgreSQL (api.sql_json).
+RECIPE_SQL_JSON = os.getenv('RECIPE_SQL_JSON', default='False') == 'True'
+
+# Списки покупок: файлы создаются фоновой задачей после изменения корзины.
+SHOPPING_LIST_DEBOUNCE = int(os.getenv('SHOPPING_LIST_DEBOUNCE', default='5'))
+SHOPPING_LIST_FONT = os.getenv('SHOPPING_LIST_FONT', default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+# Закрытые файлы отдает nginx из внутреннего location (X-Accel-Redirect),
+# пустое значение - отдача средствами Django.
+PROTECTED_MEDIA_LOCATION = os.getenv('PROTECTED_MEDIA_LOCATION', default='')
+SIGNED_URL_MAX_AGE = int(os.getenv('SIGNED_URL_MAX_AGE', default='300'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -109,6 +263,48 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
+DEFAULT_FILE_STORAGE = 'api.storage.ContentAddressedStorage'
+
+# Файлы из multipart/form-data больше этого размера пишутся
+# во временный файл по частям, а не хранятся в памяти.
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', default=str(1024 * 1024)))
+
+# Загрузка файлов по частям (/api/uploads/): каталог незавершенных
+# загрузок (общий для узлов), предельный размер файла и срок жизни
+# загрузки в секундах.
+UPLOAD_DIR = os.getenv('UPLOAD_DIR', default=os.path.join(BASE_DIR, 'uploads/'))
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', default=str(50 * 1024 * 1024)))
+UPLOAD_MAX_AGE = int(os.getenv('UPLOAD_MAX_AGE', default='86400'))
+
+# Объектное хранилище S3 (AWS S3, MinIO, Yandex Object Storage) вместо
+# MEDIA_ROOT. Картинки рецептов должны быть доступны на чтение всем
+# (политика бакета для recipes/ и incoming/), остальные файлы закрыты
+# и скачиваются по временным ссылкам. Клиенты загружают картинки
+# напрямую в хранилище, OBJECT_STORAGE_PUBLIC_ENDPOINT - адрес
+# хранилища для клиентов, если он отличается от адреса внутри сети.
+OBJECT_STORAGE_BUCKET = os.getenv('OBJECT_STORAGE_BUCKET', default='')
+OBJECT_STORAGE_PUBLIC_ENDPOINT = os.getenv('OBJECT_STORAGE_PUBLIC_ENDPOINT', default='') or None
+OBJECT_STORAGE_UPLOAD_EXPIRES = int(os.getenv('OBJECT_STORAGE_UPLOAD_EXPIRES', default='3600'))
+if OBJECT_STORAGE_BUCKET:
+    DEFAULT_FILE_STORAGE = 'api.object_storage.ObjectStorage'
+    AWS_STORAGE_BUCKET_NAME = OBJECT_STORAGE_BUCKET
+    AWS_S3_ENDPOINT_URL = os.getenv('OBJECT_STORAGE_ENDPOINT', default='') or None
+    AWS_S3_REGION_NAME = os.getenv('OBJECT_STORAGE_REGION', default='us-east-1')
+    AWS_ACCESS_KEY_ID = os.getenv('OBJECT_STORAGE_ACCESS_KEY')
+    AWS_SECRET_ACCESS_KEY = os.getenv('OBJECT_STORAGE_SECRET_KEY')
+    # Адрес картинок в ответах API, например cdn.example.com или
+    # localhost:9000/foodgram для MinIO.
+    AWS_S3_CUSTOM_DOMAIN = os.getenv('OBJECT_STORAGE_PUBLIC_DOMAIN', default='') or None
+    AWS_S3_URL_PROTOCOL = os.getenv('OBJECT_STORAGE_URL_PROTOCOL', default='https:')
+    AWS_S3_ADDRESSING_STYLE = os.getenv('OBJECT_STORAGE_ADDRESSING_STYLE', default='path')
+    AWS_S3_SIGNATURE_VERSION = 's3v4'
+    AWS_QUERYSTRING_AUTH = False
+    AWS_S3_FILE_OVERWRITE = False
+    AWS_S3_OBJECT_PARAMETERS = {'CacheControl': 'public, max-age=31536000, immutable'}
+
+# Принимать картинки рецептов только ссылками на загрузки (/api/uploads/):
+# с объектным хранилищем байты картинок не проходят через API.
+DIRECT_UPLOADS_ONLY = os.getenv('DIRECT_UPLOADS_ONLY', default='False') == 'True'
 
 DATAFILES_DIRS = (os.path.join(BASE_DIR, 'media/'),)
 
@@ -116,7 +312,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -128,6 +324,19 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+    # orjson и MessagePack подключаются, если пакеты установлены.
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+    # Лимиты действий с throttle_actions, корзина токенов на клиента.
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ActionTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'shopping_list': os.getenv('THROTTLE_SHOPPING_LIST', default='10/min'),
+        'ingredients': os.getenv('THROTTLE_INGREDIENTS', default='120/min'),
+    },
 }
 
 DJOSER = {
@@ -0,0 +1,19 @@
+import multiprocessing
+import os
+
+# Режим сервера: wsgi - синхронные воркеры gunicorn,
+# asgi - воркеры uvicorn с асинхронными представлениями.
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+
+bind = '0:8000'
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1,
+))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', default='30'))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    worker_class = 'sync'
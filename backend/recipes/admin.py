@@ -1,26 +1,63 @@
 from django.contrib import admin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
+from api.serializers import save_recipe_documents
+from foodgram.admin import AutocompleteFilter, ScalableAdminMixin
 from recipes.models import (
     Favorite, Follow, Ingredient, IngredientInRecipe, Recipe, ShoppingCart,
     Tag,
 )
 
 
+class AuthorFilter(AutocompleteFilter):
+    """Фильтр рецептов по автору."""
+
+    title = 'автору'
+    field_name = 'author'
+
+
+class IngredientFilter(AutocompleteFilter):
+    """Фильтр по ингредиенту."""
+
+    title = 'ингредиенту'
+    field_name = 'ingredient'
+
+
+class RecipeIngredientFilter(IngredientFilter):
+    """Фильтр рецептов по ингредиенту."""
+
+    field_name = 'ingredients'
+
+
+class RecipeFilter(AutocompleteFilter):
+    """Фильтр по рецепту."""
+
+    title = 'рецепту'
+    field_name = 'recipe'
+
+
 class IngredientRecipeInline(admin.TabularInline):
     """Админ для списка ингредиентов."""
 
-    list_display = ('name',)
     model = IngredientInRecipe
+    autocomplete_fields = ('ingredient',)
     min_num = 1
     extra = 1
 
+    def get_queryset(self, request):
+        """Строки с ингредиентом и рецептом для подписи строки."""
+        return super().get_queryset(request).select_related(
+            'ingredient', 'recipe',
+        )
+
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ScalableAdminMixin, admin.ModelAdmin):
     """Админ для модели ингредиента."""
 
     list_display = ('id', 'name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     search_fields = ('name',)
 
 
@@ -33,7 +70,7 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ScalableAdminMixin, admin.ModelAdmin):
     """Админ для модели рецепта."""
 
     inlines = (IngredientRecipeInline,)
@@ -46,26 +83,71 @@ class RecipeAdmin(admin.ModelAdmin):
         'cooking_time',
         'count_favorites',
     )
-    list_filter = ('name', 'author', 'tags', 'ingredients')
+    list_filter = ('tags', AuthorFilter, RecipeIngredientFilter)
+    list_select_related = ('author',)
     search_fields = ('name',)
     filter_horizontal = ('tags',)
-    autocomplete_fields = ('ingredients',)
+    autocomplete_fields = ('author', 'ingredients')
     readonly_fields = ('count_favorites',)
 
+    def get_queryset(self, request):
+        """Рецепты с числом добавлений в избранное.
+
+        Подзапрос выполняется только для строк текущей страницы.
+        """
+        favorites = Favorite.objects.filter(
+            recipe=OuterRef('pk'),
+        ).order_by().values('recipe').annotate(count=Count('*'))
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites.values('count')), 0,
+                output_field=IntegerField(),
+            ),
+        )
+
+    def save_related(self, request, form, formsets, change):
+        """Сохранение тегов и ингредиентов.
+
+        После изменения рецепт получает новую версию, его представление
+        (RecipeDocument) пересобирается.
+        """
+        super().save_related(request, form, formsets, change)
+        if change:
+            Recipe.objects.filter(pk=form.instance.pk).bump_versions()
+        save_recipe_documents([form.instance.pk])
+
     @admin.display(description='Добавлений в избранное')
     def count_favorites(self, obj):
         """Получает число добавлений в избранное."""
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
 
 @admin.register(IngredientInRecipe)
-class IngredientInRecipeAdmin(admin.ModelAdmin):
+class IngredientInRecipeAdmin(ScalableAdminMixin, admin.ModelAdmin):
     """Админ для ингредиента в рецепте."""
 
     fields = ('recipe', 'ingredient', 'amount')
-    list_filter = ('recipe', 'ingredient')
+    list_display = ('id', 'recipe', 'ingredient', 'amount')
+    list_filter = (RecipeFilter, IngredientFilter)
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+
+
+@admin.register(Favorite, ShoppingCart)
+class UserRecipeAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    """Админ для избранного и корзины."""
+
+    list_display = ('id', 'user', 'recipe')
+    list_filter = (RecipeFilter,)
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
+
 
+@admin.register(Follow)
+class FollowAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    """Админ для подписок."""
 
-admin.site.register(Favorite)
-admin.site.register(ShoppingCart)
-admin.site.register(Follow)
+    list_display = ('id', 'user', 'author')
+    list_filter = (AuthorFilter,)
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
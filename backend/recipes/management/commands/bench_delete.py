@@ -0,0 +1,106 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.management.commands.seed_bench import IMAGE_NAME
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.tasks import delete_in_chunks
+
+User = get_user_model()
+
+USER_PREFIX = 'bench_delete_'
+
+
+class Command(BaseCommand):
+    """Замер удаления рецепта и автора с большим числом связанных строк."""
+
+    help = ('Создает рецепт с заданным числом пользователей, добавивших '
+            'его в избранное и корзину, и замеряет удаление рецепта '
+            'и порционное удаление автора.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--favorites', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Прогон замеров."""
+        self.batch_size = options['batch_size']
+        self.clear()
+        fans = self.create_users(options['favorites'])
+        author = User.objects.create(
+            username=f'{USER_PREFIX}author',
+            email=f'{USER_PREFIX}author@example.com',
+        )
+
+        recipe = self.create_recipe(author, 'recipe', fans)
+        self.measure('удаление рецепта', recipe.delete)
+
+        self.create_recipe(author, 'author', fans)
+        self.measure(
+            'удаление автора порциями',
+            lambda: delete_in_chunks(author.pk, options['chunk_size']),
+        )
+        self.clear()
+
+    def measure(self, name, func):
+        """Время и число запросов удаления."""
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+        left = Favorite.objects.filter(
+            recipe__name__startswith=USER_PREFIX,
+        ).count()
+        self.stdout.write(
+            f'{name}: {elapsed:.2f} с, запросов {len(queries)}, '
+            f'осталось в избранном {left}',
+        )
+
+    def create_users(self, count):
+        """Пользователи, добавляющие рецепт в избранное."""
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'{USER_PREFIX}{number}',
+                    email=f'{USER_PREFIX}{number}@example.com',
+                )
+                for number in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        return list(
+            User.objects.filter(username__startswith=USER_PREFIX)
+            .values_list('id', flat=True),
+        )
+
+    def create_recipe(self, author, name, user_ids):
+        """Рецепт в избранном у всех и в корзине у каждого десятого."""
+        recipe = Recipe.objects.create(
+            author=author, name=f'{USER_PREFIX}{name}', image=IMAGE_NAME,
+            text=name, cooking_time=1,
+        )
+        Favorite.objects.bulk_create(
+            [Favorite(user_id=pk, recipe=recipe) for pk in user_ids],
+            batch_size=self.batch_size,
+        )
+        ShoppingCart.objects.bulk_create(
+            [ShoppingCart(user_id=pk, recipe=recipe) for pk in user_ids[::10]],
+            batch_size=self.batch_size,
+        )
+        return recipe
+
+    def clear(self):
+        """Удаление данных предыдущего запуска."""
+        ids = list(
+            User.objects.filter(username__startswith=USER_PREFIX)
+            .values_list('id', flat=True),
+        )
+        for start in range(0, len(ids), self.batch_size):
+            User.objects.filter(
+                pk__in=ids[start:start + self.batch_size],
+            ).delete()
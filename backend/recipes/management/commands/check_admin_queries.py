@@ -0,0 +1,69 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.benchmark import bench_settings
+
+User = get_user_model()
+
+USERNAME = 'check_admin_queries'
+
+
+class Command(BaseCommand):
+    """Проверка числа запросов к БД на страницах админки."""
+
+    help = ('Открывает список объектов каждой модели в админке, без '
+            'условий и с поиском, и завершается с ошибкой, если число '
+            'запросов превышает --max-queries.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--max-queries', type=int, default=10)
+
+    def handle(self, *args, **options):
+        """Проверка страниц."""
+        user = User.objects.create_superuser(
+            username=USERNAME, email=f'{USERNAME}@example.com',
+            password=None,
+        )
+        client = Client()
+        client.force_login(user)
+        failed = []
+        try:
+            with bench_settings():
+                for model, model_admin in admin.site._registry.items():
+                    for name, url in self.pages(model, model_admin):
+                        queries = self.count_queries(client, url)
+                        line = f'{name:<50}{queries:>4}'
+                        if queries > options['max_queries']:
+                            failed.append(name)
+                            line = self.style.ERROR(line)
+                        self.stdout.write(line)
+        finally:
+            user.delete()
+        if failed:
+            raise CommandError(
+                f'Слишком много запросов: {", ".join(failed)}.',
+            )
+
+    @staticmethod
+    def pages(model, model_admin):
+        """Список объектов модели без условий и с поиском."""
+        opts = model._meta
+        url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+        yield opts.label, url
+        if model_admin.search_fields:
+            yield f'{opts.label} ?q=', f'{url}?q=a'
+
+    @staticmethod
+    def count_queries(client, url):
+        """Число запросов при открытии страницы."""
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: {response.status_code}')
+        return len(context.captured_queries)
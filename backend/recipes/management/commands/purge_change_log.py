@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import ChangeLog
+
+
+class Command(BaseCommand):
+    """Удаление старых строк журнала изменений."""
+
+    help = ('Удаляет строки журнала изменений старше SYNC_RETENTION_DAYS '
+            'порциями. Токены синхронизации такого возраста уже '
+            'недействительны.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        """Удаление порциями по id."""
+        border = timezone.now() - timezone.timedelta(
+            days=settings.SYNC_RETENTION_DAYS,
+        )
+        deleted = 0
+        while True:
+            ids = list(ChangeLog.objects.filter(
+                created__lt=border,
+            ).values_list('id', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            deleted += ChangeLog.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(f'Удалено строк журнала: {deleted}.')
@@ -0,0 +1,258 @@
+import io
+import random
+
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, call_command
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.fields import content_name
+from recipes.models import (
+    Favorite, Follow, Ingredient, IngredientInRecipe, Recipe, ShoppingCart,
+    Tag,
+)
+
+User = get_user_model()
+
+USER_PREFIX = 'bench_user_'
+RECIPE_PREFIX = 'Бенчмарк-рецепт '
+PASSWORD = 'bench-password'
+
+SCALES = {
+    'small': {
+        'users': 100, 'recipes': 1000, 'ingredients': 8,
+        'follows': 10, 'favorites': 30, 'cart': 5,
+    },
+    'medium': {
+        'users': 2000, 'recipes': 20000, 'ingredients': 10,
+        'follows': 20, 'favorites': 100, 'cart': 10,
+    },
+    'large': {
+        'users': 20000, 'recipes': 200000, 'ingredients': 12,
+        'follows': 30, 'favorites': 200, 'cart': 15,
+    },
+}
+
+# Минимальный PNG 1x1 для поля image.
+PLACEHOLDER_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360f8cf00000301010018dd8db0000000'
+    '0049454e44ae426082',
+)
+IMAGE_NAME = 'recipes/' + content_name(
+    ContentFile(PLACEHOLDER_PNG, name='bench.png'),
+)
+
+
+class Command(BaseCommand):
+    """Команда для генерации тестовых данных для бенчмарков."""
+
+    help = 'Генерация пользователей, рецептов, подписок, избранного и корзин.'
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        for name in SCALES['small']:
+            parser.add_argument(
+                f'--{name}', type=int,
+                help='Переопределяет значение из --scale.',
+            )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить ранее сгенерированные данные.',
+        )
+
+    def handle(self, *args, **options):
+        """Генерация данных."""
+        params = dict(SCALES[options['scale']])
+        for name in params:
+            if options[name] is not None:
+                params[name] = options[name]
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        if options['clear']:
+            self.clear()
+        if not Ingredient.objects.exists():
+            call_command('load_data')
+        if not Tag.objects.exists():
+            call_command('load_tags')
+        if not default_storage.exists(IMAGE_NAME):
+            default_storage.save(IMAGE_NAME, ContentFile(PLACEHOLDER_PNG))
+
+        with transaction.atomic():
+            user_ids = self.create_users(params['users'])
+            recipe_ids = self.create_recipes(user_ids, params['recipes'])
+            self.create_recipe_relations(recipe_ids, params['ingredients'])
+            popular = self.popularity(recipe_ids)
+            self.create_pairs(
+                Follow, ('user_id', 'author_id'), user_ids,
+                self.popularity(user_ids), params['follows'], same=False,
+            )
+            self.create_pairs(
+                Favorite, ('user_id', 'recipe_id'), user_ids,
+                popular, params['favorites'],
+            )
+            self.create_pairs(
+                ShoppingCart, ('user_id', 'recipe_id'), user_ids,
+                popular, params['cart'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(user_ids)}, '
+            f'рецептов {len(recipe_ids)}.',
+        ))
+
+    def clear(self):
+        """Удаление сгенерированных данных."""
+        Recipe.objects.filter(name__startswith=RECIPE_PREFIX).delete()
+        User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+    def popularity(self, ids):
+        """Ids с весами по закону Ципфа: немногие популярны."""
+        shuffled = list(ids)
+        self.rng.shuffle(shuffled)
+        weights = accumulate(1 / (rank + 1) for rank in range(len(shuffled)))
+        return shuffled, list(weights)
+
+    def create_users(self, count):
+        """Создание пользователей."""
+        start = User.objects.filter(
+            username__startswith=USER_PREFIX,
+        ).count()
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'{USER_PREFIX}{number}',
+                    email=f'{USER_PREFIX}{number}@example.com',
+                    first_name=f'Имя{number}',
+                    last_name=f'Фамилия{number}',
+                    password=password,
+                )
+                for number in range(start, start + count)
+            ],
+            batch_size=self.batch_size,
+        )
+        return list(
+            User.objects.filter(username__startswith=USER_PREFIX)
+            .values_list('id', flat=True),
+        )
+
+    def create_recipes(self, user_ids, count):
+        """Создание рецептов."""
+        start = Recipe.objects.filter(name__startswith=RECIPE_PREFIX).count()
+        now = timezone.now()
+        self.copy_or_bulk_create(
+            Recipe,
+            ('name', 'text', 'cooking_time', 'image', 'author_id',
+             'pub_date', 'updated_at', 'version'),
+            (
+                (
+                    f'{RECIPE_PREFIX}{number}',
+                    f'Описание рецепта {number}. ' * self.rng.randint(1, 20),
+                    self.rng.choice((5, 10, 15, 20, 30, 45, 60, 90, 120)),
+                    IMAGE_NAME,
+                    self.rng.choice(user_ids),
+                    now - timedelta(minutes=count - number),
+                    now,
+                    1,
+                )
+                for number in range(start, start + count)
+            ),
+        )
+        return list(
+            Recipe.objects.filter(name__startswith=RECIPE_PREFIX)
+            .order_by('id').values_list('id', flat=True)[start:],
+        )
+
+    def create_recipe_relations(self, recipe_ids, per_recipe):
+        """Создание ингредиентов и тегов рецептов."""
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        self.copy_or_bulk_create(
+            IngredientInRecipe,
+            ('recipe_id', 'ingredient_id', 'amount'),
+            (
+                (recipe_id, ingredient_id, self.rng.randint(1, 500))
+                for recipe_id in recipe_ids
+                for ingredient_id in self.rng.sample(
+                    ingredient_ids,
+                    self.rng.randint(1, per_recipe),
+                )
+            ),
+        )
+        self.copy_or_bulk_create(
+            Recipe.tags.through,
+            ('recipe_id', 'tag_id'),
+            (
+                (recipe_id, tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in self.rng.sample(
+                    tag_ids, self.rng.randint(1, len(tag_ids)),
+                )
+            ),
+        )
+
+    def create_pairs(self, model, fields, user_ids, targets, per_user,
+                     same=True):
+        """Создание уникальных пар пользователь - объект."""
+        population, cum_weights = targets
+        per_user = min(per_user, len(population) - 1)
+
+        def rows():
+            for user_id in user_ids:
+                chosen = set()
+                while len(chosen) < per_user:
+                    target = self.rng.choices(
+                        population, cum_weights=cum_weights,
+                    )[0]
+                    if same or target != user_id:
+                        chosen.add(target)
+                yield from ((user_id, target) for target in chosen)
+
+        model.objects.filter(**{f'{fields[0]}__in': user_ids}).delete()
+        self.copy_or_bulk_create(model, fields, rows())
+
+    def copy_or_bulk_create(self, model, fields, rows):
+        """Вставка строк через COPY в PostgreSQL, иначе bulk_create."""
+        if connection.vendor == 'postgresql':
+            self.copy(model, fields, rows)
+            return
+        batch = []
+        for row in rows:
+            batch.append(model(**dict(zip(fields, row))))
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+
+    def copy(self, model, fields, rows):
+        """Вставка строк командой COPY порциями."""
+        columns = ', '.join(
+            model._meta.get_field(field).column for field in fields
+        )
+        sql = f'COPY {model._meta.db_table} ({columns}) FROM STDIN'
+        rows = iter(rows)
+        with connection.cursor() as cursor:
+            while True:
+                chunk = list(islice(rows, self.batch_size * 10))
+                if not chunk:
+                    break
+                buffer = io.StringIO()
+                for row in chunk:
+                    buffer.write('\t'.join(
+                        str(value).replace('\\', '\\\\')
+                        .replace('\t', ' ').replace('\n', ' ')
+                        for value in row
+                    ))
+                    buffer.write('\n')
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
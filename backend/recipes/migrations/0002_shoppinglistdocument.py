@@ -0,0 +1,32 @@
+# Generated by Django 3.2 on 2026-10-19 09:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Версия корзины')),
+                ('rendered_version', models.PositiveIntegerField(blank=True, null=True, verbose_name='Версия файлов')),
+                ('txt', models.FileField(blank=True, upload_to='shopping_lists/', verbose_name='Текстовый файл')),
+                ('pdf', models.FileField(blank=True, upload_to='shopping_lists/', verbose_name='PDF')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Файл списка покупок',
+                'verbose_name_plural': 'Файлы списков покупок',
+            },
+        ),
+    ]
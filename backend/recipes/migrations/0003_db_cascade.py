@@ -0,0 +1,103 @@
+# Generated by Django 3.2 on 2026-10-19 09:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from foodgram.db.operations import AddDatabaseCascade
+
+CASCADE_FIELDS = (
+    ('favorite', 'recipe'),
+    ('favorite', 'user'),
+    ('follow', 'author'),
+    ('follow', 'user'),
+    ('ingredientinrecipe', 'ingredient'),
+    ('ingredientinrecipe', 'recipe'),
+    ('recipe', 'author'),
+    ('shoppingcart', 'recipe'),
+    ('shoppingcart', 'user'),
+    ('shoppinglistdocument', 'user'),
+)
+
+
+def cascade_fields(apps):
+    """Поля внешних ключей с каскадным удалением."""
+    fields = [
+        apps.get_model('recipes', model)._meta.get_field(name)
+        for model, name in CASCADE_FIELDS
+    ]
+    through = apps.get_model('recipes', 'Recipe').tags.through
+    return fields + [through._meta.get_field('recipe'), through._meta.get_field('tag')]
+
+
+def set_cascade(apps, schema_editor, cascade=True):
+    """ON DELETE CASCADE в PostgreSQL, триггеры удаления в SQLite."""
+    for field in cascade_fields(apps):
+        AddDatabaseCascade.set_cascade(schema_editor, field, cascade)
+
+
+def unset_cascade(apps, schema_editor):
+    """Возврат ограничений без каскадного удаления."""
+    set_cascade(apps, schema_editor, cascade=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_shoppinglistdocument'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favorite',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='favorites', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='favorites', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='following', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='follower', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientinrecipe',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='ingredient_recipe', to='recipes.ingredient', verbose_name='Ингредиент'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientinrecipe',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='ingredient_recipe', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='recipes', to=settings.AUTH_USER_MODEL, verbose_name='Автор рецепта'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='shopping_cart', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='shopping_cart', to=settings.AUTH_USER_MODEL, verbose_name='Хозяин корзины'),
+        ),
+        migrations.AlterField(
+            model_name='shoppinglistdocument',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.RunPython(set_cascade, unset_cascade),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2 on 2026-10-19 09:27
+
+from django.db import migrations, models
+
+from foodgram.db.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0003_db_cascade'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='favorite',
+            index=models.Index(fields=['recipe'], include=('user',), name='favorite_recipe_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='follow',
+            index=models.Index(fields=['author'], include=('user',), name='follow_author_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ingredientinrecipe',
+            index=models.Index(fields=['recipe'], include=('ingredient', 'amount'), name='ingredient_recipe_amount_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='shoppingcart',
+            index=models.Index(fields=['recipe'], include=('user',), name='cart_recipe_user_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-19 09:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from foodgram.db.operations import AddDatabaseCascade
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDocument',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='document', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('data', models.TextField(verbose_name='JSON рецепта')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+            ],
+            options={
+                'verbose_name': 'Представление рецепта',
+                'verbose_name_plural': 'Представления рецептов',
+            },
+        ),
+        AddDatabaseCascade(model_name='recipedocument', name='recipe'),
+    ]
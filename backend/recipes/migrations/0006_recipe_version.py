@@ -0,0 +1,27 @@
+# Generated by Django 3.2 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+from foodgram.db.operations import KeepTriggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_document'),
+    ]
+
+    operations = [
+        KeepTriggers('recipe', [
+            migrations.AddField(
+                model_name='recipe',
+                name='updated_at',
+                field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+            ),
+            migrations.AddField(
+                model_name='recipe',
+                name='version',
+                field=models.PositiveIntegerField(default=1, verbose_name='Версия'),
+            ),
+        ]),
+    ]
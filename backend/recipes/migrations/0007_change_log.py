@@ -0,0 +1,123 @@
+# Generated by Django 3.2 on 2026-10-19 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Таблицы, изменения которых попадают в журнал: модель, тип записи,
+# столбец id объекта, столбец владельца, отслеживаемые операции.
+LOGGED = (
+    ('recipe', 'recipe', 'id', None, ('INSERT', 'UPDATE', 'DELETE')),
+    ('favorite', 'favorite', 'recipe_id', 'user_id', ('INSERT', 'DELETE')),
+    ('shoppingcart', 'shopping_cart', 'recipe_id', 'user_id', ('INSERT', 'DELETE')),
+    ('follow', 'follow', 'author_id', 'user_id', ('INSERT', 'DELETE')),
+)
+
+POSTGRES_FUNCTION = """
+CREATE OR REPLACE FUNCTION recipes_change_log() RETURNS trigger AS $$
+DECLARE
+    data jsonb;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        data := to_jsonb(OLD);
+    ELSE
+        data := to_jsonb(NEW);
+    END IF;
+    INSERT INTO {log} (txid, kind, object_id, user_id, deleted, created)
+    VALUES (
+        txid_current(), TG_ARGV[0], (data ->> TG_ARGV[1])::bigint,
+        (data ->> TG_ARGV[2])::bigint, TG_OP = 'DELETE', now()
+    );
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def triggers(apps):
+    """Имя триггера, таблица, операция и аргументы для каждой записи."""
+    for model, kind, column, user_column, operations in LOGGED:
+        table = apps.get_model('recipes', model)._meta.db_table
+        for operation in operations:
+            yield (
+                f'{table}_{operation.lower()}_log', table, operation,
+                kind, column, user_column,
+            )
+
+
+def create_triggers(apps, schema_editor):
+    """Триггеры записи в журнал изменений."""
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    log = quote(apps.get_model('recipes', 'ChangeLog')._meta.db_table)
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_FUNCTION.format(log=log))
+    for name, table, operation, kind, column, user_column in triggers(apps):
+        if connection.vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE TRIGGER {quote(name)} AFTER {operation} '
+                f'ON {quote(table)} FOR EACH ROW EXECUTE FUNCTION '
+                f"recipes_change_log('{kind}', '{column}', "
+                f"'{user_column or ''}')",
+            )
+        elif connection.vendor == 'sqlite':
+            row = 'OLD' if operation == 'DELETE' else 'NEW'
+            user = f'{row}.{quote(user_column)}' if user_column else 'NULL'
+            schema_editor.execute(
+                f'CREATE TRIGGER {quote(name)} AFTER {operation} '
+                f'ON {quote(table)} FOR EACH ROW BEGIN INSERT INTO {log} '
+                '(txid, kind, object_id, user_id, deleted, created) '
+                f"VALUES (0, '{kind}', {row}.{quote(column)}, {user}, "
+                f"{int(operation == 'DELETE')}, CURRENT_TIMESTAMP); END",
+            )
+
+
+def drop_triggers(apps, schema_editor):
+    """Удаление триггеров журнала изменений."""
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    for name, table, *_ in triggers(apps):
+        if connection.vendor == 'postgresql':
+            schema_editor.execute(
+                f'DROP TRIGGER IF EXISTS {quote(name)} ON {quote(table)}',
+            )
+        elif connection.vendor == 'sqlite':
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {quote(name)}')
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP FUNCTION IF EXISTS recipes_change_log()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0006_recipe_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('txid', models.BigIntegerField(verbose_name='Транзакция')),
+                ('kind', models.CharField(choices=[('recipe', 'Рецепт'), ('favorite', 'Избранное'), ('shopping_cart', 'Корзина'), ('follow', 'Подписка')], max_length=16, verbose_name='Тип')),
+                ('object_id', models.BigIntegerField(verbose_name='id объекта')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удален')),
+                ('created', models.DateTimeField(verbose_name='Время изменения')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['user', 'txid', 'id'], name='changelog_user_txid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['created'], name='changelog_created_idx'),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
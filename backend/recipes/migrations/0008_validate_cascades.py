@@ -0,0 +1,38 @@
+# Generated by Django 3.2 on 2026-10-19 11:02
+
+from django.db import migrations
+
+from foodgram.db.operations import ValidateDatabaseCascade
+
+# Внешние ключи с каскадным удалением из 0003_db_cascade
+# и 0005_recipe_document.
+CASCADE_FIELDS = (
+    ('favorite', 'recipe'),
+    ('favorite', 'user'),
+    ('follow', 'author'),
+    ('follow', 'user'),
+    ('ingredientinrecipe', 'ingredient'),
+    ('ingredientinrecipe', 'recipe'),
+    ('recipe', 'author'),
+    ('recipe_tags', 'recipe'),
+    ('recipe_tags', 'tag'),
+    ('recipedocument', 'recipe'),
+    ('shoppingcart', 'recipe'),
+    ('shoppingcart', 'user'),
+    ('shoppinglistdocument', 'user'),
+)
+
+
+class Migration(migrations.Migration):
+
+    # Каждая проверка - отдельная транзакция без блокировки записи.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0007_change_log'),
+    ]
+
+    operations = [
+        ValidateDatabaseCascade(model_name=model, name=name)
+        for model, name in CASCADE_FIELDS
+    ]
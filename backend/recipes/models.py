@@ -1,9 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.utils import timezone
 
 User = get_user_model()
 
+# Зависимые строки удаляет база данных (ON DELETE CASCADE, миграция
+# 0003_db_cascade), поэтому Django не загружает их перед удалением.
+
 
 class Ingredient(models.Model):
     """Ингредиенты.
@@ -99,6 +103,48 @@ class RecipeQuerySet(models.QuerySet):
             ),
         )
 
+    def for_representation(self, fields=None, expand=()):
+        """Только нужные для ответа столбцы и связанные объекты.
+
+        fields - выводимые поля рецепта, None - все поля,
+        expand - связи, выводимые объектами при выборе полей.
+        """
+        def wanted(name):
+            return fields is None or name in fields
+
+        columns = ('name', 'image', 'text', 'cooking_time')
+        related = {
+            'tags': 'tags',
+            # Без сортировки по рецепту (Meta.ordering) подзапрос
+            # не соединяется с таблицей рецептов.
+            'ingredients': models.Prefetch(
+                'ingredient_recipe',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient',
+                ).order_by('id'),
+            ),
+        }
+        queryset = self.only(
+            'id', 'author', *[name for name in columns if wanted(name)],
+        ).prefetch_related(
+            *[lookup for name, lookup in related.items() if wanted(name)],
+        )
+        if fields is None or {'author'} <= fields & set(expand):
+            return queryset.select_related('author')
+        return queryset
+
+    def with_documents(self):
+        """Рецепты с готовыми представлениями (RecipeDocument)."""
+        return self.select_related('document').only(
+            'id', 'author', 'document__data',
+        )
+
+    def bump_versions(self):
+        """Новая версия рецептов выборки для сброса кэша клиентов."""
+        return self.update(
+            version=models.F('version') + 1, updated_at=timezone.now(),
+        )
+
     def filter_by_tag(self, tags):
         """Фильтрация по тегам."""
         if tags:
@@ -117,6 +163,9 @@ class Recipe(models.Model):
         image(string <url>): Ссылка на картинку на сайте.
         text(str): Описание рецепта.
         cooking_time(int): Время приготовления (в минутах).
+        updated_at(datetime): Дата последнего изменения.
+        version(int): Версия, растет при каждом изменении рецепта,
+            его тегов и ингредиентов (ETag ответа).
     """
 
     pub_date = models.DateTimeField(
@@ -126,7 +175,7 @@ class Recipe(models.Model):
     )
     author = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='recipes',
         verbose_name='Автор рецепта',
     )
@@ -162,6 +211,14 @@ class Recipe(models.Model):
             MinValueValidator(1, message='Введите время не меньше 1 мин'),
         ],
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Версия',
+    )
 
     objects = RecipeQuerySet.as_manager()
 
@@ -169,6 +226,12 @@ class Recipe(models.Model):
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('name', 'author'),
@@ -189,13 +252,13 @@ class IngredientInRecipe(models.Model):
 
     ingredient = models.ForeignKey(
         Ingredient,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='ingredient_recipe',
         verbose_name='Ингредиент',
     )
     recipe = models.ForeignKey(
         Recipe,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='ingredient_recipe',
         verbose_name='Рецепт',
     )
@@ -210,6 +273,12 @@ class IngredientInRecipe(models.Model):
         ordering = ('recipe',)
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецептах'
+        indexes = [
+            models.Index(
+                fields=('recipe',), include=('ingredient', 'amount'),
+                name='ingredient_recipe_amount_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('ingredient', 'recipe'),
@@ -231,13 +300,13 @@ class Favorite(models.Model):
 
     user = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='favorites',
         verbose_name='Пользователь',
     )
     recipe = models.ForeignKey(
         Recipe,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='favorites',
         verbose_name='Рецепт',
     )
@@ -246,6 +315,12 @@ class Favorite(models.Model):
         ordering = ('recipe',)
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
+        indexes = [
+            models.Index(
+                fields=('recipe',), include=('user',),
+                name='favorite_recipe_user_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
@@ -267,13 +342,13 @@ class ShoppingCart(models.Model):
 
     user = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='shopping_cart',
         verbose_name='Хозяин корзины',
     )
     recipe = models.ForeignKey(
         Recipe,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='shopping_cart',
         verbose_name='Рецепт',
     )
@@ -282,6 +357,12 @@ class ShoppingCart(models.Model):
         ordering = ('recipe',)
         verbose_name = 'Рецепт в корзине'
         verbose_name_plural = 'Рецепты в корзине'
+        indexes = [
+            models.Index(
+                fields=('recipe',), include=('user',),
+                name='cart_recipe_user_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
@@ -298,13 +379,13 @@ class Follow(models.Model):
 
     user = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='follower',
         verbose_name='Подписчик',
     )
     author = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
         related_name='following',
         verbose_name='Автор',
     )
@@ -313,6 +394,12 @@ class Follow(models.Model):
         ordering = ('author',)
         verbose_name = 'Подписку'
         verbose_name_plural = 'Подписки'
+        indexes = [
+            models.Index(
+                fields=('author',), include=('user',),
+                name='follow_author_user_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('user', 'author'),
@@ -322,3 +409,166 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class ShoppingListDocument(models.Model):
+    """Готовый файл списка покупок пользователя.
+
+    Args:
+        user(User): Пользователь.
+        version(int): Версия корзины, растет при каждом изменении.
+        rendered_version(int): Версия корзины, по которой созданы файлы.
+        txt(File): Список покупок в текстовом формате.
+        pdf(File): Список покупок в PDF.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.DO_NOTHING,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Версия корзины',
+    )
+    rendered_version = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Версия файлов',
+    )
+    txt = models.FileField(
+        upload_to='shopping_lists/',
+        blank=True,
+        verbose_name='Текстовый файл',
+    )
+    pdf = models.FileField(
+        upload_to='shopping_lists/',
+        blank=True,
+        verbose_name='PDF',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Обновлен',
+    )
+
+    class Meta:
+        verbose_name = 'Файл списка покупок'
+        verbose_name_plural = 'Файлы списков покупок'
+
+    def __str__(self):
+        return f'Список покупок {self.user} v{self.version}'
+
+    @property
+    def is_fresh(self):
+        """Файлы соответствуют текущему содержимому корзины."""
+        return self.rendered_version == self.version
+
+
+class RecipeDocument(models.Model):
+    """Готовое представление рецепта для чтения.
+
+    Args:
+        recipe(Recipe): Рецепт.
+        data(str): JSON рецепта с автором, тегами и ингредиентами,
+            без полей, зависящих от пользователя.
+        updated(datetime): Время последней сборки.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name='document',
+        verbose_name='Рецепт',
+    )
+    data = models.TextField(
+        verbose_name='JSON рецепта',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Обновлен',
+    )
+
+    class Meta:
+        verbose_name = 'Представление рецепта'
+        verbose_name_plural = 'Представления рецептов'
+
+    def __str__(self):
+        return f'Представление рецепта {self.recipe_id}'
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений для синхронизации клиентов (/api/sync/).
+
+    Строки пишут триггеры БД в той же транзакции, что и изменение
+    (миграция 0007_change_log). Порядок строк - (txid, id): txid -
+    номер транзакции PostgreSQL, в SQLite транзакции выполняются
+    по одной и txid равен 0.
+
+    Args:
+        txid(int): Номер транзакции изменения.
+        kind(str): Что изменено: рецепт, избранное, корзина, подписка.
+        object_id(int): id рецепта, для подписки - id автора.
+        user(User): Владелец строки избранного, корзины или подписки,
+            для рецептов не задан.
+        deleted(bool): Строка удалена.
+        created(datetime): Время изменения.
+    """
+
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    FOLLOW = 'follow'
+    KINDS = (
+        (RECIPE, 'Рецепт'),
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Корзина'),
+        (FOLLOW, 'Подписка'),
+    )
+
+    txid = models.BigIntegerField(
+        verbose_name='Транзакция',
+    )
+    kind = models.CharField(
+        max_length=16,
+        choices=KINDS,
+        verbose_name='Тип',
+    )
+    object_id = models.BigIntegerField(
+        verbose_name='id объекта',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        related_name='+',
+        verbose_name='Пользователь',
+    )
+    deleted = models.BooleanField(
+        default=False,
+        verbose_name='Удален',
+    )
+    created = models.DateTimeField(
+        verbose_name='Время изменения',
+    )
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(
+                fields=('user', 'txid', 'id'),
+                name='changelog_user_txid_idx',
+            ),
+            models.Index(
+                fields=('created',),
+                name='changelog_created_idx',
+            ),
+        ]
+
+    def __str__(self):
+        action = 'удален' if self.deleted else 'изменен'
+        return f'{self.get_kind_display()} {self.object_id} {action}'
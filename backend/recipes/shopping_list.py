@@ -0,0 +1,123 @@
+import io
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import F, Sum
+
+from recipes.models import (
+    IngredientInRecipe, ShoppingCart, ShoppingListDocument,
+)
+
+FORMATS = {
+    'txt': 'text/plain',
+    'pdf': 'application/pdf',
+}
+
+
+def shopping_list_items(user_id):
+    """Суммарное количество ингредиентов из корзины пользователя."""
+    return (
+        IngredientInRecipe.objects.filter(
+            recipe__shopping_cart__user_id=user_id,
+        )
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(quantity=Sum('amount')).order_by()
+    )
+
+
+def render_txt(items):
+    """Список покупок в текстовом формате."""
+    shopping_list = ('Список покупок: \n\n')
+    shopping_list += ''.join([
+        f'- {item["ingredient__name"]}, '
+        + f'({item["ingredient__measurement_unit"]})'
+        + f' - {item["quantity"]}\n'
+        for item in items
+    ])
+    return shopping_list.encode()
+
+
+def render_pdf(items):
+    """Список покупок в PDF со шрифтом SHOPPING_LIST_FONT."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    if 'ShoppingListFont' not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont('ShoppingListFont', settings.SHOPPING_LIST_FONT),
+        )
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=True)
+    width, height = A4
+    y = height - 60
+    pdf.setFont('ShoppingListFont', 16)
+    pdf.drawString(50, y, 'Список покупок')
+    pdf.setFont('ShoppingListFont', 11)
+    for item in items:
+        y -= 18
+        if y < 50:
+            pdf.showPage()
+            pdf.setFont('ShoppingListFont', 11)
+            y = height - 60
+        pdf.drawString(
+            50, y,
+            f'- {item["ingredient__name"]} '
+            f'({item["ingredient__measurement_unit"]}) - '
+            f'{item["quantity"]}',
+        )
+    pdf.save()
+    return buffer.getvalue()
+
+
+def bump_versions(user_ids, create=False):
+    """Увеличивает версии корзин пользователей.
+
+    create - создать записи для пользователей, у которых их нет.
+    Возвращает число обновленных записей.
+    """
+    user_ids = set(user_ids)
+    if create:
+        ShoppingListDocument.objects.bulk_create(
+            [ShoppingListDocument(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+    return ShoppingListDocument.objects.filter(user_id__in=user_ids).update(
+        version=F('version') + 1,
+    )
+
+
+def cart_users(**filters):
+    """Пользователи, у которых в корзине есть подходящие рецепты."""
+    return ShoppingCart.objects.filter(**filters).values_list(
+        'user_id', flat=True,
+    ).distinct()
+
+
+def render_document(user_id):
+    """Создает файлы списка покупок, если они устарели.
+
+    Файлы сохраняются под случайными именами. Если другой процесс
+    успел сохранить свои файлы раньше, созданные файлы удаляются.
+    """
+    document, _ = ShoppingListDocument.objects.get_or_create(user_id=user_id)
+    if document.is_fresh:
+        return document
+    version, rendered_version = document.version, document.rendered_version
+    previous = [document.txt.name, document.pdf.name]
+    items = list(shopping_list_items(user_id))
+    name = uuid.uuid4().hex
+    document.txt.save(f'{name}.txt', ContentFile(render_txt(items)), False)
+    document.pdf.save(f'{name}.pdf', ContentFile(render_pdf(items)), False)
+    created = [document.txt.name, document.pdf.name]
+    updated = ShoppingListDocument.objects.filter(
+        pk=document.pk, rendered_version=rendered_version,
+    ).update(txt=created[0], pdf=created[1], rendered_version=version)
+    storage = document.txt.storage
+    for file_name in previous if updated else created:
+        if file_name:
+            storage.delete(file_name)
+    document.refresh_from_db()
+    return document
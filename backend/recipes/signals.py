@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, ShoppingCart
+from recipes.shopping_list import bump_versions, cart_users
+from recipes.tasks import render_shopping_list
+
+
+def schedule_render(user_id):
+    """Отложенное создание файлов списка покупок.
+
+    Повторные изменения корзины в течение SHOPPING_LIST_DEBOUNCE
+    секунд переносят единственную задачу в очереди.
+    """
+    render_shopping_list.apply_async(
+        (user_id,), countdown=settings.SHOPPING_LIST_DEBOUNCE,
+        key=f'shopping-list:{user_id}',
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_item_added(sender, instance, **kwargs):
+    """Новая версия корзины при добавлении рецепта."""
+    bump_versions([instance.user_id], create=True)
+    schedule_render(instance.user_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def cart_item_deleted(sender, instance, **kwargs):
+    """Новая версия корзины при удалении рецепта."""
+    if bump_versions([instance.user_id]):
+        schedule_render(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, **kwargs):
+    """Устаревание списков покупок с измененным рецептом."""
+    if not created:
+        bump_versions(cart_users(recipe=instance))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Устаревание списков покупок с удаляемым рецептом.
+
+    Строки корзины удаляет база данных, без сигналов ShoppingCart.
+    """
+    bump_versions(cart_users(recipe=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    """Устаревание списков покупок с измененным ингредиентом."""
+    if not created:
+        bump_versions(cart_users(recipe__ingredients=instance))
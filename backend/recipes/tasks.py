@@ -0,0 +1,14 @@
+from django.contrib.auth import get_user_model
+
+from recipes.shopping_list import render_document
+from tasks.decorators import task
+
+User = get_user_model()
+
+
+@task
+def render_shopping_list(user_id):
+    """Фоновое создание файлов списка покупок пользователя."""
+    if not User.objects.filter(pk=user_id).exists():
+        return None
+    return render_document(user_id).rendered_version
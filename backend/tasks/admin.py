@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from foodgram.admin import ScalableAdminMixin
+from tasks.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    """Админ для фоновых задач."""
+
+    list_display = (
+        'id', 'name', 'status', 'attempts', 'run_at', 'created', 'finished',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key')
+    readonly_fields = ('created', 'finished', 'locked_until')
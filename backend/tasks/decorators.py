@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from tasks.models import Task
+
+registry = {}
+
+
+class TaskFunction:
+    """Функция, которую можно поставить в очередь фоновых задач.
+
+    Вызов функции выполняет ее сразу, delay и apply_async
+    ставят задачу в очередь. Аргументы и результат должны
+    сериализоваться в JSON.
+    """
+
+    def __init__(self, func, name, max_retries, retry_backoff):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Постановка задачи в очередь."""
+        return self.apply_async(args, kwargs)
+
+    def apply_async(self, args=(), kwargs=None, countdown=0, key=None):
+        """Постановка задачи в очередь.
+
+        countdown - задержка выполнения, секунд. key - ключ
+        объединения: пока в очереди есть задача с тем же ключом,
+        новая не создается, а выполнение существующей переносится
+        на время, заданное countdown (отложенный запуск после
+        серии изменений).
+        """
+        task = Task(
+            name=self.name, args=list(args), kwargs=kwargs or {}, key=key,
+            max_retries=self.max_retries,
+            run_at=timezone.now() + timezone.timedelta(seconds=countdown),
+        )
+        if settings.TASKS_EAGER:
+            transaction.on_commit(lambda: self.run_eager(task))
+            return task
+        try:
+            with transaction.atomic():
+                task.save()
+        except IntegrityError:
+            if key is None:
+                raise
+            existing = Task.objects.filter(
+                key=key, status=Task.PENDING,
+            ).first()
+            if existing is None:
+                return self.apply_async(args, kwargs, countdown, key)
+            Task.objects.filter(
+                pk=existing.pk, status=Task.PENDING, run_at__lt=task.run_at,
+            ).update(run_at=task.run_at)
+            return existing
+        return task
+
+    def run_eager(self, task):
+        """Выполнение задачи в текущем процессе (TASKS_EAGER)."""
+        task.result = self.func(*task.args, **task.kwargs)
+        task.status = Task.DONE
+        task.attempts = 1
+
+
+def task(func=None, *, name=None, max_retries=3, retry_backoff=2):
+    """Регистрация функции как фоновой задачи.
+
+    После неудачной попытки задача повторяется до max_retries раз
+    с задержкой retry_backoff ** номер попытки секунд.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = TaskFunction(
+            func, task_name, max_retries, retry_backoff,
+        )
+        return registry[task_name]
+
+    if func is not None:
+        return decorator(func)
+    return decorator
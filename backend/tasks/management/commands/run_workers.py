@@ -0,0 +1,65 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks.worker import purge_finished, run_process, start_threads
+
+
+class Command(BaseCommand):
+    """Запуск обработчиков фоновых задач."""
+
+    help = ('Выполняет задачи из очереди в базе данных: PROCESSES '
+            'процессов по THREADS потоков в каждом.')
+
+    def add_arguments(self, parser):
+        """Параметры команды."""
+        parser.add_argument(
+            '--processes', type=int, default=settings.TASKS_PROCESSES,
+        )
+        parser.add_argument(
+            '--threads', type=int, default=settings.TASKS_THREADS,
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершиться, когда очередь опустеет.',
+        )
+
+    def handle(self, *args, **options):
+        """Запуск процессов и потоков обработчиков."""
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+        purge_finished()
+        connections.close_all()
+        if options['processes'] > 1:
+            workers = [
+                context.Process(
+                    target=run_process,
+                    args=(options['threads'], stop, options['burst']),
+                )
+                for _ in range(options['processes'])
+            ]
+            for worker in workers:
+                worker.start()
+        else:
+            workers = start_threads(
+                options['threads'], stop, options['burst'],
+            )
+        self.stdout.write(
+            f'Обработчики задач: {options["processes"]} x '
+            f'{options["threads"]}.',
+        )
+        purged = time.monotonic()
+        while any(worker.is_alive() for worker in workers):
+            if stop.wait(1):
+                break
+            if time.monotonic() - purged > settings.TASKS_PURGE_SECONDS:
+                purge_finished()
+                purged = time.monotonic()
+        for worker in workers:
+            worker.join()
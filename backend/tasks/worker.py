@@ -0,0 +1,152 @@
+import logging
+import signal
+import threading
+import traceback
+
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import (
+    DatabaseError, IntegrityError, close_old_connections, connection,
+    transaction,
+)
+from django.db.models import Q
+from django.utils import timezone
+
+from tasks.decorators import registry
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def claim():
+    """Забирает одну готовую к выполнению задачу или возвращает None.
+
+    Задача занимается условным UPDATE, поэтому одновременно работающие
+    обработчики не выполняют ее дважды; в PostgreSQL строки,
+    заблокированные другими обработчиками, пропускаются. Задачи,
+    занятые упавшим обработчиком, снова выдаются после истечения
+    locked_until.
+    """
+    now = timezone.now()
+    ready = Task.objects.filter(
+        Q(status=Task.PENDING) | Q(
+            status=Task.RUNNING, locked_until__lt=now,
+        ),
+        run_at__lte=now,
+    ).order_by('run_at')
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic() if skip_locked else nullcontext():
+        if skip_locked:
+            ready = ready.select_for_update(skip_locked=True)
+        for pk, status in list(ready.values_list('pk', 'status')[:10]):
+            locked_until = now + timezone.timedelta(
+                seconds=settings.TASKS_LOCK_SECONDS,
+            )
+            if Task.objects.filter(pk=pk, status=status).update(
+                status=Task.RUNNING, locked_until=locked_until,
+            ):
+                return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(task):
+    """Выполнение задачи с повтором при ошибке.
+
+    Если для повтора задачи с ключом в очереди уже есть задача с тем же
+    ключом, повтор удаляется.
+    """
+    task_function = registry.get(task.name)
+    task.attempts += 1
+    try:
+        if task_function is None:
+            raise LookupError(f'Задача {task.name} не зарегистрирована.')
+        task.result = task_function.func(*task.args, **task.kwargs)
+    except Exception:
+        task.error = traceback.format_exc()
+        logger.exception('Ошибка задачи %s', task)
+        if task_function is not None and task.attempts <= task.max_retries:
+            task.status = Task.PENDING
+            task.run_at = timezone.now() + timezone.timedelta(
+                seconds=task_function.retry_backoff ** task.attempts,
+            )
+        else:
+            task.status = Task.FAILED
+            task.finished = timezone.now()
+    else:
+        task.status = Task.DONE
+        task.error = ''
+        task.finished = timezone.now()
+    task.locked_until = None
+    try:
+        with transaction.atomic():
+            task.save(update_fields=(
+                'status', 'attempts', 'result', 'error', 'run_at',
+                'locked_until', 'finished',
+            ))
+    except IntegrityError:
+        if task.status != Task.PENDING or task.key is None:
+            raise
+        # В очереди уже есть задача с тем же ключом, она выполнит ту же
+        # работу: повтор не нужен.
+        logger.info('Повтор %s заменен задачей с ключом %s',
+                    task, task.key)
+        Task.objects.filter(pk=task.pk).delete()
+    return task
+
+
+def purge_finished():
+    """Удаление результатов старше TASKS_RESULT_TTL."""
+    return Task.objects.filter(
+        status__in=(Task.DONE, Task.FAILED),
+        finished__lt=timezone.now() - timezone.timedelta(
+            seconds=settings.TASKS_RESULT_TTL,
+        ),
+    ).delete()[0]
+
+
+def work(stop, burst=False):
+    """Цикл обработчика: выполнение задач до установки события stop.
+
+    burst - завершиться, когда очередь опустеет.
+    """
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                task = claim()
+            except DatabaseError:
+                logger.exception('Ошибка получения задачи')
+                task = None
+            if task is not None:
+                try:
+                    execute(task)
+                except Exception:
+                    logger.exception('Ошибка обработчика задачи %s', task)
+                continue
+            if burst:
+                return
+            stop.wait(settings.TASKS_POLL_SECONDS)
+    finally:
+        connection.close()
+
+
+def start_threads(threads, stop, burst=False):
+    """Запуск обработчиков в потоках текущего процесса."""
+    workers = [
+        threading.Thread(
+            target=work, args=(stop, burst), name=f'task-worker-{number}',
+            daemon=True,
+        )
+        for number in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def run_process(threads, stop, burst=False):
+    """Процесс обработчиков: потоки до установки события stop."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for worker in start_threads(threads, stop, burst):
+        worker.join()
@@ -2,11 +2,13 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
+from foodgram.admin import ScalableAdminMixin
+
 User = get_user_model()
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ScalableAdminMixin, BaseUserAdmin):
     """Админ для модели пользователей."""
 
     list_display = (
@@ -18,5 +20,6 @@ class UserAdmin(BaseUserAdmin):
         'is_active', 'is_staff', ('last_login', 'date_joined'),
     )
     fieldsets = []
-    list_filter = ('email', 'username')
+    list_filter = ('is_staff', 'is_active')
+    search_fields = ('email', 'username')
     readonly_fields = ('last_login', 'date_joined')
@@ -44,6 +44,11 @@ class User(AbstractUser):
         ordering = ('-date_joined',)
         verbose_name = 'Пользователя'
         verbose_name_plural = 'Пользователи'
+        indexes = [
+            models.Index(
+                fields=('-date_joined',), name='user_date_joined_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.username
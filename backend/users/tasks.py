@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.models import (
+    Favorite, Follow, IngredientInRecipe, Recipe, ShoppingListDocument,
+)
+from tasks.decorators import task
+
+User = get_user_model()
+
+
+def user_history(user_id):
+    """Строки, удаляемые вместе с пользователем.
+
+    Сначала строки, ссылающиеся на рецепты пользователя, затем
+    сами рецепты и собственные строки пользователя. Строки корзин
+    удаляет база данных вместе с рецептами и пользователем: удаление
+    через Django вызывало бы сигнал на каждую строку.
+    """
+    querysets = (
+        ShoppingListDocument.objects.filter(user_id=user_id),
+        Favorite.objects.filter(recipe__author_id=user_id),
+        IngredientInRecipe.objects.filter(recipe__author_id=user_id),
+        Recipe.objects.filter(author_id=user_id),
+        Favorite.objects.filter(user_id=user_id),
+        Follow.objects.filter(Q(user_id=user_id) | Q(author_id=user_id)),
+    )
+    return [queryset.order_by() for queryset in querysets]
+
+
+def history_size(user_id):
+    """Число строк, удаляемых вместе с пользователем."""
+    return sum(queryset.count() for queryset in user_history(user_id))
+
+
+def delete_in_chunks(user_id, chunk_size=None):
+    """Удаление пользователя порциями по chunk_size строк.
+
+    Каждая порция удаляется в своей транзакции: блокировки короткие,
+    а прерванное удаление продолжается с места остановки.
+    """
+    chunk_size = chunk_size or settings.USER_DELETE_CHUNK_SIZE
+    deleted = 0
+    for queryset in user_history(user_id):
+        while True:
+            ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                deleted += queryset.model.objects.filter(
+                    pk__in=ids,
+                ).delete()[0]
+    deleted += User.objects.filter(pk=user_id).delete()[0]
+    return deleted
+
+
+@task
+def delete_user(user_id):
+    """Фоновое удаление пользователя с большой историей."""
+    return delete_in_chunks(user_id)
@@ -0,0 +1,49 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    """Файлы media во временном каталоге."""
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    return settings.MEDIA_ROOT
+
+
+@pytest.fixture
+def bench_data(db, media_root):
+    """Небольшой набор данных seed_bench."""
+    call_command(
+        'seed_bench', users=30, recipes=300, stdout=io.StringIO(),
+    )
+
+
+@pytest.fixture
+def user(django_user_model):
+    """Пользователь с токеном."""
+    return django_user_model.objects.create_user(
+        username='cook', email='cook@example.com', password='cook-password',
+        first_name='Иван', last_name='Поваров',
+    )
+
+
+@pytest.fixture
+def admin_user(django_user_model):
+    """Суперпользователь для admin_client.
+
+    Вход по email, поэтому фикстура pytest-django не подходит.
+    """
+    return django_user_model.objects.create_superuser(
+        username='admin', email='admin@example.com',
+        password='admin-password',
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    """Клиент API, авторизованный токеном пользователя."""
+    token, _ = Token.objects.get_or_create(user=user)
+    return Client(HTTP_AUTHORIZATION=f'Token {token.key}')
@@ -0,0 +1,51 @@
+import pytest
+from django.apps import apps
+from django.contrib import admin
+from django.urls import reverse
+
+from api.benchmark import bench_settings
+
+# Число запросов к БД на странице списка, не зависящее от числа строк:
+# сессия, пользователь, число строк, страница и отношения строк.
+MAX_QUERIES = 6
+
+CHANGELISTS = (
+    'recipes.Favorite',
+    'recipes.Follow',
+    'recipes.Ingredient',
+    'recipes.IngredientInRecipe',
+    'recipes.Recipe',
+    'recipes.ShoppingCart',
+    'recipes.Tag',
+    'tasks.Task',
+    'users.User',
+)
+
+
+def changelist_url(label):
+    """Адрес списка объектов модели в админке."""
+    opts = apps.get_model(label)._meta
+    return reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('label', CHANGELISTS)
+def test_changelist_queries(label, bench_data, admin_client,
+                            django_assert_max_num_queries):
+    """Список объектов открывается ограниченным числом запросов."""
+    with bench_settings(), django_assert_max_num_queries(MAX_QUERIES):
+        response = admin_client.get(changelist_url(label))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('label', [
+    label for label in CHANGELISTS
+    if admin.site._registry[apps.get_model(label)].search_fields
+])
+def test_changelist_search_queries(label, bench_data, admin_client,
+                                   django_assert_max_num_queries):
+    """Поиск в списке объектов не добавляет запросов на строку."""
+    with bench_settings(), django_assert_max_num_queries(MAX_QUERIES):
+        response = admin_client.get(f'{changelist_url(label)}?q=a')
+    assert response.status_code == 200
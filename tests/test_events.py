@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+import pytest
+
+from django.db import connection
+
+from api.events import (
+    author_channel, event_stream, follows_channel, get_broker,
+    publish_event, send_message, sse_frame, user_channel,
+)
+from recipes.models import Follow
+
+
+class Stream:
+    """Клиент потока событий: ASGI receive/send в памяти."""
+
+    def __init__(self, query_string=b'', headers=()):
+        self.scope = {
+            'type': 'http', 'method': 'GET', 'path': '/api/events/',
+            'query_string': query_string, 'headers': list(headers),
+        }
+        self.status = None
+        self.bodies = asyncio.Queue()
+        self.closed = asyncio.Event()
+
+    async def receive(self):
+        """Соединение открыто до close()."""
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        """Статус ответа и части тела."""
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        else:
+            await self.bodies.put(message.get('body', b''))
+
+    async def next_body(self):
+        """Следующая часть тела ответа."""
+        return await asyncio.wait_for(self.bodies.get(), 5)
+
+    def close(self):
+        """Отключение клиента."""
+        self.closed.set()
+
+
+@pytest.fixture
+def events(settings, monkeypatch):
+    """LocalBroker и соединения с БД, закрываемые после запроса.
+
+    Аутентификация выполняется в потоках пула offload, их соединения
+    не должны пережить тест.
+    """
+    settings.EVENTS_BROKER = 'api.events.LocalBroker'
+    monkeypatch.setitem(connection.settings_dict, 'CONN_MAX_AGE', 0)
+
+
+def events_token(client):
+    """Токен потока событий из POST /api/events/token/."""
+    response = client.post('/api/events/token/')
+    assert response.status_code == 201
+    return response.json()['token']
+
+
+def run_stream(stream):
+    """Поток событий до отключения клиента или ответа с ошибкой."""
+    asyncio.run(event_stream(stream.scope, stream.receive, stream.send))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_signed_token_stream(events, user, user_client, django_user_model):
+    """Поток по ?token= получает рецепты авторов, корзину и подписки."""
+    author, other = (
+        django_user_model.objects.create_user(
+            username=name, email=f'{name}@example.com', password='password',
+        )
+        for name in ('author', 'other')
+    )
+    Follow.objects.create(user=user, author=author)
+    stream = Stream(f'token={events_token(user_client)}'.encode())
+
+    async def scenario():
+        task = asyncio.ensure_future(
+            event_stream(stream.scope, stream.receive, stream.send),
+        )
+        assert await stream.next_body() == b'retry: 5000\n\n'
+        assert stream.status == 200
+        recipe = sse_frame('recipe', {'id': 1, 'author': author.pk})
+        send_message(author_channel(author.pk), recipe)
+        assert await stream.next_body() == recipe.encode()
+        cart = sse_frame('cart', {'id': 1, 'in_cart': True})
+        send_message(user_channel(user.pk), cart)
+        assert await stream.next_body() == cart.encode()
+        send_message(follows_channel(user.pk), json.dumps(
+            {'author': other.pk, 'following': True},
+        ))
+        while author_channel(other.pk) not in get_broker().subscribers:
+            await asyncio.sleep(0.01)
+        recipe = sse_frame('recipe', {'id': 2, 'author': other.pk})
+        send_message(author_channel(other.pk), recipe)
+        assert await stream.next_body() == recipe.encode()
+        stream.close()
+        await task
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('query_string', (b'token=forged', b''))
+def test_stream_requires_credentials(events, query_string):
+    """Без учетных данных и с поддельным токеном - 401."""
+    stream = Stream(query_string)
+    run_stream(stream)
+    assert stream.status == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_expired_token(events, settings, user_client):
+    """Токен старше EVENTS_TOKEN_MAX_AGE не принимается."""
+    token = events_token(user_client)
+    settings.EVENTS_TOKEN_MAX_AGE = -1
+    stream = Stream(f'token={token}'.encode())
+    run_stream(stream)
+    assert stream.status == 401
+
+
+@pytest.mark.django_db
+def test_events_disabled_by_default(settings, user,
+                                    django_capture_on_commit_callbacks):
+    """Без EVENTS_BROKER события не публикуются, поток недоступен."""
+    settings.EVENTS_BROKER = ''
+    with django_capture_on_commit_callbacks() as callbacks:
+        publish_event(user_channel(user.pk), 'cart', {'id': 1})
+    assert callbacks == []
+    stream = Stream()
+    run_stream(stream)
+    assert stream.status == 404
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from django.test import Client
+
+from api.benchmark import bench_settings
+from api.facets import facet_index
+from recipes.models import ChangeLog, IngredientInRecipe, Recipe, Tag
+
+
+@pytest.fixture
+def facets(settings):
+    """Индекс, который строится заново и догоняет базу при запросе."""
+    settings.RECIPE_FACETS_REFRESH_INTERVAL = 0
+    facet_index.built = False
+    facet_index.builds = facet_index.compactions = 0
+    facet_index.reset()
+    yield facet_index
+    facet_index.built = False
+    facet_index.reset()
+
+
+def random_queries(count):
+    """Строки запроса со случайными сочетаниями фильтров индекса."""
+    generator = random.Random(0)
+    tags = list(Tag.objects.values_list('slug', flat=True))
+    ingredients = list(
+        IngredientInRecipe.objects.values_list(
+            'ingredient_id', flat=True,
+        ).distinct()[:50],
+    )
+    queries = []
+    for _ in range(count):
+        params = ['limit=20', f'page={generator.randint(1, 2)}']
+        params.extend(
+            f'tags={slug}'
+            for slug in generator.sample(tags, generator.randint(0, 2))
+        )
+        if generator.random() < 0.5:
+            params.append(
+                f'cooking_time_max={generator.choice((20, 45, 90))}',
+            )
+        if generator.random() < 0.3:
+            params.append(f'cooking_time_min={generator.choice((10, 30))}')
+        params.extend(
+            f'ingredients={ingredient}'
+            for ingredient in generator.sample(
+                ingredients, generator.randint(0, 1),
+            )
+        )
+        if generator.random() < 0.3:
+            params.append(
+                f'exclude_ingredients={generator.choice(ingredients)}',
+            )
+        queries.append('?' + '&'.join(params))
+    return queries
+
+
+def assert_same_responses(settings, queries):
+    """Список и счетчики с индексом совпадают с ответами БД."""
+    client = Client()
+    with bench_settings():
+        for query in queries:
+            for path in ('/api/recipes/', '/api/recipes/facets/'):
+                responses = []
+                for enabled in (False, True):
+                    settings.RECIPE_FACETS = enabled
+                    response = client.get(path + query)
+                    responses.append((response.status_code, response.json()))
+                assert responses[0] == responses[1], path + query
+
+
+def test_index_matches_database(settings, bench_data, facets):
+    """Ответы по индексу и по БД на данных seed_bench одинаковы."""
+    assert_same_responses(settings, random_queries(40))
+    assert facets.builds == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleted_positions_compacted(settings, bench_data, facets):
+    """Позиции удаленных рецептов освобождаются перенумерацией."""
+    settings.RECIPE_FACETS_COMPACT_RATIO = 0.25
+    using = ChangeLog.objects.db
+    facets.build(using)
+    query = {
+        'tags': (), 'ingredients': (), 'exclude_ingredients': (),
+        'cooking_time': (None, None),
+    }
+    bitmap, positions = facets.search(query)
+    newest = facets.page(bitmap, positions, 0, 10)
+
+    recipes = list(Recipe.objects.order_by('pub_date', 'pk'))
+    deleted = [recipe.pk for recipe in recipes[::3]]
+    Recipe.objects.filter(pk__in=deleted).delete()
+    facets.catch_up(using)
+
+    assert facets.compactions == 1
+    assert len(facets.positions) == len(facets.entries)
+    assert len(facets.entries) == len(recipes) - len(deleted)
+    assert facets.all == (1 << len(facets.entries)) - 1
+    assert facets.page(bitmap, positions, 0, 10) == [
+        None if pk in deleted else pk for pk in newest
+    ]
+    assert_same_responses(settings, random_queries(20))
+    assert facets.builds == 1
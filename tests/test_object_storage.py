@@ -0,0 +1,162 @@
+import io
+import json
+import os
+
+import pytest
+import requests
+
+from django.core.files.storage import default_storage
+from moto import mock_s3
+from PIL import Image
+
+from api.uploads import INCOMING_PREFIX, direct_uploads
+from recipes.models import Ingredient, Recipe, Tag
+
+BUCKET = 'foodgram-test'
+
+
+@pytest.fixture
+def object_storage(settings):
+    """ObjectStorage с бакетом в moto вместо S3."""
+    with mock_s3():
+        settings.AWS_STORAGE_BUCKET_NAME = BUCKET
+        settings.AWS_S3_REGION_NAME = 'us-east-1'
+        settings.AWS_ACCESS_KEY_ID = 'testing'
+        settings.AWS_SECRET_ACCESS_KEY = 'testing'
+        settings.AWS_S3_SIGNATURE_VERSION = 's3v4'
+        settings.AWS_QUERYSTRING_AUTH = False
+        settings.DEFAULT_FILE_STORAGE = 'api.object_storage.ObjectStorage'
+        settings.TASKS_EAGER = True
+        default_storage.bucket.create()
+        yield default_storage
+
+
+@pytest.fixture
+def recipe():
+    """Поля рецепта без картинки."""
+    return {
+        'name': 'Рецепт с картинкой в хранилище',
+        'tags': [Tag.objects.create(
+            name='Обед', color='#E26C2D', slug='lunch',
+        ).pk],
+        'ingredients': [{'id': Ingredient.objects.create(
+            name='соль', measurement_unit='г',
+        ).pk, 'amount': 1}],
+        'text': 'Рецепт для проверки объектного хранилища.',
+        'cooking_time': 10,
+    }
+
+
+def png():
+    """Небольшая картинка PNG."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def presign(client, size, name='image.png'):
+    """Подписанная форма загрузки из /api/uploads/."""
+    response = client.post(
+        '/api/uploads/', {'size': size, 'name': name},
+        content_type='application/json',
+    )
+    assert response.status_code == 201, response.content
+    return response.json()
+
+
+def upload(form, content):
+    """Загрузка файла в хранилище по подписанной форме."""
+    response = requests.post(
+        form['url'], data=form['fields'],
+        files={'file': ('image.png', content)}, timeout=30,
+    )
+    assert response.status_code in (200, 201, 204), response.text
+
+
+def create_recipe(client, recipe, image,
+                  django_capture_on_commit_callbacks):
+    """Рецепт со ссылкой на загрузку, задачи выполняются сразу."""
+    with django_capture_on_commit_callbacks(execute=True):
+        return client.post(
+            '/api/recipes/', json.dumps({**recipe, 'image': image}),
+            content_type='application/json',
+        )
+
+
+@pytest.mark.django_db
+def test_presigned_form(object_storage, user_client):
+    """Форма подписана для ключа в incoming/ с типом файла."""
+    assert direct_uploads()
+    form = presign(user_client, 100, 'photo.JPG')
+    assert form['image'] == 'upload:' + form['id']
+    assert BUCKET in form['url']
+    assert form['fields']['key'].startswith(INCOMING_PREFIX)
+    assert form['fields']['key'].endswith('.jpg')
+    assert form['fields']['Content-Type'] == 'image/jpeg'
+    assert 'policy' in form['fields']
+
+
+@pytest.mark.django_db
+def test_rejects_unknown_extension(object_storage, user_client):
+    """Форма выдается только для картинок."""
+    response = user_client.post(
+        '/api/uploads/', {'size': 100, 'name': 'script.svg'},
+        content_type='application/json',
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_uploaded_image_validated(object_storage, user_client, recipe,
+                                  django_capture_on_commit_callbacks):
+    """Проверенная копия заменяет загруженный объект."""
+    content = png()
+    form = presign(user_client, len(content))
+    upload(form, content)
+    key = form['fields']['key']
+    assert object_storage.exists(key)
+
+    response = create_recipe(
+        user_client, recipe, form['image'],
+        django_capture_on_commit_callbacks,
+    )
+    assert response.status_code == 201, response.content
+    image = Recipe.objects.get().image.name
+    assert image.startswith('recipes/')
+    assert object_storage.open(image).read() == content
+    assert not object_storage.exists(key)
+
+
+@pytest.mark.django_db
+def test_not_an_image_rejected(object_storage, user_client, recipe,
+                               django_capture_on_commit_callbacks):
+    """Файл, не являющийся картинкой, удаляется, рецепт без картинки."""
+    content = os.urandom(4096)
+    form = presign(user_client, len(content))
+    upload(form, content)
+
+    response = create_recipe(
+        user_client, recipe, form['image'],
+        django_capture_on_commit_callbacks,
+    )
+    assert response.status_code == 201, response.content
+    assert not Recipe.objects.get().image
+    assert not object_storage.exists(form['fields']['key'])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('uploaded', (None, b'short'))
+def test_missing_or_wrong_size_upload(object_storage, user_client, recipe,
+                                      django_capture_on_commit_callbacks,
+                                      uploaded):
+    """Незагруженный файл или файл другого размера не принимается."""
+    form = presign(user_client, len(png()))
+    if uploaded is not None:
+        upload(form, uploaded)
+
+    response = create_recipe(
+        user_client, recipe, form['image'],
+        django_capture_on_commit_callbacks,
+    )
+    assert response.status_code == 400
+    assert not Recipe.objects.exists()
@@ -0,0 +1,56 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.benchmark import api_scenarios, bench_settings, seq_scans
+
+# Таблицы горячих запросов API с индексами из 0004_hot_query_indexes
+# и users 0002_hot_query_indexes.
+HOT_TABLES = {
+    'recipes_favorite',
+    'recipes_follow',
+    'recipes_ingredientinrecipe',
+    'recipes_recipe',
+    'recipes_recipe_tags',
+    'recipes_shoppingcart',
+    'users_user',
+}
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='Планы запросов проверяются только в PostgreSQL.',
+)
+
+
+def scenario_queries():
+    """SELECT основных запросов API по сценариям."""
+    queries = []
+    with bench_settings():
+        for name, scenario in api_scenarios().items():
+            with CaptureQueriesContext(connection) as context:
+                assert scenario().status_code == 200, name
+            queries.extend(
+                (name, query['sql']) for query in context.captured_queries
+            )
+    return queries
+
+
+@pytest.mark.django_db
+def test_hot_queries_do_not_scan_tables(bench_data):
+    """Горячие запросы читают большие таблицы по индексам.
+
+    На тестовых данных таблицы малы, и планировщик выбрал бы Seq Scan
+    и при наличии индекса, поэтому последовательное чтение отключается:
+    Seq Scan остается в плане, только если подходящего индекса нет.
+    """
+    queries = scenario_queries()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    problems = [
+        f'{name}: Seq Scan по {table}: {sql}'
+        for name, sql in queries
+        for table in seq_scans(sql)
+        if table in HOT_TABLES
+    ]
+    assert not problems, '\n'.join(problems)
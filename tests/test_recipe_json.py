@@ -0,0 +1,90 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.benchmark import bench_settings
+from recipes.management.commands.seed_bench import USER_PREFIX
+from recipes.models import Recipe
+
+User = get_user_model()
+
+# Имя картинки, которое FieldFile.url кодирует: пробелы, скобки,
+# кириллица и #.
+LEGACY_IMAGE = 'recipes/Фото блюда (1) #2.png'
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='JSON рецептов собирается только в PostgreSQL.',
+)
+
+
+@pytest.fixture
+def cart_user(bench_data):
+    """Пользователь seed_bench с рецептами в корзине."""
+    return (
+        User.objects.filter(username__startswith=USER_PREFIX)
+        .annotate(cart=Count('shopping_cart'))
+        .filter(cart__gt=0).order_by('id').first()
+    )
+
+
+@pytest.fixture
+def legacy_recipe(bench_data):
+    """Рецепт с картинкой под именем, которое нужно кодировать в URL."""
+    recipe = Recipe.objects.order_by('-pub_date').first()
+    Recipe.objects.filter(pk=recipe.pk).update(image=LEGACY_IMAGE)
+    return recipe
+
+
+def get(client, url, sql):
+    """Тело ответа, собранного сериализатором или PostgreSQL."""
+    with bench_settings(), override_settings(
+        RECIPE_DOCUMENTS=False, RECIPE_SQL_JSON=sql,
+    ):
+        response = client.get(url)
+    assert response.status_code == 200, url
+    return response.content
+
+
+def assert_same(client, urls):
+    """Ответы сериализатора и PostgreSQL совпадают байт в байт."""
+    for url in urls:
+        assert get(client, url, sql=True) == get(client, url, sql=False), url
+
+
+@pytest.mark.django_db
+def test_anonymous_responses_match_serializer(legacy_recipe):
+    """Списки и карточки рецептов для анонимного пользователя."""
+    urls = [
+        f'/api/recipes/?page={page}&limit=50' for page in range(1, 4)
+    ] + [
+        f'/api/recipes/{pk}/'
+        for pk in Recipe.objects.values_list('pk', flat=True)[:20]
+    ]
+    assert_same(Client(), urls + [f'/api/recipes/{legacy_recipe.pk}/'])
+
+
+@pytest.mark.django_db
+def test_user_responses_match_serializer(cart_user, legacy_recipe):
+    """Отношения пользователя к рецептам и авторам в JSON."""
+    token, _ = Token.objects.get_or_create(user=cart_user)
+    client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+    assert_same(client, [
+        '/api/recipes/?limit=50',
+        '/api/recipes/?is_favorited=1&limit=50',
+        '/api/recipes/?is_in_shopping_cart=1&limit=50',
+        f'/api/recipes/?author={legacy_recipe.author_id}',
+        f'/api/recipes/{legacy_recipe.pk}/',
+    ])
+
+
+@pytest.mark.django_db
+def test_legacy_image_name_is_encoded(legacy_recipe):
+    """Имя картинки кодируется так же, как в FieldFile.url."""
+    content = get(Client(), f'/api/recipes/{legacy_recipe.pk}/', sql=True)
+    assert b'/media/recipes/%D0%A4%D0%BE%D1%82%D0%BE' in content
+    assert b'%20(1)%20%232.png"' in content
@@ -0,0 +1,104 @@
+import hashlib
+import multiprocessing
+import os
+import random
+
+import pytest
+
+from foodgram.cache import SharedMemoryCache
+
+# Таблица на 2048 ячеек: при 3000 ключей записи вытесняются.
+TABLE = {'SIZE': 1024 * 1024, 'SLOT_SIZE': 512}
+
+PROCESSES = 4
+
+OPERATIONS = 20000
+
+KEYS = 3000
+
+# Ключ счетчика проверки атомарного incr.
+COUNTER = 'counter'
+
+
+def shared_cache(path):
+    """Кэш в разделяемой памяти в файле path без срока действия."""
+    return SharedMemoryCache(path, {'OPTIONS': TABLE, 'TIMEOUT': None})
+
+
+def mixed_worker(path, seed):
+    """Случайные set/get/delete, возвращает число поврежденных чтений.
+
+    Значение содержит свой ключ и хэш полезной нагрузки, поэтому
+    прочитанная наполовину перезаписанная ячейка обнаруживается.
+    """
+    generator = random.Random(seed)
+    cache = shared_cache(path)
+    corrupted = 0
+    for _ in range(OPERATIONS):
+        key = generator.randrange(KEYS)
+        action = generator.random()
+        if action < 0.3:
+            payload = os.urandom(generator.randrange(16, cache.capacity // 2))
+            cache.set(key, (key, payload, hashlib.md5(payload).digest()))
+        elif action < 0.35:
+            cache.delete(key)
+        else:
+            value = cache.get(key)
+            if value is not None and (
+                value[0] != key
+                or hashlib.md5(value[1]).digest() != value[2]
+            ):
+                corrupted += 1
+    return corrupted
+
+
+def counter_worker(path):
+    """Увеличение общего счетчика."""
+    cache = shared_cache(path)
+    for _ in range(OPERATIONS):
+        cache.incr(COUNTER)
+
+
+def clear_worker(path):
+    """Сброс кэша в другом процессе."""
+    shared_cache(path).clear()
+
+
+@pytest.fixture
+def context():
+    """Процессы fork, как воркеры gunicorn."""
+    return multiprocessing.get_context('fork')
+
+
+def test_concurrent_reads_not_corrupted(tmp_path, context):
+    """Чтение во время записи другими процессами не видит мусора."""
+    path = str(tmp_path / 'cache')
+    with context.Pool(PROCESSES) as pool:
+        corrupted = pool.starmap(mixed_worker, [
+            (path, seed) for seed in range(PROCESSES)
+        ])
+    assert sum(corrupted) == 0
+
+
+def test_incr_is_atomic(tmp_path, context):
+    """incr из нескольких процессов не теряет увеличений."""
+    path = str(tmp_path / 'cache')
+    cache = shared_cache(path)
+    cache.set(COUNTER, 0)
+    with context.Pool(PROCESSES) as pool:
+        pool.map(counter_worker, [path] * PROCESSES)
+    assert cache.get(COUNTER) == PROCESSES * OPERATIONS
+
+
+def test_clear_from_other_process(tmp_path, context):
+    """clear() в другом процессе сбрасывает записи во всех."""
+    path = str(tmp_path / 'cache')
+    cache = shared_cache(path)
+    cache.set('before-clear', True)
+    process = context.Process(target=clear_worker, args=(path,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert cache.get('before-clear') is None
+    cache.set('after-clear', True)
+    assert shared_cache(path).get('after-clear') is True
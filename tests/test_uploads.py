@@ -0,0 +1,202 @@
+import base64
+import json
+import math
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.benchmark import bench_settings
+from recipes.models import Ingredient, Recipe, Tag
+
+MB = 1024 * 1024
+
+# Размер картинки: в несколько раз больше FILE_UPLOAD_MAX_MEMORY_SIZE.
+IMAGE_SIZE = 6 * MB
+
+
+class Api:
+    """Запросы к WSGI-обработчику с телом из файла и пиковой памятью.
+
+    Тело читается обработчиком из файла, поэтому tracemalloc
+    учитывает только память, выделенную при обработке запроса.
+    """
+
+    def __init__(self, token, directory):
+        self.token = token
+        self.directory = directory
+        self.handler = WSGIHandler()
+
+    def file(self, name, content):
+        """Файл во временном каталоге."""
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as file:
+            file.write(content)
+        return path
+
+    def request(self, method, path, body_path, content_type,
+                offset=0, length=None, headers=None):
+        """Код ответа, пиковая память на запрос и тело ответа."""
+        if length is None:
+            length = os.path.getsize(body_path) - offset
+        with open(body_path, 'rb') as body:
+            body.seek(offset)
+            environ = {
+                'REQUEST_METHOD': method,
+                'PATH_INFO': path,
+                'QUERY_STRING': '',
+                'SERVER_NAME': 'testserver',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'CONTENT_TYPE': content_type,
+                'CONTENT_LENGTH': str(length),
+                'HTTP_AUTHORIZATION': f'Token {self.token}',
+                'wsgi.input': body,
+                'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http',
+                'wsgi.multithread': False,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+                **(headers or {}),
+            }
+            statuses = []
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            response = self.handler(
+                environ, lambda status, headers: statuses.append(status),
+            )
+            content = b''.join(response)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            response.close()
+        return int(statuses[0].split()[0]), peak, content
+
+    def post_json(self, path, data):
+        """POST с JSON-телом."""
+        return self.request(
+            'POST', path, self.file('body.json', json.dumps(data).encode()),
+            'application/json',
+        )
+
+
+@pytest.fixture
+def api(settings, media_root, tmp_path, user):
+    """Клиент WSGI с трассировкой памяти и каталогом загрузок.
+
+    Первый запрос импортирует модули и строит URL-схему, его память
+    к загрузке не относится: он выполняется до замеров. Как в тестовом
+    клиенте Django, соединение с БД не закрывается после запроса:
+    тест идет в транзакции.
+    """
+    settings.UPLOAD_DIR = str(tmp_path / 'uploads')
+    token, _ = Token.objects.get_or_create(user=user)
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    tracemalloc.start()
+    try:
+        with bench_settings():
+            api = Api(token.key, str(tmp_path))
+            api.post_json('/api/uploads/', {'size': 1, 'name': 'warmup.png'})
+            yield api
+    finally:
+        tracemalloc.stop()
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+@pytest.fixture
+def recipe():
+    """Поля рецепта без картинки."""
+    return {
+        'name': 'Рецепт с большой картинкой',
+        'tags': [Tag.objects.create(
+            name='Обед', color='#E26C2D', slug='lunch',
+        ).pk],
+        'ingredients': [{'id': Ingredient.objects.create(
+            name='соль', measurement_unit='г',
+        ).pk, 'amount': 1}],
+        'text': 'Рецепт для проверки памяти при загрузке.',
+        'cooking_time': 10,
+    }
+
+
+@pytest.fixture
+def image(tmp_path):
+    """PNG из случайных пикселей размером около IMAGE_SIZE."""
+    side = int(math.sqrt(IMAGE_SIZE / 3))
+    path = tmp_path / 'image.png'
+    Image.frombytes(
+        'RGB', (side, side), os.urandom(side * side * 3),
+    ).save(path, compress_level=1)
+    return str(path)
+
+
+def memory_limit(settings):
+    """Предел памяти на запрос: буфер загрузки и 1 МБ на остальное."""
+    return settings.FILE_UPLOAD_MAX_MEMORY_SIZE + MB
+
+
+@pytest.mark.django_db
+def test_base64_peak_exceeds_limit(settings, api, recipe, image):
+    """Картинка base64 в JSON целиком в памяти: замер ее видит."""
+    with open(image, 'rb') as file:
+        encoded = base64.b64encode(file.read()).decode()
+    body = api.file('recipe.json', json.dumps({
+        **recipe, 'image': f'data:image/png;base64,{encoded}',
+    }).encode())
+    del encoded
+    status, peak, _ = api.request(
+        'POST', '/api/recipes/', body, 'application/json',
+    )
+    assert status == 201
+    assert peak > os.path.getsize(image) > memory_limit(settings)
+
+
+@pytest.mark.django_db
+def test_multipart_peak_memory(settings, api, recipe, image):
+    """multipart/form-data: картинка пишется во временный файл."""
+    with open(image, 'rb') as file:
+        body = api.file('recipe.multipart', encode_multipart(BOUNDARY, {
+            'data': json.dumps(recipe), 'image': file,
+        }))
+    status, peak, _ = api.request(
+        'POST', '/api/recipes/', body, MULTIPART_CONTENT,
+    )
+    assert status == 201
+    assert Recipe.objects.get().image
+    assert peak < memory_limit(settings)
+
+
+@pytest.mark.django_db
+def test_chunked_upload_peak_memory(settings, api, recipe, image):
+    """Загрузка по частям: ни один запрос не держит картинку целиком."""
+    total = os.path.getsize(image)
+    status, peak, content = api.post_json(
+        '/api/uploads/', {'size': total, 'name': 'image.png'},
+    )
+    assert status == 201
+    upload = json.loads(content)
+    peaks = [peak]
+    chunk = 2 * MB
+    for offset in range(0, total, chunk):
+        status, peak, _ = api.request(
+            'PATCH', f'/api/uploads/{upload["id"]}/', image,
+            'application/offset+octet-stream',
+            offset=offset, length=min(chunk, total - offset),
+            headers={'HTTP_UPLOAD_OFFSET': str(offset)},
+        )
+        assert status == 200
+        peaks.append(peak)
+    status, peak, _ = api.post_json(
+        '/api/recipes/', {**recipe, 'image': upload['image']},
+    )
+    assert status == 201
+    assert Recipe.objects.get().image.size == total
+    assert max(*peaks, peak) < memory_limit(settings)